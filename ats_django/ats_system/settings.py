@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the session and user lookups are counted too (see QUERY_BUDGETS).
+    'parser.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,9 +81,59 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Transactions take the write lock when they begin, so they wait
+            # for it (up to `timeout`) instead of failing with "database is
+            # locked" when a read lock can't be upgraded.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 30,  # seconds a connection waits for the write lock
+            # The database file is switched to WAL once, by migration
+            # parser/0012 (readers and the writer don't block each other).
+            # These settings are per connection and leave the file alone.
+            # In WAL mode synchronous=NORMAL only fsyncs at checkpoints; a
+            # power cut can lose the last commits but not corrupt the file.
+            'init_command': (
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA cache_size=-65536;'  # KiB of page cache per connection
+                'PRAGMA temp_store=MEMORY;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA wal_autocheckpoint=1000;'  # pages
+            ),
+        },
     }
 }
 
+# Writes from uploads and the ingestion workers go through one writer
+# thread per process, which commits them in groups (see parser/write_queue.py).
+WRITE_QUEUE_ENABLED = True
+WRITE_QUEUE_MAX_BATCH = 64  # operations committed together in one transaction
+
+# Per-process cache. Django's default locmem cache keeps only 300 entries,
+# too few for autocomplete responses.
+# 'parser' holds the versioned candidate-table and chart-data cache (see
+# parser/response_cache.py). PARSER_CACHE_BACKEND=file shares it between
+# the processes on one host.
+PARSER_CACHE_BACKEND = os.environ.get('PARSER_CACHE_BACKEND', 'locmem')
+PARSER_CACHE_TIMEOUT = 600  # seconds; superseded versions simply age out
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'parser': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'parser',
+        'TIMEOUT': PARSER_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    } if PARSER_CACHE_BACKEND == 'file' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'parser',
+        'TIMEOUT': PARSER_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,6 +174,13 @@ STATIC_URL = 'static/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Same as Django's default handlers, but they also hash each file as it
+# arrives (see parser/upload_handlers.py).
+FILE_UPLOAD_HANDLERS = [
+    'parser.upload_handlers.HashingMemoryFileUploadHandler',
+    'parser.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -131,4 +190,127 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Redirect users to the landing page after a successful login
 LOGIN_REDIRECT_URL = '/'
 # Redirect users to the login page if they try to access a protected page
-LOGIN_URL = '/login/'
\ No newline at end of file
+LOGIN_URL = '/login/'
+
+
+# Background resume ingestion (see parser/ingestion.py).
+# The database is used as the queue, so no Redis/Celery broker is required.
+# Worker threads run inside the web process unless INGESTION_RUN_IN_PROCESS is
+# turned off, in which case `python manage.py run_ingestion_workers` must be running.
+INGESTION_RUN_IN_PROCESS = True
+INGESTION_WORKERS = 2
+INGESTION_BATCH_SIZE = 8  # files a worker claims at once; a batch is converted and sent to Gemini concurrently
+INGESTION_POLL_INTERVAL = 1.0  # seconds an idle worker waits before checking the queue again
+INGESTION_MAX_ATTEMPTS = 3
+INGESTION_STALE_AFTER = 15 * 60  # seconds before a claimed task is assumed abandoned
+INGESTION_STREAM_POLL_INTERVAL = 0.5  # seconds between checks for newly finished files in a result stream
+INGESTION_STREAM_TIMEOUT = 30 * 60  # seconds a result stream stays open before the page falls back to polling
+
+# Bulk imports of resume directories and ZIP archives (see parser/bulk_import.py).
+BULK_IMPORT_BATCH_SIZE = 32  # files read, converted and sent to Gemini per batch by `import_resumes`
+BULK_IMPORT_MAX_FILE_BYTES = 25 * 1024 * 1024  # larger files in an archive are skipped
+BULK_IMPORT_MAX_ARCHIVE_FILES = 10000  # resumes accepted in one uploaded archive
+
+
+# Docling converter pool (see parser/converter_pool.py).
+# Each worker process loads the Docling models once and is reused across uploads.
+# Conversions are CPU bound, so by default there is one worker per core.
+DOCLING_POOL_SIZE = os.cpu_count() or 2
+DOCLING_MAX_CONVERSIONS_PER_WORKER = 200  # recycle a worker after this many files (0 = never)
+DOCLING_MAX_WORKER_MEMORY_MB = 3072  # recycle a worker whose RSS grows past this (0 = no limit)
+DOCLING_CONVERSION_TIMEOUT = 120  # seconds before a conversion is abandoned and its worker killed
+DOCLING_ACQUIRE_TIMEOUT = 600  # seconds a conversion waits for a free worker before it fails
+
+
+# Parse result cache (see parser/parse_cache.py).
+# Keyed by the SHA-256 of the uploaded file; least recently used entries are evicted first.
+PARSE_CACHE_ENABLED = True
+PARSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PARSE_CACHE_HIT_FLUSH_SECONDS = 10  # hits are counted in memory and written at most this often
+
+# Sample resumes used by the benchmark management commands.
+SAMPLE_RESUMES_DIR = BASE_DIR.parent / 'dummy_resumes'
+
+
+# Gemini API (see parser/gemini_parser.py and parser/gemini_async.py).
+# Point GEMINI_API_BASE at `manage.py run_gemini_stub` to test without the real API.
+GEMINI_API_BASE = os.environ.get('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com')
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+GEMINI_MODEL = 'gemini-2.5-flash'
+GEMINI_MAX_CONCURRENCY = 8  # requests in flight at once
+GEMINI_REQUESTS_PER_MINUTE = 60
+GEMINI_TOKENS_PER_MINUTE = 250000
+GEMINI_MAX_RETRIES = 5  # retries on 429/5xx, with exponential backoff
+GEMINI_BACKOFF_BASE = 1.0  # seconds
+GEMINI_BACKOFF_MAX = 60.0  # seconds
+GEMINI_REQUEST_TIMEOUT = 120.0  # seconds
+# Pack several resumes into one Gemini request to cut round-trips (see extract_candidates).
+GEMINI_BATCH_PROMPTS = True
+GEMINI_BATCH_TOKEN_BUDGET = 30000  # estimated prompt tokens per batched request
+GEMINI_BATCH_MAX_RESUMES = 10
+
+# Field extraction (see parser/extractors.py). The tiered extractor runs local
+# rules first and asks Gemini only for fields scored below the threshold.
+RESUME_EXTRACTOR = 'parser.extractors.TieredExtractor'
+EXTRACTION_CONFIDENCE_THRESHOLD = 0.8  # 0 never escalates, above 1 always does
+
+# Re-extraction of stored resumes whose extractor version is out of date
+# (see parser/reextraction.py and `manage.py reextract_candidates`).
+REEXTRACTION_WORKERS = 4  # threads, each extracting one batch at a time
+REEXTRACTION_BATCH_SIZE = 20  # stored resumes a worker claims at once; a batch is sent to Gemini concurrently
+REEXTRACTION_STALE_AFTER = 15 * 60  # seconds before a claimed resume is assumed abandoned
+
+
+# Candidate table (see parser/pagination.py).
+CANDIDATE_PAGE_SIZE = 50
+CANDIDATE_COUNT_LIMIT = 10000  # totals above this are shown as "10,000+"
+EXPORT_CHUNK_SIZE = 2000  # rows fetched from the database and written out at a time by exports
+
+# Resume-to-job match scores (see parser/matching.py).
+MATCH_LEADERBOARD_SIZE = 10  # best candidates kept per job for the dashboard
+MATCH_TOP_APPLICANT_MIN_SCORE = 0.1  # leaderboard entries counted as "Top Applicants"
+MATCH_RESCORE_GROWTH = 0.25  # rescore a job in full once its candidates grow by this fraction
+
+# Near-duplicate candidate detection (see parser/dedup.py). Changing the
+# signature shape needs `manage.py index_duplicates --rebuild`.
+DEDUP_NUM_PERM = 128  # MinHash values per signature; a multiple of DEDUP_BANDS
+DEDUP_BANDS = 16  # LSH bands, of DEDUP_NUM_PERM / DEDUP_BANDS values each
+DEDUP_SHINGLE_SIZE = 3  # words per shingle
+DEDUP_MIN_SHINGLES = 20  # shorter resumes are not checked
+DEDUP_THRESHOLD = 0.8  # estimated Jaccard similarity at which a candidate is flagged
+DEDUP_MAX_CANDIDATES = 100  # stored signatures compared per new resume
+DEDUP_PAGE_SIZE = 200  # rows on a job's "possible duplicates" page
+
+# Filter-form autocomplete (see parser/autocomplete.py).
+AUTOCOMPLETE_RESULTS = 10
+AUTOCOMPLETE_SCAN_LIMIT = 2000  # prefix matches ranked per lookup
+AUTOCOMPLETE_CACHE_TIMEOUT = 60  # seconds
+
+# Prometheus metrics at /metrics (see parser/metrics.py). Each process writes
+# its values to METRICS_DIR so the endpoint can report all of them; set
+# METRICS_DIR to '' to report only the serving process.
+METRICS_DIR = os.environ.get('METRICS_DIR', str(BASE_DIR / 'metrics'))
+METRICS_FLUSH_INTERVAL = 1.0  # seconds between writes of a process' values
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # if set, scrapers must send "Authorization: Bearer <token>"
+
+# SQL query budgets per view (see parser/query_budget.py). Requests over their
+# view's budget, or repeating one query shape QUERY_BUDGET_REPEAT_THRESHOLD
+# times (an N+1 loop), are printed, or raise QueryBudgetExceeded in 'raise'
+# mode. `manage.py check_query_budgets` checks every view against these.
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'log')  # 'log', 'raise' or 'off'
+QUERY_BUDGET_REPEAT_THRESHOLD = 5
+# Baselines measured by check_query_budgets (session and user lookups included);
+# raise one only together with the change that needs the extra query.
+QUERY_BUDGETS = {
+    'landing_page': 2,
+    'parser_home': 9,
+    'candidate_rows': 5,
+    'chart_applicants': 4,
+    'chart_degrees': 6,
+    'chart_schools': 6,
+    'autocomplete': 3,
+    'ingestion_status': 5,
+    'job_posting_details': 3,
+    'job_duplicates': 4,
+    'cache_stats': 2,
+}
@@ -3,6 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 import os  # <-- Add this import
+from parser.views import prometheus_metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,6 +11,8 @@ urlpatterns = [
     path('', include('landing.urls')),
     # Add the parser app's urls
     path('parser/', include('parser.urls')),
+    # Prometheus scrapes /metrics by default
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
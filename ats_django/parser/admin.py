@@ -1,6 +1,10 @@
 from django.contrib import admin
-from .models import Candidate, Job
+from .models import Candidate, Job, IngestionJob, IngestionTask, ParseCacheEntry, ResumeDocument
 
 # Register your models here.
 admin.site.register(Candidate)
-admin.site.register(Job)
\ No newline at end of file
+admin.site.register(Job)
+admin.site.register(IngestionJob)
+admin.site.register(IngestionTask)
+admin.site.register(ParseCacheEntry)
+admin.site.register(ResumeDocument)
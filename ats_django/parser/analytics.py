@@ -0,0 +1,246 @@
+"""
+Materialized aggregates behind the dashboard totals and charts.
+
+The dashboard used to count every job and candidate and GROUP BY the
+selected job's candidates on each page load. The counts now live in
+counter tables: AnalyticsCounter (site-wide totals), JobCandidateCount,
+DegreeCount and SchoolCount. SQLite triggers on parser_job and
+parser_candidate adjust them on every insert, update and delete
+(bulk_create and queryset.update/delete included), so a dashboard read
+costs O(top-k) rather than O(candidates).
+
+The triggers also bump a site-wide data version (see `data_version`),
+which the chart endpoints turn into ETags, and a per-job version
+(JobCandidateCount.version), which keys the response cache.
+
+The triggers are created by migrations 0006 to 0008, the current ones by
+0008. Each migration keeps its own copy of the trigger SQL, so a change to
+the triggers is a new migration carrying the new SQL. Like the search
+index, the triggers are also dropped when Django remakes the Candidate or
+Job table, and such migrations must create them again the same way.
+
+`rebuild_counters` recomputes everything from scratch and
+`check_counters` compares the tables with live aggregates (see the
+rebuild_analytics and check_analytics commands). On other databases the
+triggers don't exist and the live queries are used instead.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import AnalyticsCounter, Candidate, DegreeCount, Job, JobCandidateCount, SchoolCount
+
+COUNTER_TABLE = AnalyticsCounter._meta.db_table
+JOB_COUNT_TABLE = JobCandidateCount._meta.db_table
+DEGREE_TABLE = DegreeCount._meta.db_table
+SCHOOL_TABLE = SchoolCount._meta.db_table
+
+# (counter table, its value column, the Candidate columns counted into it)
+GROUPED_COUNTS = [
+    (DEGREE_TABLE, 'degree', ['degree']),
+    (SCHOOL_TABLE, 'school', ['degree_school', 'diploma_school']),
+]
+
+TOP_K = 10
+
+
+def _bump_counter(name, delta):
+    return f"UPDATE {COUNTER_TABLE} SET value = value + ({delta}) WHERE name = '{name}';"
+
+
+def _touch():
+    """
+    Bumps the data version and sets its timestamp to now, in Unix seconds
+    (see data_version).
+    """
+    return [
+        _bump_counter('version', 1),
+        f"UPDATE {COUNTER_TABLE} SET value = CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER) "
+        f"WHERE name = 'modified_at';",
+    ]
+
+
+def _rebuild_statements():
+    statements = [
+        # The data version only ever grows, so ETags issued before a rebuild can't match after it.
+        f"DELETE FROM {COUNTER_TABLE} WHERE name IN ('jobs', 'candidates')",
+        f"INSERT OR IGNORE INTO {COUNTER_TABLE}(name, value) VALUES ('version', 0), ('modified_at', 0)",
+        *_touch(),
+        f"DELETE FROM {JOB_COUNT_TABLE} WHERE job_id NOT IN (SELECT id FROM parser_job)",
+        f"DELETE FROM {DEGREE_TABLE}",
+        f"DELETE FROM {SCHOOL_TABLE}",
+        f"INSERT INTO {COUNTER_TABLE}(name, value) SELECT 'jobs', count(*) FROM parser_job",
+        f"INSERT INTO {COUNTER_TABLE}(name, value) SELECT 'candidates', count(*) FROM parser_candidate",
+        # Per-job versions are bumped rather than reset, for the same reason.
+        f"""INSERT INTO {JOB_COUNT_TABLE}(job_id, count, version)
+            SELECT parser_job.id, count(parser_candidate.id), 1 FROM parser_job
+            LEFT JOIN parser_candidate ON parser_candidate.job_id = parser_job.id
+            WHERE true GROUP BY parser_job.id
+            ON CONFLICT(job_id) DO UPDATE SET count = excluded.count, version = version + 1""",
+    ]
+    for table, column, fields in GROUPED_COUNTS:
+        values = ' UNION ALL '.join(
+            f"SELECT job_id, {field} AS value FROM parser_candidate WHERE coalesce({field}, '') != ''"
+            for field in fields
+        )
+        statements.append(
+            f"""INSERT INTO {table}(job_id, {column}, count)
+                SELECT job_id, value, count(*) FROM ({values}) GROUP BY job_id, value"""
+        )
+    return statements
+
+
+def counters_available():
+    return connection.vendor == 'sqlite'
+
+
+def rebuild_counters():
+    """
+    Recomputes every counter from the jobs and candidates in one transaction.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for statement in _rebuild_statements():
+            cursor.execute(statement)
+
+
+# --- Live aggregates: the source of truth, used when filters are applied,
+# on databases without the triggers, and by check_counters.
+
+def live_job_applicant_counts():
+    return list(
+        Job.objects.annotate(applicant_count=Count('candidates'))
+        .values('title', 'applicant_count').order_by('-applicant_count')
+    )
+
+
+def live_top_degrees(candidates, limit=TOP_K):
+    return list(
+        candidates.filter(degree__isnull=False).exclude(degree__exact='')
+        .values('degree')
+        .annotate(count=Count('degree'))
+        .order_by('-count')[:limit]
+    )
+
+
+def live_top_schools(candidates, limit=TOP_K):
+    """
+    Counts degree and diploma schools together in one query, a UNION ALL of
+    both columns over the candidates.
+    """
+    try:
+        sql, params = candidates.order_by().values('degree_school', 'diploma_school').query.sql_with_params()
+    except EmptyResultSet:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""WITH filtered AS ({sql})
+                SELECT school, COUNT(*) AS count FROM (
+                    SELECT degree_school AS school FROM filtered
+                    UNION ALL
+                    SELECT diploma_school AS school FROM filtered
+                ) AS schools
+                WHERE school IS NOT NULL AND school != ''
+                GROUP BY school ORDER BY count DESC, school LIMIT %s""",
+            [*params, limit],
+        )
+        return [{'school': school, 'count': count} for school, count in cursor.fetchall()]
+
+
+# --- Dashboard reads
+
+def totals():
+    """
+    Returns (total jobs, total candidates).
+    """
+    if not counters_available():
+        return Job.objects.count(), Candidate.objects.count()
+    values = dict(AnalyticsCounter.objects.values_list('name', 'value'))
+    return values.get('jobs', 0), values.get('candidates', 0)
+
+
+def data_version():
+    """
+    Returns (version, last modified datetime) of the jobs and candidates.
+    The triggers bump the version on every change, so it can key ETags and
+    caches. Returns (None, None) where the counters aren't maintained.
+    """
+    if not counters_available():
+        return None, None
+    values = dict(AnalyticsCounter.objects.filter(name__in=['version', 'modified_at']).values_list('name', 'value'))
+    if 'version' not in values:
+        return None, None
+    modified_at = values.get('modified_at')
+    return values['version'], datetime.fromtimestamp(modified_at, tz=dt_timezone.utc) if modified_at else None
+
+
+def job_applicant_counts():
+    """
+    [{'title', 'applicant_count'}] for every job, most applicants first.
+    """
+    if not counters_available():
+        return live_job_applicant_counts()
+    return [
+        {'title': title, 'applicant_count': count}
+        for title, count in JobCandidateCount.objects.order_by('-count').values_list('job__title', 'count')
+    ]
+
+
+def top_degrees(job, limit=TOP_K):
+    if not counters_available():
+        return live_top_degrees(Candidate.objects.filter(job=job), limit)
+    return list(DegreeCount.objects.filter(job=job).order_by('-count').values('degree', 'count')[:limit])
+
+
+def top_schools(job, limit=TOP_K):
+    if not counters_available():
+        return live_top_schools(Candidate.objects.filter(job=job), limit)
+    return list(SchoolCount.objects.filter(job=job).order_by('-count').values('school', 'count')[:limit])
+
+
+# --- Consistency checking
+
+def check_counters():
+    """
+    Compares every counter with a live aggregate. Returns a list of
+    human-readable discrepancies (empty when everything matches).
+    """
+    problems = []
+    stored_totals = dict(AnalyticsCounter.objects.values_list('name', 'value'))
+    for name, actual in (('jobs', Job.objects.count()), ('candidates', Candidate.objects.count())):
+        if stored_totals.get(name) != actual:
+            problems.append(f"Total {name}: counter says {stored_totals.get(name)}, actually {actual}.")
+
+    stored = dict(JobCandidateCount.objects.values_list('job_id', 'count'))
+    actual = dict(Job.objects.annotate(n=Count('candidates')).values_list('id', 'n'))
+    problems.extend(_diff('Candidates of job', stored, actual))
+
+    stored = {(job_id, degree): count for job_id, degree, count in DegreeCount.objects.values_list('job_id', 'degree', 'count')}
+    actual = {
+        (row['job_id'], row['degree']): row['n']
+        for row in Candidate.objects.exclude(degree__isnull=True).exclude(degree='')
+        .order_by().values('job_id', 'degree').annotate(n=Count('id'))
+    }
+    problems.extend(_diff('Degree count', stored, actual))
+
+    stored = {(job_id, school): count for job_id, school, count in SchoolCount.objects.values_list('job_id', 'school', 'count')}
+    actual = {}
+    for field in ('degree_school', 'diploma_school'):
+        rows = (
+            Candidate.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            .order_by().values('job_id', field).annotate(n=Count('id'))
+        )
+        for row in rows:
+            key = (row['job_id'], row[field])
+            actual[key] = actual.get(key, 0) + row['n']
+    problems.extend(_diff('School count', stored, actual))
+    return problems
+
+
+def _diff(label, stored, actual):
+    problems = []
+    for key in sorted(set(stored) | set(actual), key=str):
+        if stored.get(key, 0) != actual.get(key, 0):
+            problems.append(f"{label} {key}: counter says {stored.get(key, 0)}, actually {actual.get(key, 0)}.")
+    return problems
@@ -0,0 +1,71 @@
+"""
+Autocomplete suggestions for the candidate filter form.
+
+`AutocompleteTerm` holds every distinct value of the filterable Candidate
+columns per job, with how many candidates have it. SQLite triggers on
+parser_candidate keep the counts up to date on every insert, update and
+delete (bulk_create and queryset.update/delete included), so nothing has
+to be rebuilt after an upload.
+
+A lookup is a range scan of the (job, field, key) index, where `key` is the
+value lowercased, followed by a sort of the matches by frequency. The scan
+is capped at AUTOCOMPLETE_SCAN_LIMIT keys so one-letter prefixes of
+near-unique columns (addresses, file names) stay cheap; for those columns
+every count is about 1 anyway. Responses are cached for
+AUTOCOMPLETE_CACHE_TIMEOUT seconds.
+
+The triggers are created by migration 0005, which keeps its own copy of
+their SQL. Like the search index's, they are dropped when Django remakes
+the Candidate table, and such migrations must create them again from a
+copy of that SQL.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import AutocompleteTerm
+
+# SQLite's lower() only folds ASCII letters; keys are built the same way in Python.
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+# Sorts after every other character, closing the prefix range.
+_MAX_CHAR = '\U0010ffff'
+
+
+def normalize_key(text):
+    return text.strip().translate(_ASCII_LOWER)
+
+
+def lookup(job_id, field, term, limit=None):
+    """
+    Returns up to `limit` values of `field` among the job's candidates that
+    start with `term` (case-insensitive), most frequent first.
+    """
+    limit = limit or settings.AUTOCOMPLETE_RESULTS
+    key = normalize_key(term)
+    if not key:
+        return []
+    scanned = (
+        AutocompleteTerm.objects
+        .filter(job_id=job_id, field=field, key__gte=key, key__lt=key + _MAX_CHAR)
+        .order_by('key')
+        .values('id')[:settings.AUTOCOMPLETE_SCAN_LIMIT]
+    )
+    return list(
+        AutocompleteTerm.objects.filter(id__in=scanned)
+        .order_by('-count', 'key')
+        .values_list('value', flat=True)[:limit]
+    )
+
+
+def suggest(job_id, field, term):
+    """
+    `lookup`, cached per (job, field, term).
+    """
+    digest = hashlib.md5(normalize_key(term).encode()).hexdigest()
+    cache_key = f'autocomplete:{job_id}:{field}:{digest}'
+    values = cache.get(cache_key)
+    if values is None:
+        values = lookup(job_id, field, term)
+        cache.set(cache_key, values, settings.AUTOCOMPLETE_CACHE_TIMEOUT)
+    return values
@@ -0,0 +1,107 @@
+"""
+Synthetic candidates for the benchmark management commands and tests.
+"""
+import random
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from .dedup import index_new_candidates
+from .matching import score_job
+from .models import Candidate, IngestionJob, IngestionTask, Job
+
+FIRST_NAMES = ['Jennifer', 'Amelie', 'Benjamin', 'Chidi', 'David', 'Emily', 'Fatima', 'Jordan', 'Kenji', 'Liam',
+               'Melissa', 'Michael', 'Olivia', 'Priya', 'Sarah', 'Jonah', 'Jenna', 'Mateo', 'Aisha', 'Wei']
+LAST_NAMES = ['Dubois', 'Cohen', 'Okonkwo', 'Rodriguez', 'White', 'Al-Jamil', 'Smith', 'Tanaka', "O'Brien",
+              'Ware', 'Johnson', 'Wilson', 'Sharma', 'Chen', 'Nguyen', 'Kowalski', 'Singh', 'Martin']
+CITIES = ['Winnipeg, MB', 'Toronto, ON', 'Vancouver, BC', 'Calgary, AB', 'Halifax, NS', 'Regina, SK', 'Ottawa, ON']
+DEGREES = ['BSc Computer Science', 'BA Psychology', 'BComm Accounting', 'BEng Mechanical Engineering',
+           'MSc Data Science', 'BA Philosophy', 'BSc Nursing', 'MBA']
+SCHOOLS = ['University of Manitoba', 'University of Winnipeg', 'University of Toronto', 'McGill University',
+           'University of Nairobi', 'University of British Columbia', 'Red River College', 'Seneca College']
+DIPLOMAS = ['Diploma in Business Administration', 'Diploma in Welding', 'Diploma in Data Science and Machine Learning',
+            'Diploma in Network Technology', '']
+SKILLS = ['python', 'java', 'excel', 'sql', 'django', 'react', 'welding', 'accounting', 'leadership', 'nursing',
+          'kubernetes', 'marketing', 'tableau', 'autocad', 'payroll', 'logistics', 'teaching', 'sales', 'c#', 'golang']
+FILLER = ('managed delivered developed maintained supported coordinated improved designed built led team project '
+          'customer service reports process systems operations quality training budget analysis clients').split()
+
+
+def create_bench_job(user):
+    return Job.objects.create(
+        title='Benchmark', company='ATS', province='MB', city='Winnipeg', min_salary=0, max_salary=0,
+        closing_date='2030-01-01', description='', job_type='Full-time', created_by=user,
+    )
+
+
+def fake_candidate(job, user):
+    """
+    An unsaved Candidate with random but realistic-looking values.
+    """
+    first_name = random.choice(FIRST_NAMES)
+    last_name = random.choice(LAST_NAMES)
+    words = random.sample(SKILLS, 4) + random.choices(FILLER, k=60)
+    random.shuffle(words)
+    return Candidate(
+        first_name=first_name,
+        last_name=last_name,
+        address=f"{random.randint(1, 999)} Main Street, {random.choice(CITIES)}",
+        degree=random.choice(DEGREES),
+        degree_school=random.choice(SCHOOLS),
+        diploma=random.choice(DIPLOMAS) or None,
+        diploma_school=random.choice(SCHOOLS[-2:]),
+        resume_file_name=f"{first_name.lower()}_{last_name.lower()}.pdf",
+        resume_text=f"# {first_name} {last_name}\n\n" + ' '.join(words),
+        job=job,
+        uploaded_by=user,
+    )
+
+
+def create_query_budget_data(candidates=200):
+    """
+    Creates a user with a scored job of `candidates` candidates, a few
+    flagged re-uploads and a finished ingestion batch. Returns the user and
+    the (view name, URL) pairs to request as that user, covering every view
+    in QUERY_BUDGETS.
+    """
+    random.seed(42)
+    user = User.objects.create_user('budget')
+    other = User.objects.create_user('budget-other')
+    job = create_bench_job(user)
+    create_bench_job(other)
+    Candidate.objects.bulk_create(fake_candidate(job, user) for _ in range(candidates))
+    job.description = 'Python developer with SQL, Django and Kubernetes experience.'
+    job.save()
+    score_job(job)
+    # A few re-uploads, so the duplicates page has rows to show.
+    originals = list(Candidate.objects.filter(job=job).order_by('id')[:5])
+    for candidate in originals:
+        candidate.pk = None
+    Candidate.objects.bulk_create(originals)
+    index_new_candidates(Candidate.objects.filter(job=job).values_list('id', flat=True))
+    ingestion_job = IngestionJob.objects.create(
+        job=job, created_by=user, status=IngestionJob.STATUS_COMPLETED, total_files=10,
+    )
+    IngestionTask.objects.bulk_create(
+        IngestionTask(
+            ingestion_job=ingestion_job, resume_file=f'ingestion/resume_{i}.pdf',
+            original_name=f'resume_{i}.pdf', status=IngestionJob.STATUS_COMPLETED,
+            candidates_created=1, parsed_data=[{'first_name': 'Jennifer'}],
+        )
+        for i in range(10)
+    )
+    return user, [
+        ('landing_page', reverse('landing_page')),
+        ('parser_home', reverse('parser_home')),
+        ('parser_home', f"{reverse('parser_home')}?job_id={job.id}&first_name=jen&sort_by=last_name"),
+        ('parser_home', f"{reverse('parser_home')}?job_id={job.id}&sort_by=match_score&order=desc"),
+        ('candidate_rows', f"{reverse('candidate_rows')}?job_id={job.id}&sort_by=match_score&order=desc"),
+        ('chart_applicants', reverse('chart_applicants')),
+        ('chart_degrees', f"{reverse('chart_degrees')}?job_id={job.id}"),
+        ('chart_schools', f"{reverse('chart_schools')}?job_id={job.id}"),
+        ('autocomplete', f"{reverse('autocomplete')}?job_id={job.id}&field=degree_school&term=univ"),
+        ('ingestion_status', reverse('ingestion_status', args=[ingestion_job.id])),
+        ('job_posting_details', reverse('job_posting_details', args=[job.id])),
+        ('job_duplicates', reverse('job_duplicates', args=[job.id])),
+        ('cache_stats', reverse('cache_stats')),
+    ]
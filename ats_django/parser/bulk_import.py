@@ -0,0 +1,321 @@
+"""
+Bulk import of historical resumes from a directory or a ZIP archive.
+
+`BulkImporter` runs a batch pipeline in the calling process:
+
+1. read: the next batch of files is read and hashed; files already in the
+   parse cache skip the next two stages;
+2. convert: the batch is converted by the Docling pool, one file per worker
+   process. Conversion of batch N+1 runs in a background thread while
+   batch N is in the next stage, so Docling and Gemini are busy at the
+   same time;
+3. extract: the fields are extracted (see `extractors`); what goes to
+   Gemini is sent concurrently, several resumes per request;
+4. save: the candidates of the batch are inserted in one transaction, with
+   a ResumeDocument per file for later re-extraction (see reextraction.py).
+
+After each batch is saved, every file in it gets a line in a JSON Lines
+checkpoint file. An interrupted import run again with the same checkpoint
+skips those files. Only a crash between the commit and the checkpoint
+write can import a batch twice.
+
+Archives uploaded through the browser go to the background ingestion queue
+instead (see `iter_archive_files`); the queue checkpoints in the database.
+"""
+import hashlib
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from . import gemini_async, metrics, parse_cache
+from .converter_pool import ConversionError, DocumentSource, get_converter_pool
+from .extractors import extraction_version, get_extractor
+from .models import ResumeDocument
+from .persistence import build_candidates, insert_candidates
+from .reextraction import build_document
+
+STAGES = ['read', 'convert', 'extract', 'save']
+
+
+def _is_resume_name(name):
+    base = os.path.basename(name)
+    # Skips hidden files and the resource forks macOS adds to archives.
+    return bool(base) and not base.startswith('.') and not name.startswith('__MACOSX/')
+
+
+def _archive_members(archive):
+    return [
+        info for info in archive.infolist()
+        if not info.is_dir() and _is_resume_name(info.filename)
+        and info.file_size <= settings.BULK_IMPORT_MAX_FILE_BYTES
+    ]
+
+
+def iter_archive_files(archive):
+    """
+    Returns (count, files) for the resumes in an open ZipFile, where `files`
+    yields a File per member, opened lazily so only one is read at a time.
+    Directories, hidden files and members larger than
+    BULK_IMPORT_MAX_FILE_BYTES are skipped.
+    """
+    members = _archive_members(archive)
+
+    def files():
+        for info in members:
+            with archive.open(info) as member:
+                yield File(member, name=os.path.basename(info.filename))
+
+    return len(members), files()
+
+
+class ResumeSource:
+    """
+    The resumes in a directory (searched recursively) or a ZIP archive, in
+    a stable order. Names are relative to the directory or archive root.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.archive = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+        if self.archive is not None:
+            self.names = [info.filename for info in _archive_members(self.archive)]
+        elif os.path.isdir(path):
+            self.names = sorted(
+                os.path.relpath(os.path.join(root, name), path)
+                for root, dirs, files in os.walk(path)
+                for name in files
+                if _is_resume_name(name)
+            )
+        else:
+            raise ValueError(f"{path} is neither a directory nor a ZIP archive.")
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+
+    def read(self, name):
+        """
+        Returns (conversion source, SHA-256) for one resume: a path for files
+        in a directory, or the member's bytes for archives.
+        """
+        if self.archive is not None:
+            data = self.archive.read(name)
+            return DocumentSource(os.path.basename(name), data), hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.path, name)
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+        return path, hasher.hexdigest()
+
+
+class Checkpoint:
+    """
+    A JSON Lines file with one record per file the import has finished.
+    The first line records the job, so a checkpoint can't be reused for a
+    different one by mistake.
+    """
+
+    def __init__(self, path, job_id):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+            if lines and lines[0].get('job_id') != job_id:
+                raise ValueError(f"Checkpoint {path} belongs to job {lines[0].get('job_id')}, not job {job_id}.")
+            for record in lines[1:]:
+                self.done[record['name']] = record
+        self._file = open(path, 'a')
+        if not self.done and self._file.tell() == 0:
+            self._write([{'job_id': job_id}])
+
+    def close(self):
+        self._file.close()
+
+    def record(self, records):
+        self._write(records)
+        for record in records:
+            self.done[record['name']] = record
+
+    def _write(self, records):
+        for record in records:
+            self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+
+class ImportReport:
+    """
+    Counts and busy time per stage, for the throughput summary.
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.files = dict.fromkeys(STAGES, 0)
+        self.pages = 0
+        self.llm_calls = 0
+        self.skipped = 0
+        self.cached = 0
+        self.completed = 0
+        self.failed = 0
+        self.candidates = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def rate(self, stage, amount=None):
+        seconds = self.seconds[stage]
+        amount = self.files[stage] if amount is None else amount
+        return amount / seconds if seconds else 0.0
+
+
+class BulkImporter:
+    """
+    Imports every resume of a ResumeSource into `job`. `on_batch` is called
+    with the report after each batch is saved.
+    """
+
+    def __init__(self, job, user, checkpoint, batch_size=None, retry_failed=False, on_batch=None):
+        self.job = job
+        self.user = user
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size or settings.BULK_IMPORT_BATCH_SIZE
+        self.retry_failed = retry_failed
+        self.on_batch = on_batch
+        self.report = ImportReport()
+
+    def run(self, source):
+        todo = []
+        for name in source.names:
+            record = self.checkpoint.done.get(name)
+            if record and (record['status'] == 'completed' or not self.retry_failed):
+                self.report.skipped += 1
+            else:
+                todo.append(name)
+        batches = [todo[i:i + self.batch_size] for i in range(0, len(todo), self.batch_size)]
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='bulk-import-convert') as converter:
+            next_batch = None
+            for index, names in enumerate(batches):
+                if next_batch is None:
+                    items = self._convert(self._read(source, names))
+                else:
+                    items = next_batch.result()
+                    next_batch = None
+                if index + 1 < len(batches):
+                    # Start converting the next batch before extracting this one.
+                    next_batch = converter.submit(self._convert, self._read(source, batches[index + 1]))
+                self._extract(items)
+                self._save(items)
+                if self.on_batch:
+                    self.on_batch(self.report)
+
+        self.report.elapsed = time.perf_counter() - self.report.started
+        return self.report
+
+    def _read(self, source, names):
+        started = time.perf_counter()
+        items = []
+        for name in names:
+            item = {'name': name, 'error': None, 'parsed_data': None, 'raw_output': None}
+            try:
+                item['source'], item['content_hash'] = source.read(name)
+            except (OSError, KeyError, zipfile.BadZipFile) as e:
+                item['source'], item['content_hash'] = None, None
+                item['error'] = f"Could not read file: {e}"
+                metrics.RESUME_FAILURES.inc(stage='read')
+            items.append(item)
+            cached = parse_cache.lookup(item['content_hash'])
+            if cached and parse_cache.is_current(cached):
+                item.update(parsed_data=cached.parsed_data, raw_output=cached.raw_output,
+                            markdown=cached.markdown, cached=True)
+                self.report.cached += 1
+            elif cached:
+                # Parsed by an older extractor: no conversion, but extracted again.
+                item.update(source=None, markdown=cached.markdown)
+        self.report.seconds['read'] += time.perf_counter() - started
+        self.report.files['read'] += len(items)
+        return items
+
+    def _convert(self, items):
+        """
+        Converts the items that still need it and sets their 'markdown'.
+        Runs in the converter thread, so it doesn't touch the database.
+        """
+        started = time.perf_counter()
+        todo = [item for item in items if item['source'] is not None and not item.get('cached')]
+        conversions = get_converter_pool().convert_many([item['source'] for item in todo])
+        for item, conversion in zip(todo, conversions):
+            if isinstance(conversion, ConversionError):
+                item['error'] = f"Docling could not convert the file: {conversion}"
+                metrics.RESUME_FAILURES.inc(stage='conversion')
+            elif not conversion.markdown.strip():
+                item['error'] = "Docling extracted no text from the file."
+                metrics.RESUME_FAILURES.inc(stage='empty')
+            else:
+                item['markdown'] = conversion.markdown
+                self.report.pages += conversion.num_pages or 0
+        for item in items:
+            item.setdefault('markdown', None)
+            # Sources can hold a whole file's bytes; they aren't needed any more.
+            item['source'] = None
+        self.report.seconds['convert'] += time.perf_counter() - started
+        self.report.files['convert'] += len(todo)
+        return items
+
+    def _extract(self, items):
+        started = time.perf_counter()
+        calls_before = gemini_async.stats()['calls']
+        todo = [item for item in items if item['markdown'] and not item.get('cached')]
+        extracted = get_extractor().extract_many([item['markdown'] for item in todo])
+        for item, (parsed_data, raw_output) in zip(todo, extracted):
+            item['parsed_data'], item['raw_output'] = parsed_data, raw_output
+            if parsed_data is not None:
+                parse_cache.store(item['content_hash'], item['markdown'], parsed_data, raw_output)
+            else:
+                item['error'] = "No candidate data could be extracted."
+                metrics.RESUME_FAILURES.inc(stage='extraction')
+        self.report.llm_calls += gemini_async.stats()['calls'] - calls_before
+        self.report.seconds['extract'] += time.perf_counter() - started
+        self.report.files['extract'] += len(todo)
+
+    def _save(self, items):
+        started = time.perf_counter()
+        documents = []
+        candidates = []
+        records = []
+        version = extraction_version()
+        for item in items:
+            record = {'name': item['name'], 'sha256': item['content_hash'], 'candidates': 0}
+            if item['parsed_data']:
+                name = os.path.basename(item['name'])
+                item_candidates, warnings = build_candidates(
+                    item['parsed_data'], name, self.job, self.user, resume_text=item['markdown'],
+                )
+                document = build_document(
+                    self.job, self.user, name, item['content_hash'],
+                    item['markdown'], item['parsed_data'], item['raw_output'], version,
+                )
+                for candidate in item_candidates:
+                    candidate.document = document
+                documents.append(document)
+                candidates.extend(item_candidates)
+                record.update(status='completed', candidates=len(item_candidates), error=' '.join(warnings) or None)
+                self.report.completed += 1
+            else:
+                record.update(status='failed', error=item['error'])
+                self.report.failed += 1
+            records.append(record)
+        with transaction.atomic():
+            ResumeDocument.objects.bulk_create(documents)
+            insert_candidates(candidates)
+        self.checkpoint.record(records)
+        self.report.candidates += len(candidates)
+        self.report.seconds['save'] += time.perf_counter() - started
+        self.report.files['save'] += len(items)
@@ -0,0 +1,323 @@
+"""
+A pool of long-lived Docling worker processes.
+
+Creating a `DocumentConverter` loads layout/OCR models and builds the
+conversion pipelines, which costs far more than converting a typical resume.
+Each worker process here builds its converter once and then serves many
+conversions. Workers are recycled after a number of conversions or when their
+memory use passes a ceiling, and a conversion that runs past the timeout gets
+its worker killed and replaced so one pathological file can't stall the pool.
+A replacement that fails to start is retried with a growing delay; until it
+starts the pool has one worker less, and a conversion that can't get a
+worker within the acquire timeout fails instead of waiting forever.
+"""
+import atexit
+import multiprocessing
+import os
+import queue
+import resource
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import metrics
+
+# `timings` holds the seconds spent in Docling's convert() and in the
+# markdown export, and the worker's peak RSS in MB.
+ConversionResult = namedtuple('ConversionResult', ['markdown', 'num_pages', 'timings'], defaults=[None])
+
+# A document handed over as bytes rather than a path, for uploads that are
+# only in memory. `name` (with its extension) tells Docling the format.
+DocumentSource = namedtuple('DocumentSource', ['name', 'data'])
+
+
+class ConversionError(Exception):
+    pass
+
+
+class ConversionTimeout(ConversionError):
+    pass
+
+
+def _current_rss_mb():
+    """
+    Resident memory of the current process in MB. Falls back to the peak
+    RSS where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in KB on Linux and bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if peak > 1 << 30 else peak / 1024
+
+
+def _peak_rss_mb():
+    """
+    Peak resident memory of the current process in MB.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if peak > 1 << 30 else peak / 1024
+
+
+def _worker_main(conn, max_memory_mb):
+    """
+    Entry point of a converter process. Builds the converter once, then
+    converts whatever the parent sends until told to stop.
+    """
+    from io import BytesIO
+
+    from docling.datamodel.base_models import DocumentStream, InputFormat
+    from docling.document_converter import DocumentConverter
+
+    converter = DocumentConverter()
+    # Building the PDF pipeline loads the layout and OCR models, which is the
+    # expensive part; do it now rather than on the first upload.
+    converter.initialize_pipeline(InputFormat.PDF)
+    conn.send(('ready', None))
+
+    while True:
+        try:
+            source = conn.recv()
+        except EOFError:
+            break
+        if source is None:
+            break
+        if isinstance(source, DocumentSource):
+            source = DocumentStream(name=source.name, stream=BytesIO(source.data))
+        try:
+            started = time.perf_counter()
+            result = converter.convert(source)
+            converted = time.perf_counter()
+            markdown = result.document.export_to_markdown()
+            timings = {
+                'convert': converted - started,
+                'export': time.perf_counter() - converted,
+                'peak_rss_mb': _peak_rss_mb(),
+            }
+            reply = ('ok', (markdown, result.document.num_pages(), timings))
+        except Exception as e:
+            reply = ('error', f"{type(e).__name__}: {e}")
+        recycle = bool(max_memory_mb) and _current_rss_mb() > max_memory_mb
+        conn.send(reply + (recycle,))
+        if recycle:
+            break
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, context, max_memory_mb, target=_worker_main):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=target,
+            args=(child_conn, max_memory_mb),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conversions = 0
+
+    def wait_ready(self, timeout):
+        if not self.conn.poll(timeout):
+            self.kill()
+            raise ConversionError("Docling worker did not start in time.")
+        try:
+            self.conn.recv()
+        except EOFError:
+            raise ConversionError("Docling worker exited during start-up.")
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.kill()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class ConverterPool:
+    """
+    Hands conversions to a fixed number of pre-warmed worker processes.
+    `convert` is thread-safe; each call borrows one idle worker, waiting at
+    most `acquire_timeout` seconds (None waits for as long as it takes).
+    `worker_target` is the function the worker processes run; it must speak
+    `_worker_main`'s protocol (see docling_stub.py for one without Docling).
+    """
+
+    def __init__(self, size, max_conversions=0, max_memory_mb=0, timeout=None, start_timeout=600,
+                 acquire_timeout=None, replace_backoff=1.0, replace_backoff_max=60.0, worker_target=_worker_main):
+        self.size = size
+        self.max_conversions = max_conversions
+        self.max_memory_mb = max_memory_mb
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.acquire_timeout = acquire_timeout
+        self.replace_backoff = replace_backoff
+        self.replace_backoff_max = replace_backoff_max
+        self.worker_target = worker_target
+        # Spawn (not fork) so workers don't inherit the web process' threads and DB connections.
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        self._closed = False
+
+    def _new_worker(self):
+        return _Worker(self._context, self.max_memory_mb, self.worker_target)
+
+    def start(self):
+        workers = []
+        try:
+            for _ in range(self.size):
+                workers.append(self._new_worker())
+            for worker in workers:
+                worker.wait_ready(self.start_timeout)
+        except BaseException:
+            # Don't leave the workers that did start running without a pool.
+            for worker in workers:
+                worker.kill()
+            raise
+        for worker in workers:
+            self._idle.put(worker)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop()
+
+    def convert(self, source):
+        """
+        Converts one document (a file path, or a DocumentSource holding the
+        file's bytes) and returns a ConversionResult.
+        Raises ConversionTimeout if the worker takes longer than the timeout,
+        and ConversionError if Docling fails on the file.
+        """
+        if self._closed:
+            raise ConversionError("Converter pool is closed.")
+        file_type = metrics.file_type(source.name if isinstance(source, DocumentSource) else str(source))
+        started = time.perf_counter()
+        worker = self._acquire(file_type)
+        recycle = False
+        try:
+            worker.conn.send(source)
+            if not worker.conn.poll(self.timeout):
+                worker.kill()
+                worker = None
+                metrics.DOCLING_CONVERSION_ERRORS.inc(file_type=file_type, reason='timeout')
+                raise ConversionTimeout(f"Conversion did not finish within {self.timeout} seconds.")
+            status, payload, recycle = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            # The worker died mid-conversion (e.g. killed by the OOM killer).
+            worker.kill()
+            worker = None
+            metrics.DOCLING_CONVERSION_ERRORS.inc(file_type=file_type, reason='crash')
+            raise ConversionError(f"Docling worker crashed: {e}")
+        finally:
+            self._release(worker, recycle)
+
+        if status != 'ok':
+            metrics.DOCLING_CONVERSION_ERRORS.inc(file_type=file_type, reason='error')
+            raise ConversionError(payload)
+        metrics.DOCLING_CONVERSION_SECONDS.observe(time.perf_counter() - started, file_type=file_type)
+        return ConversionResult(*payload)
+
+    def convert_many(self, sources):
+        """
+        Converts several documents in parallel, one per worker process.
+        Results come back in the same order as `sources`. A file that fails
+        doesn't abort the batch: its slot holds the ConversionError instead.
+        """
+        def convert_one(source):
+            try:
+                return self.convert(source)
+            except ConversionError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(convert_one, sources))
+
+    def _acquire(self, file_type):
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            metrics.DOCLING_CONVERSION_ERRORS.inc(file_type=file_type, reason='no_worker')
+            raise ConversionError(f"No Docling worker became free within {self.acquire_timeout} seconds.")
+
+    def _release(self, worker, recycle):
+        """
+        Returns a worker to the idle queue, or replaces it in the background
+        if it was killed or has done its share of conversions.
+        """
+        if worker is not None:
+            worker.conversions += 1
+            if not recycle and not (self.max_conversions and worker.conversions >= self.max_conversions):
+                self._idle.put(worker)
+                return
+            worker.stop()
+        threading.Thread(target=self._replace_worker, daemon=True).start()
+
+    def _replace_worker(self):
+        """
+        Starts a worker in place of one that was stopped or killed, retrying
+        with exponential backoff until one starts or the pool is closed.
+        """
+        delay = self.replace_backoff
+        while not self._closed:
+            worker = self._new_worker()
+            try:
+                worker.wait_ready(self.start_timeout)
+            except ConversionError as e:
+                worker.kill()
+                print(f"Failed to start a replacement Docling worker, retrying in {delay:g}s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, self.replace_backoff_max)
+                continue
+            if self._closed:
+                worker.stop()
+            else:
+                self._idle.put(worker)
+            return
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_converter_pool():
+    """
+    Returns the process-wide converter pool, starting (and warming) it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            pool = ConverterPool(
+                size=settings.DOCLING_POOL_SIZE,
+                max_conversions=settings.DOCLING_MAX_CONVERSIONS_PER_WORKER,
+                max_memory_mb=settings.DOCLING_MAX_WORKER_MEMORY_MB,
+                timeout=settings.DOCLING_CONVERSION_TIMEOUT,
+                acquire_timeout=settings.DOCLING_ACQUIRE_TIMEOUT,
+            )
+            pool.start()
+            atexit.register(pool.close)
+            _pool = pool
+    return _pool
@@ -0,0 +1,288 @@
+"""
+Near-duplicate candidate detection with MinHash and locality-sensitive
+hashing (LSH).
+
+A resume's text is lower-cased, split into words and cut into overlapping
+DEDUP_SHINGLE_SIZE-word shingles. Its MinHash signature holds, for each of
+DEDUP_NUM_PERM hash functions, the smallest hash of any of its shingles.
+The share of positions where two signatures agree estimates the Jaccard
+similarity of the two shingle sets. Re-uploads, lightly edited copies and
+the same CV converted from another format score well above
+DEDUP_THRESHOLD. Different people's resumes score far below it.
+
+Comparing a new signature with every stored one would cost O(n) per
+upload. Instead each signature is cut into DEDUP_BANDS bands, and each band
+is hashed to a 64-bit bucket key. Two resumes with similarity s share at
+least one bucket with probability 1 - (1 - s^r)^b, where r is the number
+of rows per band. With the default 16 bands of 8 rows that is about 95%
+at s = 0.8 and 6% at s = 0.5. Bucket keys are stored in parser_lsh_bucket,
+whose primary key is (bucket, candidate_id); on SQLite it is a WITHOUT
+ROWID table, so the key is the table. A lookup is therefore DEDUP_BANDS
+index probes, however many signatures are stored.
+
+`index_new_candidates` runs once insert_candidates has committed its rows.
+It signs the new candidates and looks up their buckets. It then compares
+the signatures found there, at most DEDUP_MAX_CANDIDATES of them, starting
+with those that share the most buckets. The best match at or above
+DEDUP_THRESHOLD is recorded on CandidateSignature.duplicate_of. Matches
+are only flagged, never merged; recruiters review them on the job's
+"possible duplicates" page. All of this runs in the calling thread, except
+saving the signatures and buckets, which goes through the write queue
+(see write_queue.py).
+
+Some candidates are never flagged:
+- candidates whose full names differ, since two people listed in one
+  document share its text;
+- resumes too short to sign.
+
+The bucket table is created by migration 0010 and has no foreign key.
+Buckets of deleted candidates are skipped at lookup, because their
+signatures are gone, and they are dropped by
+`manage.py index_duplicates --rebuild`.
+"""
+import functools
+import re
+import threading
+import zlib
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import metrics
+from .models import Candidate, CandidateSignature
+from .write_queue import write
+
+BUCKET_TABLE = 'parser_lsh_bucket'
+
+# Signatures are only comparable if every process derives the same hash
+# functions, so they come from a fixed seed. Changing it, DEDUP_NUM_PERM
+# or DEDUP_BANDS needs `manage.py index_duplicates --rebuild`.
+SEED = 1
+
+INDEX_BATCH_SIZE = 500
+# Bucket keys per lookup query, well below SQLite's limit on query parameters.
+LOOKUP_BATCH_SIZE = 900
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_parameters(num_perm, bands):
+    """
+    The MinHash functions' (a, b) coefficients, and the odd multipliers and
+    per-band salts that turn a band into a bucket key.
+    """
+    if num_perm % bands:
+        raise ValueError(f"DEDUP_NUM_PERM ({num_perm}) must be a multiple of DEDUP_BANDS ({bands}).")
+    generator = np.random.RandomState(SEED)
+    a = generator.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+    b = generator.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+    multipliers = generator.randint(0, 1 << 62, size=num_perm // bands, dtype=np.int64).astype(np.uint64)
+    multipliers = multipliers * np.uint64(2) + np.uint64(1)
+    salts = generator.randint(0, 1 << 62, size=bands, dtype=np.int64).astype(np.uint64)
+    return a, b, multipliers, salts
+
+
+def shingles(text):
+    """
+    The distinct 32-bit hashes of the text's DEDUP_SHINGLE_SIZE-word shingles.
+    """
+    size = settings.DEDUP_SHINGLE_SIZE
+    words = _WORD.findall(text.lower()) if text else []
+    if len(words) < size:
+        return np.empty(0, dtype=np.uint64)
+    hashes = np.fromiter(map(zlib.crc32, map(str.encode, words)), dtype=np.uint64, count=len(words))
+    count = len(words) - size + 1
+    combined = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        combined = combined * _FNV_PRIME + hashes[offset:offset + count]
+    return np.unique(combined & _MAX_HASH)
+
+
+def minhash(text):
+    """
+    The text's signature as DEDUP_NUM_PERM uint32 values, or None if it has
+    fewer than DEDUP_MIN_SHINGLES shingles.
+    """
+    values = shingles(text)
+    if len(values) < settings.DEDUP_MIN_SHINGLES:
+        return None
+    a, b, *_ = _hash_parameters(settings.DEDUP_NUM_PERM, settings.DEDUP_BANDS)
+    signature = np.full(len(a), _MAX_HASH, dtype=np.uint64)
+    # In slices, so a very long text doesn't build one huge matrix.
+    for start in range(0, len(values), 2048):
+        hashed = (np.outer(a, values[start:start + 2048]) + b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+        signature = np.minimum(signature, hashed.min(axis=1))
+    return signature.astype(np.uint32)
+
+
+def band_keys(signatures):
+    """
+    The bucket keys of an (n, DEDUP_NUM_PERM) array of signatures, as an
+    (n, DEDUP_BANDS) array of int64.
+    """
+    *_, multipliers, salts = _hash_parameters(settings.DEDUP_NUM_PERM, settings.DEDUP_BANDS)
+    bands = signatures.astype(np.uint64).reshape(len(signatures), settings.DEDUP_BANDS, -1)
+    # Wraps around modulo 2**64, which is what a multiplicative hash wants.
+    return ((bands * multipliers).sum(axis=2) + salts).view(np.int64)
+
+
+def similarities(signature, others):
+    """
+    Estimated Jaccard similarity of `signature` with each row of `others`.
+    """
+    return (others == signature).mean(axis=1)
+
+
+def _same_person(names, other_names):
+    """
+    False only when both candidates have a full name and the names differ.
+    """
+    if all(names) and all(other_names):
+        return [name.strip().lower() for name in names] == [name.strip().lower() for name in other_names]
+    return True
+
+
+def insert_buckets(cursor, candidate_ids, keys):
+    """
+    Adds the bucket keys (an (n, DEDUP_BANDS) array) of the given candidates
+    to the LSH index.
+    """
+    cursor.executemany(
+        f"INSERT INTO {BUCKET_TABLE} (bucket, candidate_id) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+        [(int(key), int(candidate_id)) for candidate_id, row in zip(candidate_ids, keys) for key in row],
+    )
+
+
+def _lookup(cursor, keys):
+    """
+    {bucket key: [candidate ids]} for the stored buckets among `keys`.
+    """
+    keys = sorted(set(keys))
+    found = defaultdict(list)
+    for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+        batch = keys[start:start + LOOKUP_BATCH_SIZE]
+        cursor.execute(
+            f"SELECT bucket, candidate_id FROM {BUCKET_TABLE} WHERE bucket IN ({', '.join(['%s'] * len(batch))})",
+            batch,
+        )
+        for bucket, candidate_id in cursor.fetchall():
+            found[bucket].append(candidate_id)
+    return found
+
+
+def _stored_signatures(candidate_ids):
+    """
+    {candidate id: (signature, duplicate_of id, (first name, last name))}
+    for the stored signatures of `candidate_ids`.
+    """
+    stored = {}
+    candidate_ids = sorted(candidate_ids)
+    for start in range(0, len(candidate_ids), INDEX_BATCH_SIZE):
+        rows = CandidateSignature.objects.filter(candidate_id__in=candidate_ids[start:start + INDEX_BATCH_SIZE])
+        for candidate_id, signature, duplicate_of_id, first_name, last_name in rows.values_list(
+            'candidate_id', 'minhash', 'duplicate_of_id', 'candidate__first_name', 'candidate__last_name',
+        ):
+            stored[candidate_id] = (np.frombuffer(signature, dtype=np.uint32), duplicate_of_id, (first_name, last_name))
+    return stored
+
+
+def _index_batch(rows):
+    """
+    index_new_candidates for one batch of (id, job id, first name, last
+    name, resume text) rows, in id order. Returns the number flagged.
+    """
+    new = []
+    for candidate_id, job_id, first_name, last_name, resume_text in rows:
+        signature = minhash(resume_text)
+        if signature is not None:
+            new.append((candidate_id, job_id, (first_name, last_name), signature))
+    if not new:
+        return 0
+    keys = band_keys(np.stack([signature for *fields, signature in new]))
+
+    with connection.cursor() as cursor:
+        found = _lookup(cursor, keys.ravel().tolist())
+    # Candidates of this batch are matched against the ones before them too.
+    batch_buckets = defaultdict(list)
+    shortlists = []
+    for (candidate_id, *fields), row in zip(new, keys):
+        shared = Counter()
+        for key in row.tolist():
+            shared.update(found.get(key, ()))
+            shared.update(batch_buckets[key])
+            batch_buckets[key].append(candidate_id)
+        shortlists.append([other_id for other_id, count in shared.most_common(settings.DEDUP_MAX_CANDIDATES)])
+
+    known = {candidate_id: (signature, None, names) for candidate_id, job_id, names, signature in new}
+    known.update(_stored_signatures({
+        other_id for shortlist in shortlists for other_id in shortlist if other_id not in known
+    }))
+
+    signatures = []
+    flagged = 0
+    for (candidate_id, job_id, names, signature), shortlist in zip(new, shortlists):
+        duplicate_of = similarity = None
+        shortlist = [
+            other_id for other_id in shortlist
+            if other_id < candidate_id and other_id in known and _same_person(names, known[other_id][2])
+        ]
+        if shortlist:
+            scores = similarities(signature, np.stack([known[other_id][0] for other_id in shortlist]))
+            # The most similar, and the earliest of equally similar ones.
+            best = max(range(len(shortlist)), key=lambda i: (scores[i], -shortlist[i]))
+            if scores[best] >= settings.DEDUP_THRESHOLD:
+                match = shortlist[best]
+                # Points at the first copy rather than at another duplicate of it.
+                duplicate_of = known[match][1] or match
+                similarity = round(float(scores[best]), 4)
+                known[candidate_id] = (signature, duplicate_of, names)
+                flagged += 1
+        signatures.append(CandidateSignature(
+            candidate_id=candidate_id, job_id=job_id, minhash=signature.tobytes(),
+            duplicate_of_id=duplicate_of, similarity=similarity,
+        ))
+
+    write(_save_signatures, signatures, [candidate_id for candidate_id, *fields in new], keys, flagged)
+    return flagged
+
+
+def _save_signatures(signatures, candidate_ids, keys, flagged):
+    CandidateSignature.objects.bulk_create(signatures, ignore_conflicts=True)
+    with connection.cursor() as cursor:
+        insert_buckets(cursor, candidate_ids, keys)
+    transaction.on_commit(lambda: metrics.CANDIDATE_DUPLICATES.inc(flagged))
+
+
+def index_new_candidates(candidate_ids):
+    """
+    Signs the given candidates, flags the ones that nearly duplicate an
+    earlier candidate (see module docstring) and adds them to the LSH
+    index. Candidates signed before are skipped. Returns the number flagged.
+    """
+    candidate_ids = sorted(candidate_ids)
+    flagged = 0
+    with _lock:
+        for start in range(0, len(candidate_ids), INDEX_BATCH_SIZE):
+            rows = Candidate.objects.filter(
+                id__in=candidate_ids[start:start + INDEX_BATCH_SIZE], signature__isnull=True,
+            ).order_by('id')
+            flagged += _index_batch(rows.values_list('id', 'job_id', 'first_name', 'last_name', 'resume_text'))
+    return flagged
+
+
+def clear_index():
+    """
+    Deletes every signature and bucket, before a rebuild.
+    """
+    with transaction.atomic():
+        CandidateSignature.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {BUCKET_TABLE}")
@@ -0,0 +1,53 @@
+"""
+Stand-ins for the Docling worker process of the converter pool.
+
+`stub_worker_main` speaks the same pipe protocol as converter_pool's
+`_worker_main`, but "converts" a document by returning its text as the
+markdown, so the pool and everything built on it can be exercised without
+Docling or its models. Faults are injected through the document's text:
+
+* 'crash' as its first word makes the worker exit mid-conversion;
+* 'hang' makes it stop answering, until the pool's timeout kills it;
+* 'fail' makes the conversion fail, as Docling does on a broken file.
+
+`stub_worker_never_ready` is a worker that never finishes starting up.
+Use them with `ConverterPool(..., worker_target=stub_worker_main)`.
+"""
+import os
+import time
+
+from .converter_pool import DocumentSource
+
+
+def _read(source):
+    if isinstance(source, DocumentSource):
+        return source.data.decode('utf-8', 'replace')
+    with open(source, encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def stub_worker_main(conn, max_memory_mb):
+    conn.send(('ready', None))
+    while True:
+        try:
+            source = conn.recv()
+        except EOFError:
+            break
+        if source is None:
+            break
+        text = _read(source)
+        command = text.split(maxsplit=1)[0] if text.strip() else ''
+        if command == 'crash':
+            os._exit(1)
+        if command == 'hang':
+            time.sleep(3600)
+        if command == 'fail':
+            reply = ('error', "ConversionError: stub failure")
+        else:
+            reply = ('ok', (text, 1, {'convert': 0.0, 'export': 0.0, 'pid': os.getpid()}))
+        conn.send(reply + (False,))
+    conn.close()
+
+
+def stub_worker_never_ready(conn, max_memory_mb):
+    time.sleep(3600)
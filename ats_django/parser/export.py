@@ -0,0 +1,94 @@
+"""
+Streaming export of a candidate queryset as CSV or JSON Lines.
+
+Rows are read with `values_list(...).iterator()`, so the database cursor
+is consumed EXPORT_CHUNK_SIZE rows at a time and no model instances are
+built; the text is written out in chunks of the same size. Memory use
+stays flat however many rows there are, and the header goes out before
+the first query has returned its first row.
+"""
+import csv
+import io
+import json
+from datetime import date
+
+from django.conf import settings
+
+from .pagination import _order
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Spreadsheet programs run cells starting with these as formulas; resume
+# text is not trusted, so such values are prefixed with a quote (OWASP's
+# advice for CSV injection).
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _rows(queryset, columns, sort_by, descending):
+    ordered = queryset.order_by(*_order(sort_by, descending))
+    return ordered.values_list(*columns).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def _safe_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(queryset, columns, sort_by='id', descending=False):
+    """
+    Yields the CSV text: the header, the first row, then chunks of
+    EXPORT_CHUNK_SIZE rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    # Sent on its own, so the download starts before the query has run.
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    rows = 0
+    for row in _rows(queryset, columns, sort_by, descending):
+        writer.writerow([_safe_cell(value) for value in row])
+        rows += 1
+        # As with JSON Lines, the first row goes out on its own.
+        if rows == 1 or rows % settings.EXPORT_CHUNK_SIZE == 1:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def iter_jsonl(queryset, columns, sort_by='id', descending=False):
+    """
+    Yields one JSON object per candidate and line, in chunks of
+    EXPORT_CHUNK_SIZE rows after the first.
+    """
+    lines = []
+    first = True
+    for row in _rows(queryset, columns, sort_by, descending):
+        lines.append(json.dumps({column: _json_value(value) for column, value in zip(columns, row)}))
+        # The first row goes out on its own, so the download starts at once.
+        if first or len(lines) == settings.EXPORT_CHUNK_SIZE:
+            first = False
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def iter_export(export_format, queryset, columns, sort_by='id', descending=False):
+    if export_format == 'csv':
+        return iter_csv(queryset, columns, sort_by, descending)
+    return iter_jsonl(queryset, columns, sort_by, descending)
@@ -0,0 +1,483 @@
+"""
+Turning the Markdown of a resume into candidate fields.
+
+An extractor takes a list of resume texts and returns, for each, the
+(parsed_data, raw_output) pair `process_resume` and `process_resumes` pass
+on. The one used is RESUME_EXTRACTOR:
+
+* `LLMExtractor` sends everything to Gemini (the original behaviour);
+* `RuleBasedExtractor` uses regexes, a gazetteer of known schools
+  (data/schools.txt) and section-heading heuristics, and scores each field
+  from 0 to 1 by how sure it is;
+* `TieredExtractor` (the default) runs the rules first and asks Gemini only
+  for the fields scored below EXTRACTION_CONFIDENCE_THRESHOLD. Resumes
+  whose fields are all confident never reach the API.
+
+Candidates from the rules carry two extra keys that the rest of the
+pipeline ignores: 'confidence' (score per field) and 'extracted_by'
+('rules' or 'llm' per field).
+
+Every extractor has a `version`, a short string that changes whenever its
+output for the same text can change (a new prompt, model, rule set or
+threshold). Stored resumes are tagged with it, so those extracted by an
+older version can be found and re-extracted (see reextraction.py).
+"""
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .persistence import DATE_FORMATS
+
+FIELDS = [
+    'first_name', 'last_name', 'address', 'date_of_birth',
+    'diploma', 'diploma_school', 'degree', 'degree_school',
+]
+
+_stats = {'resumes': 0, 'resolved_by_rules': 0, 'escalated': 0, 'escalated_fields': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _digest(*parts):
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()[:12]
+
+
+def stats():
+    """
+    How many resumes the tiered extractor resolved without Gemini, and how
+    many it escalated (and how many fields), for this process.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+class Extractor:
+    """
+    Base class. `timings`, when given, collects the seconds spent per stage.
+    `fields`, when given, limits extraction to those names of FIELDS; an
+    extractor may still return the others, and callers only use the ones
+    they asked for (TieredExtractor passes the fields it escalates).
+    """
+
+    def extract_many(self, resume_contents, timings=None, fields=None):
+        raise NotImplementedError
+
+    def version(self):
+        raise NotImplementedError
+
+
+class LLMExtractor(Extractor):
+    """
+    Gemini for every field of every resume (see `extract_candidates`).
+    """
+
+    def extract_many(self, resume_contents, timings=None, fields=None):
+        from .gemini_parser import extract_candidates, get_gemini_responses, parse_gemini_output
+
+        timings = {} if timings is None else timings
+        if len(resume_contents) != 1:
+            started = time.perf_counter()
+            results = extract_candidates(resume_contents, fields)
+            timings['llm'] = timings.get('llm', 0.0) + time.perf_counter() - started
+            return results
+
+        # A single resume is timed in two parts: the request and the parsing.
+        started = time.perf_counter()
+        gemini_output = get_gemini_responses(resume_contents, fields)[0]
+        timings['llm'] = timings.get('llm', 0.0) + time.perf_counter() - started
+        if not gemini_output:
+            return [(None, None)]
+        started = time.perf_counter()
+        parsed_data = parse_gemini_output(gemini_output)
+        timings['json'] = timings.get('json', 0.0) + time.perf_counter() - started
+        return [(parsed_data, gemini_output)]
+
+    def version(self):
+        from .gemini_parser import build_batch_prompt, build_prompt
+
+        return 'llm-' + _digest(
+            settings.GEMINI_MODEL, build_prompt('{resume}'), build_batch_prompt(['{resume}', '{resume}']),
+        )
+
+
+# --- Rule-based extraction ---------------------------------------------------
+
+SECTION_NAMES = {
+    'summary', 'professional summary', 'profile', 'professional profile', 'objective', 'career objective', 'about me',
+    'experience', 'work experience', 'professional experience', 'employment history', 'work history',
+    'education', 'education and training', 'education & training', 'academic background',
+    'academic qualifications', 'skills', 'general skills', 'technical skills', 'core competencies',
+    'expertise', 'certifications', 'certificates', 'licenses', 'projects', 'personal projects',
+    'languages', 'language', 'interests', 'hobbies', 'references', 'contact', 'contact information',
+    'volunteer experience', 'volunteering', 'awards', 'achievements', 'publications',
+}
+EDUCATION_SECTIONS = {
+    'education', 'education and training', 'education & training', 'academic background',
+    'academic qualifications',
+}
+
+# Ranked so the highest degree wins when several are listed.
+DEGREE_PATTERNS = [
+    (4, re.compile(r"\b(doctor(ate)? of|ph\.?\s?d\b|d\.?\s?phil\b|ed\.?\s?d\b|juris doctor|m\.?d\.?\b)", re.I)),
+    (3, re.compile(r"\b(master'?s?\b|m\.?\s?sc\b|m\.?\s?a\b|m\.?\s?s\b|m\.?\s?eng\b|m\.?\s?ed\b|mba\b|mfa\b|ll\.?m\b)", re.I)),
+    (2, re.compile(r"\b(bachelor'?s?\b|b\.?\s?sc\b|b\.?\s?a\b|b\.?\s?s\b|b\.?\s?eng\b|b\.?\s?ed\b|b\.?\s?comm?\b|bba\b|bfa\b|ll\.?b\b|honou?rs degree)", re.I)),
+    (1, re.compile(r"\b(associate'?s? (degree|of))", re.I)),
+]
+DIPLOMA_PATTERN = re.compile(r"\b(diploma|certificate|certification)\b", re.I)
+SCHOOL_PATTERN = re.compile(
+    r"\b(university|université|universite|college|collège|cégep|cegep|institute|polytechnic|academy|school)\b", re.I
+)
+
+CANADIAN_POSTAL_CODE = re.compile(r"\b[ABCEGHJ-NPRSTVXY]\d[ABCEGHJ-NPRSTV-Z][ -]?\d[ABCEGHJ-NPRSTV-Z]\d\b")
+US_ZIP_CODE = re.compile(r"\b[A-Z]{2},?\s+\d{5}(?:-\d{4})?\b")
+REGIONS = (
+    'AB|BC|MB|NB|NL|NS|NT|NU|ON|PE|QC|SK|YT|'
+    'AL|AK|AZ|AR|CA|CO|CT|DE|FL|GA|HI|ID|IL|IN|IA|KS|KY|LA|ME|MD|MA|MI|MN|MS|MO|MT|NE|NV|NH|NJ|NM|NY|NC|ND|'
+    'OH|OK|OR|PA|RI|SC|SD|TN|TX|UT|VT|VA|WA|WV|WI|WY|'
+    'Alberta|British Columbia|Manitoba|New Brunswick|Newfoundland and Labrador|Nova Scotia|Ontario|'
+    'Prince Edward Island|Quebec|Québec|Saskatchewan|'
+    'Alabama|Alaska|Arizona|Arkansas|California|Colorado|Connecticut|Delaware|Florida|Georgia|Hawaii|Idaho|'
+    'Illinois|Indiana|Iowa|Kansas|Kentucky|Louisiana|Maine|Maryland|Massachusetts|Michigan|Minnesota|'
+    'Mississippi|Missouri|Montana|Nebraska|Nevada|New Hampshire|New Jersey|New Mexico|New York|'
+    'North Carolina|North Dakota|Ohio|Oklahoma|Oregon|Pennsylvania|Rhode Island|South Carolina|'
+    'South Dakota|Tennessee|Texas|Utah|Vermont|Virginia|Washington|West Virginia|Wisconsin|Wyoming'
+)
+CITY_REGION = re.compile(rf"^[A-Z][\w'.-]*(?:[ -][A-Z][\w'.-]*)*,\s*(?:{REGIONS})$")
+STREET_NUMBER = re.compile(r"^\d+[A-Za-z]?\s+\S")
+
+DOB_LABEL = re.compile(r"\b(date\s+of\s+birth|birth\s*date|d\.?o\.?b\.?|born(\s+on)?)\b\s*[:\-–]?\s*(.*)", re.I)
+DATE_TEXT = re.compile(
+    r"\d{4}[-/]\d{1,2}[-/]\d{1,2}|\d{1,2}/\d{1,2}/\d{4}|[A-Za-z]{3,9}\.?\s+\d{1,2},?\s+\d{4}|\d{1,2}\s+[A-Za-z]{3,9}\.?\s+\d{4}"
+)
+EXTRA_DATE_FORMATS = ['%b %d %Y', '%B %d %Y', '%d/%m/%Y']
+
+NAME_WORD = re.compile(r"^[A-Za-zÀ-ÖØ-öø-ÿ][A-Za-zÀ-ÖØ-öø-ÿ'’.-]*$")
+NAME_STOP_WORDS = {'resume', 'résumé', 'curriculum', 'vitae', 'cv', 'profile', 'contact', 'page'}
+
+_MARKUP = re.compile(r"^(#+|[-*+>•▪●◦]|\d+\.)\s*")
+
+
+def _load_schools():
+    path = os.path.join(os.path.dirname(__file__), 'data', 'schools.txt')
+    with open(path, encoding='utf-8') as f:
+        names = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    # Longest first, so "Red River College Polytechnic" wins over "Red River College".
+    names.sort(key=len, reverse=True)
+    return re.compile(r"(?<!\w)(" + '|'.join(re.escape(name) for name in names) + r")(?!\w)", re.I)
+
+
+_school_gazetteer = None
+
+
+def _gazetteer():
+    global _school_gazetteer
+    if _school_gazetteer is None:
+        _school_gazetteer = _load_schools()
+    return _school_gazetteer
+
+
+def _clean_line(line):
+    """
+    Strips Markdown decoration (heading marks, bullets, emphasis, escapes,
+    HTML entities)
+    from a line, returning the text and whether it was a heading.
+    """
+    text = line.strip()
+    heading = text.startswith('#')
+    text = _MARKUP.sub('', text)
+    text = html.unescape(text.replace('**', '').replace('__', '').replace('\\', ''))
+    return text.strip(' \t|'), heading
+
+
+def _is_section(text, heading):
+    key = re.sub(r"[^\w& ]", '', text).strip().lower()
+    if key in SECTION_NAMES:
+        return key
+    return key if heading and len(key.split()) <= 4 and key.split() and key.split()[0] in SECTION_NAMES else None
+
+
+def _parse_date(text):
+    for date_format in DATE_FORMATS + EXTRA_DATE_FORMATS:
+        try:
+            return datetime.strptime(text.replace('.', ''), date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _segments(text):
+    return [segment.strip() for segment in re.split(r"\s+[|•·]\s+|\s*\|\s*", text) if segment.strip()]
+
+
+class RuleBasedExtractor(Extractor):
+    """
+    Finds the fields with regexes and layout heuristics; no network calls.
+    """
+    # Bump when a change to the rules changes what they extract.
+    RULES_VERSION = 1
+
+    def extract_many(self, resume_contents, timings=None, fields=None):
+        # Every rule is cheap, so all the fields are always extracted.
+        timings = {} if timings is None else timings
+        started = time.perf_counter()
+        results = []
+        for content in resume_contents:
+            fields, confidence = self.extract(content)
+            item = dict(fields, confidence=confidence, extracted_by=dict.fromkeys(FIELDS, 'rules'))
+            results.append(([item], json.dumps([item], indent=2)))
+        timings['rules'] = timings.get('rules', 0.0) + time.perf_counter() - started
+        return results
+
+    def version(self):
+        return 'rules-' + _digest(str(self.RULES_VERSION), _gazetteer().pattern)
+
+    def extract(self, markdown):
+        """
+        Returns (fields, confidence) for one resume: the value of each field
+        ('' when not found) and a score from 0 to 1 of how sure we are.
+        """
+        lines = []
+        for raw in (markdown or '').splitlines():
+            text, heading = _clean_line(raw)
+            if text:
+                lines.append((text, heading, _is_section(text, heading)))
+        fields = dict.fromkeys(FIELDS, '')
+        confidence = dict.fromkeys(FIELDS, 0.0)
+
+        self._name(lines, fields, confidence)
+        self._address(lines, fields, confidence)
+        self._date_of_birth(lines, fields, confidence)
+        self._education(lines, fields, confidence)
+        return fields, {name: round(score, 2) for name, score in confidence.items()}
+
+    def _name(self, lines, fields, confidence):
+        for position, (text, heading, section) in enumerate(lines[:8]):
+            if section:
+                continue
+            # "Michael Johnson, RN" -> "Michael Johnson"
+            candidate = text.split(',')[0].strip()
+            words = candidate.split()
+            if not 2 <= len(words) <= 4 or not all(NAME_WORD.match(word) for word in words):
+                continue
+            if {word.lower() for word in words} & NAME_STOP_WORDS:
+                continue
+            if candidate.isupper():
+                candidate = candidate.title()
+                words = candidate.split()
+            fields['first_name'] = words[0]
+            fields['last_name'] = ' '.join(words[1:])
+            # The first line of a resume, or its first heading, is nearly always the name.
+            score = 0.95 if position == 0 or heading else 0.7
+            confidence['first_name'] = confidence['last_name'] = score
+            return
+
+    def _address(self, lines, fields, confidence):
+        for text, heading, section in lines:
+            for segment in _segments(text):
+                if CANADIAN_POSTAL_CODE.search(segment) or US_ZIP_CODE.search(segment):
+                    fields['address'] = segment
+                    confidence['address'] = 0.95 if STREET_NUMBER.match(segment) else 0.75
+                    return
+        # No postal address: a lone "City, Region" in the header or contact
+        # section is where they live (lines under other sections are usually
+        # employers' or schools' locations).
+        current = None
+        for text, heading, section in lines:
+            if section:
+                current = section
+                continue
+            if current not in (None, 'contact', 'contact information'):
+                continue
+            for segment in _segments(text):
+                if CITY_REGION.match(segment):
+                    fields['address'] = segment
+                    confidence['address'] = 0.85
+                    return
+        confidence['address'] = 0.3
+
+    def _date_of_birth(self, lines, fields, confidence):
+        labelled = False
+        for text, heading, section in lines:
+            match = DOB_LABEL.search(text)
+            if not match:
+                continue
+            labelled = True
+            date_text = DATE_TEXT.search(match.group(3))
+            parsed = _parse_date(date_text.group(0)) if date_text else None
+            if parsed:
+                fields['date_of_birth'] = parsed.isoformat()
+                confidence['date_of_birth'] = 0.95
+                return
+        # Most resumes leave the date of birth out; when nothing even looks
+        # like a label for one, an empty value is almost certainly right.
+        confidence['date_of_birth'] = 0.2 if labelled else 0.9
+
+    def _education(self, lines, fields, confidence):
+        section_lines = []
+        current = None
+        for text, heading, section in lines:
+            if section:
+                current = section
+                continue
+            if current in EDUCATION_SECTIONS:
+                section_lines.append(text)
+        in_section = bool(section_lines)
+        if not in_section:
+            section_lines = [text for text, heading, section in lines]
+
+        degrees = []
+        diplomas = []
+        for index, text in enumerate(section_lines):
+            rank = next((rank for rank, pattern in DEGREE_PATTERNS if pattern.search(text)), None)
+            if rank is not None:
+                degrees.append((rank, index))
+            elif DIPLOMA_PATTERN.search(text):
+                diplomas.append(index)
+
+        base = 1.0 if in_section else 0.75
+        found_any = bool(degrees or diplomas)
+        if degrees:
+            # Highest rank first; among equals, the first listed (usually the latest).
+            rank, index = sorted(degrees, key=lambda entry: (-entry[0], entry[1]))[0]
+            self._entry(section_lines, index, 'degree', 'degree_school', base, fields, confidence)
+        else:
+            confidence['degree'] = confidence['degree_school'] = 0.85 if in_section and found_any else 0.3
+        if diplomas:
+            self._entry(section_lines, diplomas[0], 'diploma', 'diploma_school', base, fields, confidence)
+        else:
+            confidence['diploma'] = confidence['diploma_school'] = 0.85 if in_section and found_any else 0.5
+
+    def _entry(self, section_lines, index, course_field, school_field, base, fields, confidence):
+        """
+        Fills one education entry: the qualification on `index` and the
+        school on the same line or the lines around it.
+        """
+        text = section_lines[index]
+        school, school_score = None, 0.0
+        course = _segments(text)[0]
+        course_score = 0.95
+        for offset in (0, 1, 2, -1):
+            position = index + offset
+            if not 0 <= position < len(section_lines):
+                continue
+            for segment in _segments(section_lines[position]):
+                known = _gazetteer().search(segment)
+                if known or SCHOOL_PATTERN.search(segment):
+                    if offset == 0 and segment == course:
+                        # Degree and school in one segment: split at the school.
+                        start = known.start() if known else SCHOOL_PATTERN.search(segment).start()
+                        start = segment.rfind(',', 0, start) + 1 if ',' in segment[:start] else start
+                        course = segment[:start].strip(' ,-–')
+                        segment = segment[start:].strip(' ,-–')
+                        if not course:
+                            continue
+                        # Where one ends and the other starts is a guess.
+                        course_score = 0.7
+                    school, school_score = segment, 0.95 if known else 0.85
+                    break
+            if school:
+                break
+
+        fields[course_field] = course
+        confidence[course_field] = course_score * base
+        if school:
+            fields[school_field] = school
+            confidence[school_field] = school_score * base
+        else:
+            confidence[school_field] = 0.3
+
+
+# --- Tiered extraction -------------------------------------------------------
+
+class TieredExtractor(Extractor):
+    """
+    Rules first; Gemini only for the fields the rules aren't sure of.
+
+    All the uncertain fields of a batch are requested in one call to
+    `extract_candidates` (so still several resumes per request), and each
+    resume keeps Gemini's answer only for its own uncertain fields. When
+    Gemini finds several people in one resume, the rule-based fields are
+    merged into the first.
+    """
+
+    def __init__(self, local=None, fallback=None, threshold=None):
+        self.local = local or RuleBasedExtractor()
+        self.fallback = fallback or LLMExtractor()
+        self.threshold = settings.EXTRACTION_CONFIDENCE_THRESHOLD if threshold is None else threshold
+
+    def extract_many(self, resume_contents, timings=None, fields=None):
+        timings = {} if timings is None else timings
+        local_results = self.local.extract_many(resume_contents, timings)
+        results = list(local_results)
+        escalate = {}
+        for i, (items, raw_output) in enumerate(local_results):
+            uncertain = [name for name in FIELDS if items[0]['confidence'][name] < self.threshold]
+            if uncertain:
+                escalate[i] = uncertain
+        _count('resumes', len(resume_contents))
+        _count('resolved_by_rules', len(resume_contents) - len(escalate))
+        _count('escalated', len(escalate))
+        _count('escalated_fields', sum(len(fields) for fields in escalate.values()))
+        if not escalate:
+            return results
+
+        indexes = sorted(escalate)
+        requested = [name for name in FIELDS if any(name in escalate[i] for i in indexes)]
+        answers = self.fallback.extract_many([resume_contents[i] for i in indexes], timings, fields=requested)
+        for i, (parsed_data, raw_output) in zip(indexes, answers):
+            if not isinstance(parsed_data, list) or not parsed_data:
+                # Gemini failed: report the resume as failed, like the LLM-only path does.
+                results[i] = (None, raw_output)
+                continue
+            local_item = local_results[i][0][0]
+            merged = []
+            for position, answer in enumerate(parsed_data):
+                if not isinstance(answer, dict):
+                    merged.append(answer)
+                    continue
+                if position == 0:
+                    item = dict(local_item, confidence=dict(local_item['confidence']),
+                                extracted_by=dict(local_item['extracted_by']))
+                    for name in escalate[i]:
+                        item[name] = answer.get(name) or ''
+                        item['extracted_by'][name] = 'llm'
+                else:
+                    item = answer
+                merged.append(item)
+            results[i] = (merged, raw_output)
+        return results
+
+    def version(self):
+        return 'tiered-' + _digest(self.local.version(), self.fallback.version(), str(self.threshold))
+
+
+_extractors = {}
+
+
+def get_extractor():
+    """
+    The extractor configured in RESUME_EXTRACTOR (a dotted path).
+    """
+    path = settings.RESUME_EXTRACTOR
+    if path not in _extractors:
+        _extractors[path] = import_string(path)()
+    return _extractors[path]
+
+
+def extraction_version():
+    """
+    The version of the configured extractor (see module docstring).
+    """
+    return get_extractor().version()
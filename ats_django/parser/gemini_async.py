@@ -0,0 +1,241 @@
+"""
+Concurrent, rate-limited access to the Gemini REST API.
+
+Every request to Gemini goes through here. Requests run concurrently on a
+single background event loop shared by every thread in the process, so the
+limits below apply process-wide:
+
+* at most GEMINI_MAX_CONCURRENCY requests are in flight at once;
+* token buckets keep us under GEMINI_REQUESTS_PER_MINUTE and
+  GEMINI_TOKENS_PER_MINUTE;
+* 429 and 5xx responses (and network errors) are retried with exponential
+  backoff and jitter, honouring Retry-After when the server sends it.
+
+GEMINI_API_BASE can point at a local stub (see gemini_stub.py) for testing.
+"""
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+from django.conf import settings
+
+from . import metrics
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_stats = {'calls': 0, 'retries': 0, 'failures': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def stats():
+    """
+    Counts of Gemini calls (prompts sent), retried requests and calls that
+    failed for good, for this process.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def estimate_tokens(text):
+    """
+    Rough token count used for rate limiting (about four characters per token).
+    """
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """
+    A token bucket refilled continuously at `rate_per_minute`, holding at
+    most one minute's worth of tokens.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # A single request bigger than the bucket would wait forever; let it
+        # through once the bucket is full instead.
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class GeminiAPIError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AsyncGeminiClient:
+    """
+    Sends generateContent requests with a concurrency cap, rate limits and retries.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, base_url=None, model=None, max_concurrency=None, requests_per_minute=None,
+                 tokens_per_minute=None, max_retries=None, backoff_base=None, backoff_max=None, timeout=None):
+        self.base_url = (base_url or settings.GEMINI_API_BASE).rstrip('/')
+        self.model = model or settings.GEMINI_MODEL
+        self.max_retries = settings.GEMINI_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base or settings.GEMINI_BACKOFF_BASE
+        self.backoff_max = backoff_max or settings.GEMINI_BACKOFF_MAX
+        self.semaphore = asyncio.Semaphore(max_concurrency or settings.GEMINI_MAX_CONCURRENCY)
+        self.request_bucket = TokenBucket(requests_per_minute or settings.GEMINI_REQUESTS_PER_MINUTE)
+        self.token_bucket = TokenBucket(tokens_per_minute or settings.GEMINI_TOKENS_PER_MINUTE)
+        self.http = httpx.AsyncClient(timeout=timeout or settings.GEMINI_REQUEST_TIMEOUT)
+
+    async def close(self):
+        await self.http.aclose()
+
+    async def generate(self, prompt, api_key):
+        """
+        Returns the text of the model's answer to `prompt`.
+        Raises GeminiAPIError once retries are exhausted.
+        """
+        url = f"{self.base_url}/v1beta/models/{self.model}:generateContent"
+        body = {'contents': [{'parts': [{'text': prompt}]}]}
+        tokens = estimate_tokens(prompt)
+
+        for attempt in range(self.max_retries + 1):
+            await self.request_bucket.acquire()
+            await self.token_bucket.acquire(tokens)
+            retry_after = None
+            try:
+                async with self.semaphore:
+                    started = time.perf_counter()
+                    response = await self.http.post(url, params={'key': api_key}, json=body)
+            except httpx.TransportError as e:
+                error = GeminiAPIError(f"Request to Gemini failed: {e}")
+                metrics.LLM_ERRORS.inc(reason='transport')
+            else:
+                metrics.LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, status=response.status_code)
+                if response.status_code == 200:
+                    payload = _response_json(response)
+                    _record_usage(payload)
+                    return _response_text(payload)
+                metrics.LLM_ERRORS.inc(reason=response.status_code)
+                error = GeminiAPIError(
+                    f"Gemini returned HTTP {response.status_code}: {response.text[:200]}",
+                    status_code=response.status_code,
+                )
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    raise error
+                retry_after = _retry_after_seconds(response)
+
+            if attempt == self.max_retries:
+                raise error
+            _count('retries')
+            delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+            # Full jitter spreads retries out so concurrent requests don't retry in lockstep.
+            delay = random.uniform(0, delay)
+            await asyncio.sleep(max(delay, retry_after or 0))
+
+    async def generate_many(self, prompts, api_key):
+        """
+        Runs all prompts concurrently. Returns the answers in order, with None
+        for any prompt that failed.
+        """
+        async def generate_one(prompt):
+            try:
+                return await self.generate(prompt, api_key)
+            except GeminiAPIError as e:
+                print(f"An error occurred with the Gemini API: {e}")
+                _count('failures')
+                return None
+
+        return await asyncio.gather(*(generate_one(prompt) for prompt in prompts))
+
+
+def _response_json(response):
+    """
+    The decoded body of a successful response. A body that isn't JSON (cut
+    short by a proxy, say) raises GeminiAPIError and isn't retried.
+    """
+    try:
+        return response.json()
+    except ValueError:
+        metrics.LLM_ERRORS.inc(reason='invalid_body')
+        metrics.LLM_JSON_PARSE_FAILURES.inc(reason='invalid_body')
+        raise GeminiAPIError(f"Gemini returned a body that isn't JSON: {response.text[:200]}",
+                             status_code=response.status_code)
+
+
+def _record_usage(payload):
+    """
+    Counts the tokens Gemini reports having used for a request.
+    """
+    if not isinstance(payload, dict):
+        return
+    usage = payload.get('usageMetadata') or {}
+    for kind, key in (('prompt', 'promptTokenCount'), ('completion', 'candidatesTokenCount')):
+        if usage.get(key):
+            metrics.LLM_TOKENS.inc(usage[key], kind=kind)
+
+
+def _response_text(payload):
+    try:
+        parts = payload['candidates'][0]['content']['parts']
+    except (KeyError, IndexError, TypeError):
+        raise GeminiAPIError(f"Unexpected response from Gemini: {str(payload)[:200]}")
+    return ''.join(part.get('text', '') for part in parts)
+
+
+def _retry_after_seconds(response):
+    try:
+        return float(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return None
+
+
+_loop = None
+_client = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop_and_client():
+    """
+    Starts the background event loop (and the client living on it) on first use.
+    """
+    global _loop, _client
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='gemini-async', daemon=True).start()
+
+            async def make_client():
+                return AsyncGeminiClient()
+
+            _client = asyncio.run_coroutine_threadsafe(make_client(), loop).result()
+            _loop = loop
+    return _loop, _client
+
+
+def generate_all(prompts, api_key):
+    """
+    Blocking entry point for synchronous code (views, ingestion workers):
+    sends all prompts through the shared client and waits for the answers.
+    """
+    if not prompts:
+        return []
+    _count('calls', len(prompts))
+    loop, client = _get_loop_and_client()
+    return asyncio.run_coroutine_threadsafe(client.generate_many(prompts, api_key), loop).result()
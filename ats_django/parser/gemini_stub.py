@@ -0,0 +1,152 @@
+"""
+A local stand-in for the Gemini generateContent endpoint.
+
+It answers every request with a deterministic JSON candidate built from the
+resume text in the prompt, so the extraction pipeline can be exercised and
+benchmarked without network access or API spend. Latency, periodic
+429/500 errors and truncated response bodies can be injected to exercise
+the retry, rate-limit and error handling logic.
+
+Run it with `python manage.py run_gemini_stub` and set GEMINI_API_BASE to
+its URL, or start it in-process with `GeminiStubServer(...).start()`.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+BATCH_SECTION = re.compile(r'<<<RESUME source_id="(\d+)">>>\n(.*?)\n<<<END RESUME source_id="\1">>>', re.S)
+
+
+def stub_answer(prompt):
+    """
+    Builds the deterministic answer for a prompt: the first heading-like line
+    of each resume is taken as the candidate's name. Batch prompts get one
+    candidate per resume, tagged with the resume's source_id.
+    """
+    sections = BATCH_SECTION.findall(prompt)
+    if sections:
+        candidates = []
+        for source_id, resume_text in sections:
+            candidate = _stub_candidate(resume_text)
+            candidate['source_id'] = int(source_id)
+            candidates.append(candidate)
+    else:
+        candidates = [_stub_candidate(prompt.split('Resume Content:', 1)[-1])]
+    return '```json\n' + json.dumps(candidates, indent=2) + '\n```'
+
+
+def _stub_candidate(resume_text):
+    name = ''
+    for line in resume_text.splitlines():
+        line = line.strip().lstrip('#').strip()
+        if line:
+            name = line
+            break
+    words = re.sub(r'[^\w\s\'-]', ' ', name).split()
+    return {
+        'first_name': words[0] if words else '',
+        'last_name': ' '.join(words[1:3]) if len(words) > 1 else '',
+        'address': '',
+        'date_of_birth': '',
+        'diploma': '',
+        'diploma_school': '',
+        'degree': '',
+        'degree_school': '',
+    }
+
+
+class GeminiStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_every=0, fail_status=429, answer=stub_answer,
+                 malformed_every=0, retry_after=None):
+        """
+        `fail_every=N` makes every Nth request fail with `fail_status`,
+        with a Retry-After header of `retry_after` seconds if given.
+        `malformed_every=N` answers every Nth request with HTTP 200 and a
+        body cut off halfway, which isn't valid JSON.
+        `answer` turns a prompt into the model's reply text.
+        """
+        super().__init__((host, port), _StubHandler)
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.malformed_every = malformed_every
+        self.retry_after = retry_after
+        self.answer = answer
+        self.request_count = 0
+        self.failure_count = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='gemini-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+            prompt = ''.join(part.get('text', '') for part in body['contents'][0]['parts'])
+        except (ValueError, KeyError, IndexError, TypeError):
+            self._send(400, {'error': {'code': 400, 'message': 'Malformed request body.'}})
+            return
+
+        with server._lock:
+            server.request_count += 1
+            number = server.request_count
+            server._in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server._in_flight)
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            if server.fail_every and number % server.fail_every == 0:
+                with server._lock:
+                    server.failure_count += 1
+                self._send(server.fail_status, {'error': {'code': server.fail_status, 'message': 'Injected failure.'}},
+                           retry_after=server.retry_after)
+                return
+            text = server.answer(prompt)
+            self._send(200, {
+                'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}],
+                'usageMetadata': {
+                    'promptTokenCount': len(prompt) // 4,
+                    'candidatesTokenCount': len(text) // 4,
+                },
+            }, truncate=bool(server.malformed_every and number % server.malformed_every == 0))
+        finally:
+            with server._lock:
+                server._in_flight -= 1
+
+    def _send(self, status, payload, truncate=False, retry_after=None):
+        data = json.dumps(payload).encode()
+        if truncate:
+            data = data[:len(data) // 2]
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
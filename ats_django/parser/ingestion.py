@@ -0,0 +1,511 @@
+"""
+Background resume ingestion.
+
+Uploaded resumes are written to storage and recorded as IngestionTask rows.
+A small pool of worker threads (started inside the web process, or on its own
+with `manage.py run_ingestion_workers`) claims pending tasks straight from the
+database in batches, runs them through `process_resumes` and saves the
+resulting candidates.
+Using the database as the broker keeps this working on a single box without
+Redis or any other queue service. The queue's writes go through the write
+queue (see write_queue.py), so concurrent uploads and workers share group
+commits instead of contending for SQLite's write lock.
+"""
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .converter_pool import get_converter_pool
+from .extractors import extraction_version
+from .gemini_parser import process_resumes
+from .models import IngestionJob, IngestionTask, ResumeDocument
+from .parse_cache import HashingFile
+from .persistence import build_candidates, insert_candidates
+from .reextraction import build_document
+from .write_queue import write
+
+PENDING = IngestionJob.STATUS_PENDING
+RUNNING = IngestionJob.STATUS_RUNNING
+COMPLETED = IngestionJob.STATUS_COMPLETED
+FAILED = IngestionJob.STATUS_FAILED
+
+# Tasks written at a time while a batch is being stored.
+ENQUEUE_BATCH_SIZE = 32
+
+
+def enqueue_resumes(job, user, resume_files, total_files=None):
+    """
+    Stores the uploaded files and creates one pending task per file.
+    `resume_files` can be any iterable (such as the members of an archive)
+    if `total_files` gives its length. Tasks are written ENQUEUE_BATCH_SIZE
+    at a time, so workers can start on a large archive while the rest of it
+    is still being stored.
+    Returns the IngestionJob that tracks the batch.
+    """
+    # Saved together with the first tasks, so a small upload is one write.
+    ingestion_job = IngestionJob(
+        job=job,
+        created_by=user,
+        total_files=len(resume_files) if total_files is None else total_files,
+    )
+    queued = 0
+    tasks = []
+    try:
+        for resume_file in resume_files:
+            task = IngestionTask(original_name=resume_file.name)
+            content_hash = getattr(resume_file, 'content_hash', None)
+            if content_hash:
+                # Hashed by the upload handler already. Saving the upload itself
+                # lets FileSystemStorage move a TemporaryUploadedFile into place
+                # instead of copying it.
+                task.resume_file.save(resume_file.name, resume_file, save=False)
+            else:
+                # FileField.save streams the file to storage chunk by chunk; the
+                # wrapper hashes each chunk on the way so the parse cache can be
+                # checked without reading the file again.
+                hashing_file = HashingFile(resume_file)
+                task.resume_file.save(resume_file.name, hashing_file, save=False)
+                content_hash = hashing_file.hexdigest()
+            task.content_hash = content_hash
+            tasks.append(task)
+            if len(tasks) >= ENQUEUE_BATCH_SIZE:
+                queued += _queue_tasks(ingestion_job, tasks)
+    finally:
+        if tasks or ingestion_job.pk is None:
+            queued += _queue_tasks(ingestion_job, tasks)
+        if queued != ingestion_job.total_files:
+            # Reading the files failed part-way (or there were fewer than
+            # announced): only wait for the ones that were queued.
+            ingestion_job.total_files = queued
+            write(_resize_job, ingestion_job.id, queued)
+    return ingestion_job
+
+
+def _queue_tasks(ingestion_job, tasks):
+    write(_insert_tasks, ingestion_job, list(tasks))
+    count = len(tasks)
+    tasks.clear()
+    return count
+
+
+def _insert_tasks(ingestion_job, tasks):
+    if ingestion_job.pk is None:
+        ingestion_job.save()
+    for task in tasks:
+        task.ingestion_job = ingestion_job
+    IngestionTask.objects.bulk_create(tasks)
+
+
+def _resize_job(ingestion_job_id, total_files):
+    IngestionJob.objects.filter(id=ingestion_job_id).update(total_files=total_files)
+    _finalize_job(ingestion_job_id)
+
+
+def claim_tasks(worker_id, limit=1):
+    """
+    Atomically claims up to `limit` of the oldest pending tasks for this worker.
+    The conditional UPDATE guarantees two workers never claim the same row.
+    """
+    return write(_claim_tasks, worker_id, limit)
+
+
+def _claim_tasks(worker_id, limit):
+    requeue_stale_tasks()
+    task_ids = list(
+        IngestionTask.objects.filter(status=PENDING)
+        .order_by('id')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not task_ids:
+        return []
+    claimed_at = timezone.now()
+    IngestionTask.objects.filter(id__in=task_ids, status=PENDING).update(
+        status=RUNNING,
+        worker_id=worker_id,
+        claimed_at=claimed_at,
+        attempts=F('attempts') + 1,
+    )
+    # Rows another worker got to first keep that worker's id, so this only
+    # returns the tasks we actually won.
+    tasks = list(
+        IngestionTask.objects.select_related('ingestion_job', 'ingestion_job__job')
+        .filter(id__in=task_ids, status=RUNNING, worker_id=worker_id, claimed_at=claimed_at)
+        .order_by('id')
+    )
+    IngestionJob.objects.filter(
+        id__in={task.ingestion_job_id for task in tasks},
+        status=PENDING,
+    ).update(status=RUNNING)
+    return tasks
+
+
+def requeue_stale_tasks():
+    """
+    Puts tasks back in the queue when the worker that claimed them died
+    (e.g. the process was restarted mid-conversion). A worker that was only
+    slow loses its claim too: its results are dropped when it tries to save
+    them (see `_commit_results`).
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.INGESTION_STALE_AFTER)
+    stale = IngestionTask.objects.filter(status=RUNNING, claimed_at__lt=cutoff)
+    stale.filter(attempts__lt=settings.INGESTION_MAX_ATTEMPTS).update(status=PENDING, worker_id='')
+    for task in stale.filter(attempts__gte=settings.INGESTION_MAX_ATTEMPTS):
+        _finish_task(task, FAILED, error='Worker stopped responding while processing this file.')
+
+
+def run_tasks(tasks):
+    """
+    Parses a batch of resumes together (see `process_resumes`) and saves the
+    extracted candidates of each one.
+    """
+    ready = []
+    for task in tasks:
+        if not task.resume_file or not task.resume_file.storage.exists(task.resume_file.name):
+            _finish_task(task, FAILED, error="Uploaded file is missing.")
+            continue
+        ready.append(task)
+
+    # The stored files are passed as they are, so Docling reads them straight
+    # from their path in MEDIA_ROOT (see `_conversion_source`).
+    resume_files = [task.resume_file for task in ready]
+    try:
+        results = process_resumes(resume_files, [task.content_hash for task in ready])
+    except Exception as e:
+        print(f"Error processing ingestion tasks {[task.id for task in ready]}: {e}")
+        retry = [task for task in ready if task.attempts < settings.INGESTION_MAX_ATTEMPTS]
+        if retry:
+            # Leave the stored files in place so the next attempt can pick them up.
+            write(_requeue_tasks, retry, str(e))
+        for task in ready:
+            if task.attempts >= settings.INGESTION_MAX_ATTEMPTS:
+                _finish_task(task, FAILED, error=str(e))
+        return
+    finally:
+        for resume_file in resume_files:
+            resume_file.close()
+
+    _save_results(ready, results)
+
+
+def _requeue_tasks(tasks, error):
+    _claimed(*tasks).update(status=PENDING, worker_id='', error=error)
+
+
+def _claimed(*tasks):
+    """
+    The rows of `tasks` that are still running under the claim these
+    instances were loaded with. A task requeued as stale, and possibly
+    claimed again by another worker since, no longer matches.
+    """
+    condition = Q()
+    for task in tasks:
+        condition |= Q(id=task.id, worker_id=task.worker_id, claimed_at=task.claimed_at)
+    return IngestionTask.objects.filter(condition, status=RUNNING)
+
+
+def _save_results(tasks, results):
+    """
+    Saves the candidates of every successfully parsed task in the batch with
+    one bulk insert, committed together with the tasks' new status. Only the
+    tasks this worker still holds are saved (see `_commit_results`), so a
+    task that was requeued as stale and run again elsewhere doesn't get its
+    candidates inserted twice. Each resume is also kept as a ResumeDocument,
+    for re-extraction (see reextraction.py).
+    """
+    completed = []
+    finished_at = timezone.now()
+    version = extraction_version()
+    for task, (parsed_data, raw_output, markdown) in zip(tasks, results):
+        if not parsed_data:
+            _finish_task(task, FAILED, raw_output=raw_output or '', error='No candidate data could be extracted.')
+            continue
+        ingestion_job = task.ingestion_job
+        task_candidates, warnings = build_candidates(
+            parsed_data, task.original_name, ingestion_job.job, ingestion_job.created_by, resume_text=markdown
+        )
+        document = build_document(
+            ingestion_job.job, ingestion_job.created_by, task.original_name, task.content_hash,
+            markdown, parsed_data, raw_output, version,
+        )
+        for candidate in task_candidates:
+            candidate.document = document
+        task.status = COMPLETED
+        task.finished_at = finished_at
+        task.raw_output = raw_output or ''
+        task.parsed_data = parsed_data
+        task.candidates_created = len(task_candidates)
+        task.error = ' '.join(warnings)
+        completed.append((task, document, task_candidates))
+
+    if not completed:
+        return
+    saved = write(_commit_results, completed)
+    for task in saved:
+        task.resume_file.delete(save=False)
+
+
+def _commit_results(completed):
+    """
+    Completes each `(task, document, candidates)` of `completed` with a
+    conditional UPDATE that only matches while the task is still claimed
+    by this worker, then inserts the documents and candidates of the tasks
+    that matched. Returns those tasks; the others were taken away from this
+    worker and their results are dropped.
+    """
+    saved = []
+    documents = []
+    candidates = []
+    for task, document, task_candidates in completed:
+        owned = _claimed(task).update(
+            status=task.status,
+            finished_at=task.finished_at,
+            raw_output=task.raw_output,
+            parsed_data=task.parsed_data,
+            candidates_created=task.candidates_created,
+            error=task.error,
+        )
+        if not owned:
+            print(f"Ingestion task {task.id} was requeued while it ran; dropping its results.")
+            continue
+        saved.append(task)
+        documents.append(document)
+        candidates.extend(task_candidates)
+    ResumeDocument.objects.bulk_create(documents)
+    insert_candidates(candidates)
+    for ingestion_job_id in {task.ingestion_job_id for task in saved}:
+        _finalize_job(ingestion_job_id)
+    return saved
+
+
+def _finish_task(task, status, **fields):
+    task.status = status
+    task.finished_at = timezone.now()
+    for name, value in fields.items():
+        setattr(task, name, value)
+    if write(_save_finished_task, task, ['status', 'finished_at', *fields]):
+        # The stored upload is only needed while the task can still be retried.
+        task.resume_file.delete(save=False)
+
+
+def _save_finished_task(task, fields):
+    # Like `_commit_results`, leaves a task alone once another worker holds it.
+    if not _claimed(task).update(**{name: getattr(task, name) for name in fields}):
+        return False
+    _finalize_job(task.ingestion_job_id)
+    return True
+
+
+def _finalize_job(ingestion_job_id):
+    """
+    Marks the batch as finished once none of its tasks are waiting or running.
+    """
+    tasks = IngestionTask.objects.filter(ingestion_job_id=ingestion_job_id)
+    if tasks.filter(status__in=[PENDING, RUNNING]).exists():
+        return
+    # Workers can finish the first files of a large batch before the rest
+    # have been queued.
+    total_files = IngestionJob.objects.filter(id=ingestion_job_id).values_list('total_files', flat=True).first()
+    if total_files and tasks.count() < total_files:
+        return
+    status = COMPLETED if tasks.filter(status=COMPLETED).exists() else FAILED
+    IngestionJob.objects.filter(id=ingestion_job_id).update(status=status, finished_at=timezone.now())
+
+
+def job_progress(ingestion_job):
+    """
+    Summarizes a batch for the status endpoint.
+    """
+    counts = {PENDING: 0, RUNNING: 0, COMPLETED: 0, FAILED: 0}
+    candidates_created = 0
+    status_counts = (
+        ingestion_job.tasks.values_list('status')
+        .annotate(count=Count('id'), candidates=Sum('candidates_created'))
+        .order_by()
+    )
+    for status, count, candidates in status_counts:
+        counts[status] = count
+        candidates_created += candidates or 0
+    total = ingestion_job.total_files
+    done = counts[COMPLETED] + counts[FAILED]
+    return {
+        'id': ingestion_job.id,
+        'job_id': ingestion_job.job_id,
+        'status': ingestion_job.status,
+        'total': total,
+        'pending': counts[PENDING],
+        'running': counts[RUNNING],
+        'completed': counts[COMPLETED],
+        'failed': counts[FAILED],
+        'candidates_created': candidates_created,
+        'progress': round(100 * done / total) if total else 100,
+        'finished': ingestion_job.status in (COMPLETED, FAILED),
+    }
+
+
+def _millis(start, end):
+    if start is None or end is None:
+        return None
+    return round((end - start).total_seconds() * 1000)
+
+
+def task_result(task, created_at):
+    """
+    The result record of one finished task, as sent by `stream_results`.
+    """
+    return {
+        'type': 'file',
+        'task_id': task.id,
+        'file': task.original_name,
+        'status': task.status,
+        'candidates_created': task.candidates_created,
+        'attempts': task.attempts,
+        'error': task.error or None,
+        'raw_output': task.raw_output or None,
+        'parsed_data': task.parsed_data,
+        'queued_ms': _millis(created_at, task.claimed_at),
+        'processing_ms': _millis(task.claimed_at, task.finished_at),
+    }
+
+
+def stream_results(ingestion_job, poll_interval=None, timeout=None):
+    """
+    Yields a result record for each file of the batch as soon as it is
+    finished (completed or failed), with a progress record after every
+    change, and a final 'done' record.
+
+    Only the ids of the tasks already sent are kept between polls, and each
+    finished task is loaded once, so memory does not grow with the size of
+    the results. Stops with a 'timeout' record after `timeout` seconds.
+    """
+    poll_interval = poll_interval or settings.INGESTION_STREAM_POLL_INTERVAL
+    timeout = timeout or settings.INGESTION_STREAM_TIMEOUT
+    deadline = time.monotonic() + timeout
+    sent = set()
+    last_progress = None
+    while True:
+        finished = ingestion_job.tasks.filter(status__in=[COMPLETED, FAILED]).values_list('id', flat=True)
+        new_ids = sorted(set(finished) - sent)
+        for task_id in new_ids:
+            task = IngestionTask.objects.filter(id=task_id).first()
+            if task is not None:
+                yield task_result(task, ingestion_job.created_at)
+            sent.add(task_id)
+
+        ingestion_job.refresh_from_db(fields=['status', 'finished_at'])
+        progress = job_progress(ingestion_job)
+        if progress != last_progress:
+            yield {'type': 'progress', **progress}
+            last_progress = progress
+        if progress['finished']:
+            yield {'type': 'done', **progress}
+            return
+        if time.monotonic() >= deadline:
+            yield {'type': 'timeout', **progress}
+            return
+        time.sleep(poll_interval)
+
+
+class IngestionWorkerPool:
+    """
+    A set of daemon threads that keep claiming and running tasks until stopped.
+    """
+
+    def __init__(self, size=None, batch_size=None, poll_interval=None):
+        self.size = size or settings.INGESTION_WORKERS
+        self.batch_size = batch_size or settings.INGESTION_BATCH_SIZE
+        self.poll_interval = poll_interval or settings.INGESTION_POLL_INTERVAL
+        self._stop = threading.Event()
+        self._starter = None
+        self._threads = []
+
+    def start(self):
+        """
+        Returns right away. Warming the Docling workers takes a while (they
+        load their models), so a background thread does it and only then
+        starts the threads that claim tasks: tasks stay pending, and free
+        for other workers, until this pool can convert them.
+        """
+        self._starter = threading.Thread(target=self._start_workers, name='ingestion-starter', daemon=True)
+        self._starter.start()
+
+    def wait_started(self, timeout=None):
+        """
+        Waits until the worker threads have started (or starting failed).
+        """
+        if self._starter is not None:
+            self._starter.join(timeout)
+        return bool(self._threads)
+
+    def _start_workers(self):
+        try:
+            get_converter_pool()
+        except Exception as e:
+            # Nothing was claimed; the next upload tries again.
+            print(f"Could not start the Docling converter pool: {e}")
+            return
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for i in range(self.size):
+            if self._stop.is_set():
+                return
+            thread = threading.Thread(
+                target=self._work,
+                args=(f"{prefix}:{i}",),
+                name=f"ingestion-worker-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._starter is not None:
+            self._starter.join(timeout)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def is_alive(self):
+        threads = self._threads + ([self._starter] if self._starter is not None else [])
+        return any(thread.is_alive() for thread in threads)
+
+    def _work(self, worker_id):
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                tasks = claim_tasks(worker_id, self.batch_size)
+                if not tasks:
+                    self._stop.wait(self.poll_interval)
+                    continue
+                run_tasks(tasks)
+            except Exception as e:
+                print(f"Ingestion worker {worker_id} error: {e}")
+                self._stop.wait(self.poll_interval)
+        close_old_connections()
+
+
+_local_pool = None
+_local_pool_lock = threading.Lock()
+
+
+def ensure_local_workers():
+    """
+    Starts the in-process worker pool the first time it is needed, without
+    waiting for its converter pool to warm up (see `IngestionWorkerPool.start`),
+    so uploads still return immediately.
+    Does nothing when INGESTION_RUN_IN_PROCESS is off and a separate
+    `run_ingestion_workers` process is expected to do the work instead.
+    """
+    global _local_pool
+    if not settings.INGESTION_RUN_IN_PROCESS:
+        return
+    with _local_pool_lock:
+        if _local_pool is None or not _local_pool.is_alive():
+            _local_pool = IngestionWorkerPool()
+            _local_pool.start()
+
@@ -0,0 +1,82 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from parser.autocomplete import lookup, suggest
+from parser.benchdata import create_bench_job, fake_candidate
+from parser.models import AutocompleteTerm, Candidate
+from parser.search import FILTER_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures autocomplete latency (p50/p95/p99) for a job with --rows candidates, "
+        "uncached and cached. Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('--target-ms', type=float, default=25.0, help="Fail if the uncached p99 exceeds this.")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            p99 = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        if p99 > options['target_ms']:
+            raise CommandError(f"Uncached p99 of {p99:.2f} ms is over the {options['target_ms']} ms target.")
+        self.stdout.write(self.style.SUCCESS(f"Uncached p99 {p99:.2f} ms is within the {options['target_ms']} ms target."))
+
+    def _run(self, options):
+        random.seed(42)
+        user = User.objects.create_user('bench')
+        job = create_bench_job(user)
+
+        started = time.perf_counter()
+        for offset in range(0, options['rows'], 5000):
+            batch = min(5000, options['rows'] - offset)
+            Candidate.objects.bulk_create(fake_candidate(job, user) for _ in range(batch))
+        self.stdout.write(
+            f"Inserted {options['rows']} candidates in {time.perf_counter() - started:.1f}s "
+            f"({AutocompleteTerm.objects.filter(job=job).count()} distinct terms)."
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        # What someone typing would send: 1-4 character prefixes of real values.
+        values = {
+            field: list(AutocompleteTerm.objects.filter(job=job, field=field).values_list('value', flat=True))
+            for field in FILTER_FIELDS
+        }
+        queries = []
+        for _ in range(options['queries']):
+            field = random.choice([field for field in FILTER_FIELDS if values[field]])
+            queries.append((field, random.choice(values[field])[:random.randint(1, 4)]))
+
+        self.stdout.write(f"{'':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        uncached = self._measure('uncached', [lambda f=f, t=t: lookup(job.id, f, t) for f, t in queries])
+        cache.clear()
+        for field, term in queries:
+            suggest(job.id, field, term)
+        self._measure('cached', [lambda f=f, t=t: suggest(job.id, f, t) for f, t in queries])
+        return uncached
+
+    def _measure(self, label, calls):
+        timings = []
+        for call in calls:
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        percentiles = statistics.quantiles(timings, n=100)
+        p99 = percentiles[98]
+        self.stdout.write(
+            f"{label:<10} {statistics.median(timings):>8.2f} {percentiles[94]:>8.2f} {p99:>8.2f} {max(timings):>8.2f}"
+        )
+        return p99
@@ -0,0 +1,73 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from parser.converter_pool import ConversionError, ConverterPool
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks parallel Docling conversion of a resume corpus with "
+        "different numbers of worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus',
+            default=str(settings.SAMPLE_RESUMES_DIR),
+            help="Directory of resumes to convert (defaults to dummy_resumes/).",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            nargs='+',
+            default=[1, 2, 4, 8],
+            help="Pool sizes to compare.",
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1,
+            help="Convert the corpus this many times per pool size, to smooth out noise.",
+        )
+
+    def handle(self, *args, **options):
+        corpus = options['corpus']
+        if not os.path.isdir(corpus):
+            raise CommandError(f"Corpus directory not found: {corpus}")
+        files = sorted(
+            os.path.join(corpus, name) for name in os.listdir(corpus)
+            if not name.startswith('.') and os.path.isfile(os.path.join(corpus, name))
+        )
+        if not files:
+            raise CommandError(f"No files found in {corpus}")
+        sources = files * options['repeat']
+
+        self.stdout.write(f"Converting {len(sources)} files from {corpus} (cpu_count={os.cpu_count()})\n")
+        self.stdout.write(f"{'workers':>8} {'seconds':>9} {'files/s':>9} {'speedup':>8} {'failed':>7}")
+
+        baseline = None
+        for size in options['workers']:
+            pool = ConverterPool(size=size, timeout=settings.DOCLING_CONVERSION_TIMEOUT)
+            # Model loading is a one-off cost of the pool, so keep it out of the timing.
+            pool.start()
+            try:
+                started = time.perf_counter()
+                results = pool.convert_many(sources)
+                elapsed = time.perf_counter() - started
+            finally:
+                pool.close()
+
+            failed = [
+                (source, result) for source, result in zip(sources, results)
+                if isinstance(result, ConversionError)
+            ]
+            baseline = baseline or elapsed
+            self.stdout.write(
+                f"{size:>8} {elapsed:>9.2f} {len(sources) / elapsed:>9.2f} "
+                f"{baseline / elapsed:>7.2f}x {len(failed):>7}"
+            )
+            for source, error in failed:
+                self.stdout.write(self.style.WARNING(f"    {os.path.basename(source)}: {error}"))
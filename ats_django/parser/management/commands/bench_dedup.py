@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from parser import dedup
+from parser.benchdata import FILLER, create_bench_job, fake_candidate
+from parser.models import Candidate, CandidateSignature
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures near-duplicate detection per new resume as the number of "
+        "stored signatures grows: latency, the share of edited re-uploads "
+        "flagged against their original and the fresh resumes wrongly flagged. "
+        "The bulk of the stored signatures are random, i.e. unrelated resumes. "
+        "Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stored', type=int, nargs='+', default=[10000, 100000, 1000000])
+        parser.add_argument('--uploads', type=int, default=100, help="Edited copies and fresh resumes, each.")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _resume(self, job, user):
+        candidate = fake_candidate(job, user)
+        candidate.resume_text += '\n\n' + ' '.join(random.choices(FILLER, k=300))
+        return candidate
+
+    def _edit(self, original, job, user):
+        """
+        A re-upload of `original` with a few words changed and a line added.
+        """
+        words = original.resume_text.split(' ')
+        for index in random.sample(range(len(words)), 4):
+            words[index] = random.choice(FILLER)
+        copy = fake_candidate(job, user)
+        copy.first_name, copy.last_name = original.first_name, original.last_name
+        copy.resume_text = ' '.join(words) + '\n\nReferences available on request.'
+        return copy
+
+    def _fill(self, job, user, count, generator):
+        """
+        Stores `count` candidates with random signatures and their buckets.
+        """
+        for start in range(0, count, 5000):
+            batch = min(5000, count - start)
+            with transaction.atomic():
+                candidates = Candidate.objects.bulk_create(fake_candidate(job, user) for _ in range(batch))
+                ids = [candidate.pk for candidate in candidates]
+                signatures = generator.integers(0, 1 << 32, size=(batch, settings.DEDUP_NUM_PERM), dtype=np.uint32)
+                CandidateSignature.objects.bulk_create(
+                    CandidateSignature(candidate_id=candidate_id, job=job, minhash=signature.tobytes())
+                    for candidate_id, signature in zip(ids, signatures)
+                )
+                with connection.cursor() as cursor:
+                    dedup.insert_buckets(cursor, ids, dedup.band_keys(signatures))
+
+    def _run(self, options):
+        random.seed(42)
+        generator = np.random.default_rng(42)
+        user = User.objects.create_user('bench')
+        job = create_bench_job(user)
+
+        originals = Candidate.objects.bulk_create(self._resume(job, user) for _ in range(options['uploads']))
+        dedup.index_new_candidates([candidate.pk for candidate in originals])
+        stored = len(originals)
+
+        self.stdout.write(
+            f"{'stored':>9}  {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'edits flagged':>14} {'fresh flagged':>14}"
+        )
+        for target in sorted(options['stored']):
+            self._fill(job, user, target - stored, generator)
+            stored = target
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            uploads = [(self._edit(original, job, user), original.pk) for original in originals]
+            uploads += [(self._resume(job, user), None) for _ in range(options['uploads'])]
+            random.shuffle(uploads)
+            latencies = []
+            found = wrong = 0
+            for candidate, original_id in uploads:
+                candidate.save()
+                started = time.perf_counter()
+                dedup.index_new_candidates([candidate.pk])
+                latencies.append((time.perf_counter() - started) * 1000)
+                duplicate_of = CandidateSignature.objects.get(candidate=candidate).duplicate_of_id
+                if original_id is None:
+                    wrong += duplicate_of is not None
+                else:
+                    found += duplicate_of == original_id
+            # The edits of this round become stored duplicates for the next one.
+            stored += len(uploads)
+
+            latencies.sort()
+            self.stdout.write(
+                f"{target:>9}  {statistics.median(latencies):>8.2f} "
+                f"{latencies[int(len(latencies) * 0.95) - 1]:>8.2f} {latencies[-1]:>8.2f} "
+                f"{found:>8}/{len(originals):<5} {wrong:>8}/{options['uploads']:<5}"
+            )
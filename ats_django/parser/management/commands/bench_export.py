@@ -0,0 +1,85 @@
+import random
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from parser.benchdata import create_bench_job, fake_candidate
+from parser.models import Candidate
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the candidate export endpoint at several table sizes: time to "
+        "the first byte and the first row, total time, and peak Python memory "
+        "while streaming. Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100, 100000, 1000000])
+        parser.add_argument('--formats', nargs='+', default=['csv', 'jsonl'], choices=['csv', 'jsonl'])
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(ALLOWED_HOSTS=['localhost'], QUERY_BUDGET_MODE='off'):
+                self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, options):
+        random.seed(42)
+        user = User.objects.create_user('bench')
+        job = create_bench_job(user)
+        client = Client(SERVER_NAME='localhost')
+        client.force_login(user)
+
+        self.stdout.write(
+            f"{'rows':>9}  {'format':<6} {'first byte ms':>14} {'first row ms':>13} {'total s':>8} "
+            f"{'rows/s':>9} {'MB':>8} {'peak MiB':>9}"
+        )
+        inserted = 0
+        for target in sorted(options['rows']):
+            while inserted < target:
+                batch = min(5000, target - inserted)
+                Candidate.objects.bulk_create(fake_candidate(job, user) for _ in range(batch))
+                inserted += batch
+            for export_format in options['formats']:
+                url = f"{reverse('export_candidates')}?job_id={job.id}&format={export_format}"
+                first_byte, first_row, total, size = self._stream(client, url)
+                # A second pass under tracemalloc (which slows Python down) for the peak memory.
+                tracemalloc.start()
+                self._stream(client, url)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self.stdout.write(
+                    f"{target:>9}  {export_format:<6} {first_byte * 1000:>14.2f} {first_row * 1000:>13.2f} "
+                    f"{total:>8.2f} {target / total:>9.0f} {size / 1e6:>8.1f} {peak / 2 ** 20:>9.2f}"
+                )
+
+    def _stream(self, client, url):
+        """
+        Requests `url` and reads the streamed body. Returns the seconds to
+        the first chunk, to the first chunk holding a row, and to the end,
+        and the body size in bytes.
+        """
+        started = time.perf_counter()
+        response = client.get(url)
+        first_byte = first_row = None
+        size = 0
+        lines = 0
+        for chunk in response.streaming_content:
+            now = time.perf_counter() - started
+            if first_byte is None:
+                first_byte = now
+            size += len(chunk)
+            lines += chunk.count(b'\n')
+            # The CSV header is a line of its own; JSON Lines have none.
+            if first_row is None and lines > (1 if url.endswith('csv') else 0):
+                first_row = now
+        response.close()
+        return first_byte, first_row or 0.0, time.perf_counter() - started, size
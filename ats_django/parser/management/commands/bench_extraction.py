@@ -0,0 +1,189 @@
+import json
+import os
+import re
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from parser import gemini_async
+from parser.converter_pool import ConversionError, get_converter_pool
+from parser.extractors import FIELDS, LLMExtractor, RuleBasedExtractor, TieredExtractor
+from parser.gemini_stub import GeminiStubServer
+
+LABELS_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'sample_resume_fields.json')
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the rule-based extractor against the hand-labelled sample "
+        "resumes (parser/data/sample_resume_fields.json): accuracy, confidence "
+        "and escalation rate per field, and its latency. Then compares the "
+        "tiered extractor with sending everything to Gemini, by requests and "
+        "wall time, using the local stub unless --live is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus',
+            default=str(settings.SAMPLE_RESUMES_DIR),
+            help="Directory of labelled resumes (defaults to dummy_resumes/).",
+        )
+        parser.add_argument(
+            '--markdown-dir',
+            help="Read <file name>.md from this directory instead of converting the resumes with Docling.",
+        )
+        parser.add_argument('--repeat', type=int, default=20, help="Passes over the corpus when timing the rules.")
+        parser.add_argument('--latency', type=float, default=0.5, help="Seconds the Gemini stub waits per request.")
+        parser.add_argument('--live', action='store_true', help="Use the real Gemini API instead of the stub.")
+        parser.add_argument('--output', help="Also save the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        with open(LABELS_PATH) as f:
+            labels = json.load(f)
+        documents = self._load(labels, options)
+        if not documents:
+            raise CommandError("None of the labelled resumes could be read.")
+        names = sorted(documents)
+        contents = [documents[name] for name in names]
+        threshold = settings.EXTRACTION_CONFIDENCE_THRESHOLD
+
+        rules = RuleBasedExtractor()
+        extracted = {name: rules.extract(documents[name]) for name in names}
+        timings = []
+        for _ in range(options['repeat']):
+            for content in contents:
+                started = time.perf_counter()
+                rules.extract(content)
+                timings.append((time.perf_counter() - started) * 1000)
+
+        fields = {}
+        for field in FIELDS:
+            correct = kept = kept_correct = 0
+            scores = []
+            for name in names:
+                values, confidence = extracted[name]
+                match = field_matches(labels[name][field], values[field])
+                correct += match
+                scores.append(confidence[field])
+                if confidence[field] >= threshold:
+                    kept += 1
+                    kept_correct += match
+            fields[field] = {
+                'accuracy': correct / len(names),
+                'mean_confidence': statistics.fmean(scores),
+                'escalated': 1 - kept / len(names),
+                'accuracy_kept': kept_correct / kept if kept else None,
+            }
+        resolved = sum(
+            all(score >= threshold for score in extracted[name][1].values()) for name in names
+        )
+        results = {
+            'documents': len(names),
+            'threshold': threshold,
+            'fields': fields,
+            'resolved_by_rules': resolved,
+            'rules_ms': {
+                'p50': statistics.median(timings),
+                'p95': sorted(timings)[min(len(timings) - 1, int(0.95 * len(timings)))],
+            },
+            'comparison': self._compare(contents, options),
+        }
+        self._show(results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\nSaved results to {options['output']}"))
+
+    def _load(self, labels, options):
+        """
+        Returns {file name: markdown} for the labelled resumes found.
+        """
+        documents = {}
+        if options['markdown_dir']:
+            for name in labels:
+                path = os.path.join(options['markdown_dir'], f"{name}.md")
+                if os.path.exists(path):
+                    with open(path, encoding='utf-8') as f:
+                        documents[name] = f.read()
+        else:
+            paths = {name: os.path.join(options['corpus'], name) for name in labels}
+            paths = {name: path for name, path in paths.items() if os.path.exists(path)}
+            conversions = get_converter_pool().convert_many(list(paths.values()))
+            for name, conversion in zip(paths, conversions):
+                if isinstance(conversion, ConversionError):
+                    self.stderr.write(f"Skipping {name}: {conversion}")
+                else:
+                    documents[name] = conversion.markdown
+        missing = sorted(set(labels) - set(documents))
+        if missing:
+            self.stdout.write(f"Not found, skipped: {', '.join(missing)}")
+        return documents
+
+    def _compare(self, contents, options):
+        """
+        Extracts the corpus with Gemini alone and with the tiered extractor,
+        counting requests and wall time. Rate limits are lifted for the stub
+        so the times measure round trips, not throttling.
+        """
+        stub = None
+        overrides = {}
+        if not options['live']:
+            stub = GeminiStubServer(latency=options['latency']).start()
+            overrides = dict(
+                GEMINI_API_BASE=stub.url,
+                GEMINI_REQUESTS_PER_MINUTE=10 ** 9, GEMINI_TOKENS_PER_MINUTE=10 ** 12,
+            )
+        comparison = {}
+        try:
+            with override_settings(**overrides):
+                for label, extractor in (('llm_only', LLMExtractor()), ('tiered', TieredExtractor())):
+                    calls_before = gemini_async.stats()['calls']
+                    started = time.perf_counter()
+                    results = extractor.extract_many(contents)
+                    comparison[label] = {
+                        'requests': gemini_async.stats()['calls'] - calls_before,
+                        'seconds': time.perf_counter() - started,
+                        'failures': sum(parsed_data is None for parsed_data, raw_output in results),
+                    }
+        finally:
+            if stub is not None:
+                stub.stop()
+        return comparison
+
+    def _show(self, results):
+        self.stdout.write(
+            f"{results['documents']} labelled resumes, threshold {results['threshold']}; "
+            f"{results['resolved_by_rules']} resolved by the rules alone.\n"
+        )
+        self.stdout.write(f"{'field':<16} {'accuracy':>9} {'confidence':>11} {'escalated':>10} {'acc. kept':>10}")
+        for field, data in results['fields'].items():
+            kept = f"{data['accuracy_kept']:>10.0%}" if data['accuracy_kept'] is not None else f"{'-':>10}"
+            self.stdout.write(
+                f"{field:<16} {data['accuracy']:>9.0%} {data['mean_confidence']:>11.2f} {data['escalated']:>10.0%} {kept}"
+            )
+        self.stdout.write(
+            f"\nRules: p50 {results['rules_ms']['p50']:.3f} ms, p95 {results['rules_ms']['p95']:.3f} ms per resume"
+        )
+        self.stdout.write(f"\n{'extractor':<10} {'requests':>9} {'seconds':>8} {'failures':>9}")
+        for label, data in results['comparison'].items():
+            self.stdout.write(f"{label:<10} {data['requests']:>9} {data['seconds']:>8.2f} {data['failures']:>9}")
+
+
+def _tokens(text):
+    return set(re.findall(r"\w+", (text or '').lower()))
+
+
+def field_matches(expected, actual):
+    """
+    Whether an extracted value agrees with the label, ignoring case and
+    punctuation: both empty, or one's words mostly contained in the other's
+    ("NSCC, Ivany Campus" still matches "NSCC").
+    """
+    expected, actual = _tokens(expected), _tokens(actual)
+    if not expected or not actual:
+        return expected == actual
+    smaller, larger = sorted((expected, actual), key=len)
+    return smaller <= larger and len(smaller) >= len(larger) / 2
@@ -0,0 +1,117 @@
+import math
+import random
+import time
+from collections import Counter
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from parser import matching
+from parser.benchdata import create_bench_job, fake_candidate
+from parser.models import Candidate, JobScoringProfile
+
+DESCRIPTION = (
+    "Backend developer to build and maintain Django services. Python and SQL required; "
+    "experience with Kubernetes, React and C# is an asset. You will design reports, "
+    "improve systems and support customers."
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Times match scoring at several job sizes: a full rescore, the sparse "
+        "matrix scoring of tokenized resumes against the same scores computed one "
+        "candidate at a time in Python, and the incremental scoring of a new "
+        "upload. Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--upload', type=int, default=20, help="Candidates in the incremental upload.")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, options):
+        random.seed(42)
+        user = User.objects.create_user('bench')
+        job = create_bench_job(user)
+        job.description = DESCRIPTION
+        job.save()
+
+        self.stdout.write(
+            f"{'rows':>9}  {'full s':>8} {'tokenize ms':>12} {'matrix ms':>10} {'loop ms':>9} {'speedup':>8} {'max diff':>9} "
+            f"{'upload ms':>10}"
+        )
+        inserted = 0
+        for target in sorted(options['rows']):
+            while inserted < target:
+                batch = min(5000, target - inserted)
+                Candidate.objects.bulk_create(fake_candidate(job, user) for _ in range(batch))
+                inserted += batch
+
+            started = time.perf_counter()
+            matching.score_job(job)
+            full = time.perf_counter() - started
+
+            tokenize_ms, matrix_ms, loop_ms, difference = self._compare(job)
+
+            # Stays below the growth that would trigger a full rescore.
+            upload = Candidate.objects.bulk_create(fake_candidate(job, user) for _ in range(options['upload']))
+            inserted += len(upload)
+            started = time.perf_counter()
+            matching.score_new_candidates([candidate.pk for candidate in upload])
+            upload_ms = (time.perf_counter() - started) * 1000
+
+            self.stdout.write(
+                f"{target:>9}  {full:>8.2f} {tokenize_ms:>12.1f} {matrix_ms:>10.1f} {loop_ms:>9.1f} "
+                f"{loop_ms / matrix_ms:>7.1f}x {difference:>9.1e} {upload_ms:>10.1f}"
+            )
+
+    def _compare(self, job):
+        """
+        Scores the job's candidates from the same token lists as a matrix
+        product and as a per-candidate loop, WRITE_BATCH_SIZE candidates at a
+        time as score_job does. Returns the milliseconds spent tokenizing and
+        in each, and the largest difference between their scores and the
+        stored ones.
+        """
+        profile = JobScoringProfile.objects.get(job=job)
+        rows = list(matching._candidate_rows(job.candidates.order_by('id')))
+        stored = dict(job.candidate_matches.values_list('candidate_id', 'score'))
+        term_counts = Counter(matching.tokenize(job.description))
+        vocabulary = {term: column for column, term in enumerate(term_counts)}
+        query = matching.query_vector(term_counts, profile.document_frequency, profile.documents)
+        weights = dict(zip(term_counts, query))
+
+        tokenize_seconds = matrix_seconds = loop_seconds = 0.0
+        scores = []
+        loop_scores = []
+        for start in range(0, len(rows), matching.WRITE_BATCH_SIZE):
+            batch = rows[start:start + matching.WRITE_BATCH_SIZE]
+            started = time.perf_counter()
+            tokens = [matching.tokenize(text) for candidate_id, job_id, text in batch]
+            tokenize_seconds += time.perf_counter() - started
+
+            started = time.perf_counter()
+            scores.append(matching.token_matrix(tokens, vocabulary) @ query)
+            matrix_seconds += time.perf_counter() - started
+
+            started = time.perf_counter()
+            for document_tokens in tokens:
+                document = {term: 1 + math.log(count) for term, count in Counter(document_tokens).items()}
+                norm = math.sqrt(sum(weight * weight for weight in document.values()))
+                loop_scores.append(sum(weight * weights.get(term, 0) for term, weight in document.items()) / norm)
+            loop_seconds += time.perf_counter() - started
+
+        expected = np.array([stored[candidate_id] for candidate_id, job_id, text in rows])
+        difference = max(
+            np.abs(np.concatenate(scores) - expected).max(), np.abs(np.array(loop_scores) - expected).max(),
+        )
+        return tokenize_seconds * 1000, matrix_seconds * 1000, loop_seconds * 1000, difference
@@ -0,0 +1,223 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from parser.benchdata import create_bench_job
+from parser.converter_pool import _peak_rss_mb, get_converter_pool
+from parser.gemini_parser import process_resumes
+from parser.gemini_stub import GeminiStubServer
+from parser.persistence import build_candidates, insert_candidates
+
+# Stages in pipeline order, as recorded by process_resumes (plus the insert).
+# 'conversion' is the wall time of the batch's round trip to the Docling
+# pool; 'convert' and 'export' add up the files' time in Docling itself, so
+# with several workers they can exceed it; 'rules' is the local extractor,
+# and 'llm' only counts when fields were escalated to Gemini.
+STAGES = ['read', 'conversion', 'convert', 'export', 'rules', 'llm', 'json', 'db_insert', 'total']
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the resume corpus through process_resumes in batches, as the "
+        "ingestion workers do, with Gemini replaced by the deterministic local "
+        "stub. Each batch holds files of one format; its stage timings are "
+        "divided by its size and saved per format, as ms per file, with peak "
+        "memory, as JSON. Uses a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus',
+            default=str(settings.SAMPLE_RESUMES_DIR),
+            help="Directory of resumes to run (defaults to dummy_resumes/).",
+        )
+        parser.add_argument('--repeat', type=int, default=3, help="Timed passes over the corpus.")
+        parser.add_argument('--warmup', type=int, default=1, help="Untimed passes run first.")
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds the Gemini stub waits per request.")
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.INGESTION_BATCH_SIZE,
+            help="Files per process_resumes call (defaults to INGESTION_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            '--output',
+            help="Where to save the results (defaults to benchmarks/pipeline-<commit>.json).",
+        )
+        parser.add_argument('--compare', help="Earlier results file to compare the p50 timings against.")
+
+    def handle(self, *args, **options):
+        corpus = options['corpus']
+        if not os.path.isdir(corpus):
+            raise CommandError(f"Corpus directory not found: {corpus}")
+        files = []
+        for name in sorted(os.listdir(corpus)):
+            path = os.path.join(corpus, name)
+            if not name.startswith('.') and os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    files.append((name, f.read()))
+        if not files:
+            raise CommandError(f"No files found in {corpus}")
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        stub = GeminiStubServer(latency=options['latency']).start()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # No parse cache, so every pass goes through every stage; and no
+            # rate limits, so the LLM stage measures the round trip, not
+            # throttling. The Docling pool has its configured size, so a
+            # batch is converted in parallel as in the ingestion workers.
+            with override_settings(
+                GEMINI_API_BASE=stub.url, PARSE_CACHE_ENABLED=False,
+                GEMINI_REQUESTS_PER_MINUTE=10 ** 9, GEMINI_TOKENS_PER_MINUTE=10 ** 12,
+            ):
+                get_converter_pool()
+                results = self._run(files, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            stub.stop()
+
+        results.update({
+            'commit': _git_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'corpus': os.path.abspath(corpus),
+            'repeat': options['repeat'],
+            'batch_size': options['batch_size'],
+            'docling_pool_size': settings.DOCLING_POOL_SIZE,
+            'stub_latency': options['latency'],
+        })
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks', f"pipeline-{(results['commit'] or 'unknown')[:12]}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+        self._show(results, baseline)
+        self.stdout.write(self.style.SUCCESS(f"\nSaved results to {output}"))
+
+    def _run(self, files, options):
+        user = User.objects.create_user('bench')
+        job = create_bench_job(user)
+        timings = defaultdict(lambda: defaultdict(list))
+        failures = defaultdict(int)
+        worker_peak = 0.0
+
+        by_format = defaultdict(list)
+        for name, data in files:
+            by_format[os.path.splitext(name)[1].lstrip('.').lower() or 'none'].append((name, data))
+        batches = [
+            (file_format, group[start:start + options['batch_size']])
+            for file_format, group in by_format.items()
+            for start in range(0, len(group), options['batch_size'])
+        ]
+
+        for number in range(options['warmup'] + options['repeat']):
+            timed = number >= options['warmup']
+            for file_format, batch in batches:
+                stages = {}
+                started = time.perf_counter()
+                results = process_resumes([SimpleUploadedFile(name, data) for name, data in batch], timings=stages)
+                insert_started = time.perf_counter()
+                candidates = []
+                for (name, data), result in zip(batch, results):
+                    if result.parsed_data:
+                        candidates.extend(build_candidates(result.parsed_data, name, job, user)[0])
+                insert_candidates(candidates)
+                stages['db_insert'] = time.perf_counter() - insert_started
+                stages['total'] = time.perf_counter() - started
+                worker_peak = max(worker_peak, stages.pop('peak_rss_mb', 0.0))
+                if not timed:
+                    continue
+                failures[file_format] += sum(1 for result in results if not result.parsed_data)
+                for stage, seconds in stages.items():
+                    # Per file, so batches of different sizes compare.
+                    timings[file_format][stage].extend([seconds * 1000 / len(batch)] * len(batch))
+
+        formats = {}
+        for file_format in sorted(set(timings) | set(failures)):
+            formats[file_format] = {
+                'runs': len(timings[file_format]['total']),
+                'failures': failures[file_format],
+                'stages_ms': {
+                    stage: _summary(timings[file_format][stage])
+                    for stage in STAGES if timings[file_format][stage]
+                },
+            }
+        overall = defaultdict(list)
+        for stages in timings.values():
+            for stage, values in stages.items():
+                overall[stage].extend(values)
+        return {
+            'formats': formats,
+            'overall_ms': {stage: _summary(overall[stage]) for stage in STAGES if overall[stage]},
+            'peak_rss_mb': {'main': round(_peak_rss_mb(), 1), 'docling_worker': round(worker_peak, 1)},
+        }
+
+    def _show(self, results, baseline):
+        self.stdout.write(
+            f"p50 ms per stage (runs, failures); peak RSS {results['peak_rss_mb']['main']} MB main, "
+            f"{results['peak_rss_mb']['docling_worker']} MB Docling worker"
+        )
+        header = f"{'format':<8} {'runs':>5} {'fail':>5}" + ''.join(f" {stage:>10}" for stage in STAGES)
+        self.stdout.write(header)
+        rows = list(results['formats'].items()) + [('overall', {'runs': '', 'failures': '', 'stages_ms': results['overall_ms']})]
+        for file_format, data in rows:
+            cells = []
+            for stage in STAGES:
+                summary = data['stages_ms'].get(stage)
+                cells.append(f" {summary['p50']:>10.2f}" if summary else f" {'-':>10}")
+            self.stdout.write(f"{file_format:<8} {data['runs']:>5} {data['failures']:>5}" + ''.join(cells))
+
+        if baseline is None:
+            return
+        self.stdout.write(f"\nChange in p50 against {baseline.get('commit') or 'the baseline'}:")
+        self.stdout.write(f"{'format':<8}" + ''.join(f" {stage:>10}" for stage in STAGES))
+        old_rows = dict(baseline.get('formats', {}), overall={'stages_ms': baseline.get('overall_ms', {})})
+        for file_format, data in rows:
+            old = old_rows.get(file_format, {}).get('stages_ms', {})
+            cells = []
+            for stage in STAGES:
+                new_summary, old_summary = data['stages_ms'].get(stage), old.get(stage)
+                if new_summary and old_summary and old_summary['p50']:
+                    change = 100 * (new_summary['p50'] - old_summary['p50']) / old_summary['p50']
+                    cells.append(f" {change:>+9.1f}%")
+                else:
+                    cells.append(f" {'-':>10}")
+            self.stdout.write(f"{file_format:<8}" + ''.join(cells))
+
+
+def _summary(values):
+    values = sorted(values)
+    return {
+        'mean': round(statistics.fmean(values), 3),
+        'p50': round(statistics.median(values), 3),
+        'p95': round(values[min(len(values) - 1, int(0.95 * len(values)))], 3),
+        'min': round(values[0], 3),
+        'max': round(values[-1], 3),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
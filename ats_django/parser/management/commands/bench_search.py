@@ -0,0 +1,93 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from parser.benchdata import create_bench_job, fake_candidate
+from parser.models import Candidate
+from parser.search import INDEXED_FIELDS, search_candidates
+
+QUERIES = [
+    ('first_name', {'first_name': 'jen'}, ''),
+    ('degree_school', {'degree_school': 'univ of manit'}, ''),
+    ('degree + diploma_school', {'degree': 'computer', 'diploma_school': 'red river'}, ''),
+    ('free text', {}, 'kubernetes'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the FTS5 candidate search with the old chained __icontains (LIKE) filters "
+        "at several table sizes. Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query; the median is reported.")
+        parser.add_argument('--page-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, options):
+        random.seed(42)
+        user = User.objects.create_user('bench')
+        job = create_bench_job(user)
+
+        self.stdout.write(f"{'rows':>9}  {'query':<24} {'LIKE ms':>9} {'FTS ms':>9} {'speedup':>8} {'matches':>8}")
+        inserted = 0
+        for target in sorted(options['rows']):
+            while inserted < target:
+                batch = min(5000, target - inserted)
+                Candidate.objects.bulk_create(fake_candidate(job, user) for _ in range(batch))
+                inserted += batch
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            for label, filters, text in QUERIES:
+                base = Candidate.objects.filter(job=job)
+                like_ms, like_count = _time_page(_like_filter(base, filters, text), options)
+                fts_ms, fts_count = _time_page(search_candidates(base, filters, text)[0], options)
+                self.stdout.write(
+                    f"{target:>9}  {label:<24} {like_ms:>9.1f} {fts_ms:>9.1f} "
+                    f"{like_ms / fts_ms if fts_ms else 0:>7.1f}x {fts_count:>8}"
+                )
+                if like_count != fts_count:
+                    # Expected now and then: LIKE matches substrings, FTS matches word prefixes.
+                    self.stdout.write(f"{'':>11}(LIKE matched {like_count})")
+
+
+def _like_filter(candidates, filters, text):
+    """
+    The filtering parser_home did before the search index existed.
+    """
+    for field, value in filters.items():
+        candidates = candidates.filter(**{f'{field}__icontains': value})
+    if text:
+        query = Q()
+        for field in INDEXED_FIELDS:
+            query |= Q(**{f'{field}__icontains': text})
+        candidates = candidates.filter(query)
+    return candidates
+
+
+def _time_page(candidates, options):
+    """
+    Times what a page view needs: the match count plus the first page of rows.
+    """
+    timings = []
+    count = 0
+    for _ in range(options['repeat']):
+        started = time.perf_counter()
+        count = candidates.count()
+        list(candidates.order_by('id').values_list('id', flat=True)[:options['page_size']])
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), count
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler, StopFutureHandlers, TemporaryFileUploadHandler,
+)
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from parser.gemini_parser import _conversion_source
+from parser.models import IngestionTask
+from parser.parse_cache import HashingFile
+from parser.upload_handlers import HashingMemoryFileUploadHandler, HashingTemporaryFileUploadHandler
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the file I/O and latency of getting an uploaded resume from "
+        "the request to the point where Docling can read it, for the old path "
+        "(copy to storage, then to a temp file) and the current one. Docling "
+        "itself is not run: it reads each file once either way."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus',
+            default=str(settings.SAMPLE_RESUMES_DIR),
+            help="Directory of resumes to upload (defaults to dummy_resumes/).",
+        )
+        parser.add_argument('--repeat', type=int, default=20, help="Upload the corpus this many times per path.")
+
+    def handle(self, *args, **options):
+        corpus = options['corpus']
+        if not os.path.isdir(corpus):
+            raise CommandError(f"Corpus directory not found: {corpus}")
+        files = []
+        for name in sorted(os.listdir(corpus)):
+            path = os.path.join(corpus, name)
+            if not name.startswith('.') and os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    files.append((name, f.read()))
+        if not files:
+            raise CommandError(f"No files found in {corpus}")
+        if not os.path.exists('/proc/self/io'):
+            raise CommandError("/proc/self/io is needed to count I/O (Linux only).")
+
+        total_kb = sum(len(data) for _, data in files) / 1024
+        self.stdout.write(f"{len(files)} files, {total_kb:.0f} KiB, x{options['repeat']}\n")
+        self.stdout.write(
+            f"{'upload':<10} {'path':<8} {'read KiB/file':>14} {'write KiB/file':>15} {'p50 ms':>8} {'p95 ms':>8}"
+        )
+        media_root = tempfile.mkdtemp(prefix='bench_upload_io_')
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                # Everything in memory, as Django does for uploads under
+                # FILE_UPLOAD_MAX_MEMORY_SIZE, then everything spooled to disk.
+                for label, max_memory in (('memory', 2 ** 40), ('temporary', 0)):
+                    with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=max_memory):
+                        for path_label, run in (('old', self._old_path), ('current', self._current_path)):
+                            self._measure(label, path_label, run, files, options['repeat'])
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def _measure(self, label, path_label, run, files, repeat):
+        timings = []
+        before = _io_counters()
+        for _ in range(repeat):
+            for name, data in files:
+                started = time.perf_counter()
+                run(name, data)
+                timings.append((time.perf_counter() - started) * 1000)
+        after = _io_counters()
+        count = len(timings)
+        self.stdout.write(
+            f"{label:<10} {path_label:<8} "
+            f"{(after['rchar'] - before['rchar']) / count / 1024:>14.1f} "
+            f"{(after['wchar'] - before['wchar']) / count / 1024:>15.1f} "
+            f"{statistics.median(timings):>8.3f} {statistics.quantiles(timings, n=20)[18]:>8.3f}"
+        )
+
+    def _old_path(self, name, data):
+        """
+        Plain upload handlers; the queue copies the upload into storage through
+        HashingFile, and the worker copies it again to a temp file for Docling.
+        """
+        upload = _upload(name, data, [MemoryFileUploadHandler(), TemporaryFileUploadHandler()])
+        task = IngestionTask(original_name=name)
+        hashing_file = HashingFile(upload)
+        task.resume_file.save(name, hashing_file, save=False)
+        hashing_file.hexdigest()
+        upload.close()
+
+        stored = task.resume_file.open('rb')
+        hasher = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(name)[1]) as temp_file:
+            for chunk in stored.chunks():
+                temp_file.write(chunk)
+                hasher.update(chunk)
+        stored.close()
+        os.remove(temp_file.name)
+        task.resume_file.delete(save=False)
+
+    def _current_path(self, name, data):
+        """
+        Hashing upload handlers; the queue saves (or moves) the upload into
+        storage and the worker hands Docling the stored file's path.
+        """
+        upload = _upload(name, data, [HashingMemoryFileUploadHandler(), HashingTemporaryFileUploadHandler()])
+        task = IngestionTask(original_name=name)
+        task.resume_file.save(name, upload, save=False)
+        upload.close()
+
+        _conversion_source(task.resume_file, upload.content_hash)
+        task.resume_file.delete(save=False)
+
+
+def _upload(name, data, handlers):
+    """
+    Runs `data` through upload handlers the way MultiPartParser does and
+    returns the resulting UploadedFile.
+    """
+    for handler in handlers:
+        handler.handle_raw_input(None, {}, len(data), b'boundary', 'utf-8')
+    for handler in handlers:
+        try:
+            handler.new_file('resume_files', name, 'application/octet-stream', len(data))
+        except StopFutureHandlers:
+            break
+    for start in range(0, len(data), CHUNK_SIZE):
+        chunk = data[start:start + CHUNK_SIZE]
+        for handler in handlers:
+            chunk = handler.receive_data_chunk(chunk, start)
+            if chunk is None:
+                break
+    for handler in handlers:
+        upload = handler.file_complete(len(data))
+        if upload is not None:
+            return upload
+
+
+def _io_counters():
+    with open('/proc/self/io') as f:
+        return {key: int(value) for key, value in (line.split(': ') for line in f)}
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from parser.analytics import check_counters, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Compares the dashboard's analytics counters with live aggregates of the jobs and candidates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Rebuild the counters if they are out of sync.")
+
+    def handle(self, *args, **options):
+        problems = check_counters()
+        for problem in problems:
+            self.stdout.write(problem)
+        if not problems:
+            self.stdout.write(self.style.SUCCESS("Analytics counters are consistent."))
+            return
+        if options['fix']:
+            rebuild_counters()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt the counters ({len(problems)} discrepancies)."))
+            return
+        raise CommandError(f"{len(problems)} discrepancies found; run with --fix or rebuild_analytics.")
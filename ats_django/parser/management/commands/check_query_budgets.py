@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from parser.benchdata import create_query_budget_data
+from parser.query_budget import record_queries
+
+
+class Command(BaseCommand):
+    help = (
+        "Requests each page and JSON view with realistic data and fails if one "
+        "runs more SQL queries than its QUERY_BUDGETS entry or repeats a query "
+        "(an N+1 pattern). Caches are cleared first, so the count is the worst "
+        "case. Uses a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=200, help="Candidates in the job the views show.")
+        parser.add_argument('--show-queries', action='store_true', help="Print every query of each request.")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(QUERY_BUDGET_MODE='off', ALLOWED_HOSTS=['localhost']):
+                failures = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        if failures:
+            raise CommandError(f"{failures} views over their query budget; see above.")
+        self.stdout.write(self.style.SUCCESS("All views are within their query budgets."))
+
+    def _run(self, options):
+        user, requests = create_query_budget_data(options['candidates'])
+        client = Client(SERVER_NAME='localhost')
+        client.force_login(user)
+
+        failures = 0
+        self.stdout.write(f"{'view':<20} {'queries':>8} {'budget':>7} {'SQL ms':>8}  problems")
+        for view_name, url in requests:
+            for alias in settings.CACHES:
+                caches[alias].clear()
+            with record_queries() as log:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"{url} returned HTTP {response.status_code}.")
+            budget = settings.QUERY_BUDGETS.get(view_name)
+            problems = log.problems(budget)
+            failures += bool(problems)
+            status = self.style.ERROR('; '.join(problems)) if problems else ''
+            self.stdout.write(
+                f"{view_name:<20} {log.count:>8} {budget if budget is not None else '-':>7} "
+                f"{log.seconds * 1000:>8.1f}  {status}"
+            )
+            if options['show_queries']:
+                for sql, seconds in log.queries:
+                    self.stdout.write(f"    {seconds * 1000:6.2f} ms  {sql[:160]}")
+        return failures
@@ -0,0 +1,101 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from parser.bulk_import import STAGES, BulkImporter, Checkpoint, ResumeSource
+from parser.converter_pool import get_converter_pool
+from parser.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports every resume in a directory or ZIP archive into a job posting. "
+        "Progress is checkpointed, so an interrupted import can be run again to "
+        "pick up where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Directory (searched recursively) or ZIP archive of resumes.")
+        parser.add_argument('--job', type=int, required=True, help="Id of the job posting to import into.")
+        parser.add_argument('--user', help="Username recorded as the uploader (defaults to the job's creator).")
+        parser.add_argument(
+            '--checkpoint',
+            help="Checkpoint file (defaults to <source>.job<id>.checkpoint.jsonl next to the source).",
+        )
+        parser.add_argument('--batch-size', type=int, help="Files per batch (defaults to BULK_IMPORT_BATCH_SIZE).")
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help="Process files the checkpoint records as failed again.",
+        )
+
+    def handle(self, *args, **options):
+        job = Job.objects.filter(id=options['job']).first()
+        if job is None:
+            raise CommandError(f"Job {options['job']} does not exist.")
+        user = job.created_by
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} does not exist.")
+
+        try:
+            source = ResumeSource(options['source'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        checkpoint_path = options['checkpoint'] or (
+            f"{os.path.normpath(os.path.abspath(options['source']))}.job{job.id}.checkpoint.jsonl"
+        )
+        try:
+            checkpoint = Checkpoint(checkpoint_path, job.id)
+        except ValueError as e:
+            source.close()
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Importing {len(source.names)} files from {options['source']} into '{job}' "
+            f"(checkpoint: {checkpoint_path})"
+        )
+        # Start the Docling workers up front so model loading isn't counted as conversion time.
+        get_converter_pool()
+        importer = BulkImporter(
+            job, user, checkpoint,
+            batch_size=options['batch_size'],
+            retry_failed=options['retry_failed'],
+            on_batch=self._show_progress,
+        )
+        try:
+            report = importer.run(source)
+        finally:
+            checkpoint.close()
+            source.close()
+        self._show_report(report)
+
+    def _show_progress(self, report):
+        self.stdout.write(
+            f"  {report.completed + report.failed} files done "
+            f"({report.completed} completed, {report.failed} failed, {report.candidates} candidates)"
+        )
+
+    def _show_report(self, report):
+        self.stdout.write(
+            f"\n{report.completed} files imported, {report.failed} failed, {report.skipped} skipped "
+            f"(already in the checkpoint), {report.cached} served from the parse cache; "
+            f"{report.candidates} candidates saved in {report.elapsed:.1f}s.\n"
+        )
+        self.stdout.write(f"{'stage':<8} {'files':>7} {'busy s':>8} {'files/s':>9}  other")
+        for stage in STAGES:
+            other = ''
+            if stage == 'convert':
+                other = f"{report.pages} pages, {report.rate(stage, report.pages):.2f} pages/s"
+            elif stage == 'extract':
+                other = f"{report.llm_calls} LLM calls, {report.rate(stage, report.llm_calls):.2f} calls/s"
+            self.stdout.write(
+                f"{stage:<8} {report.files[stage]:>7} {report.seconds[stage]:>8.2f} {report.rate(stage):>9.2f}  {other}"
+            )
+        done = report.completed + report.failed
+        if report.elapsed:
+            self.stdout.write(f"{'overall':<8} {done:>7} {report.elapsed:>8.2f} {done / report.elapsed:>9.2f}")
+        if report.failed:
+            self.stdout.write(self.style.WARNING("Failed files are listed in the checkpoint; rerun with --retry-failed to try them again."))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from parser.dedup import INDEX_BATCH_SIZE, clear_index, index_new_candidates
+from parser.models import Candidate
+
+
+class Command(BaseCommand):
+    help = (
+        "Signs candidates that have no MinHash signature yet (those from before "
+        "duplicate detection, or whose check failed) and flags near-duplicates "
+        "among them, oldest first. With --rebuild, every signature and bucket is "
+        "recomputed, e.g. after changing the DEDUP_* signature settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Discard the index and rebuild it from scratch.")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            clear_index()
+        candidate_ids = list(
+            Candidate.objects.filter(signature__isnull=True).order_by('id').values_list('id', flat=True)
+        )
+        started = time.perf_counter()
+        flagged = 0
+        for start in range(0, len(candidate_ids), INDEX_BATCH_SIZE):
+            flagged += index_new_candidates(candidate_ids[start:start + INDEX_BATCH_SIZE])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(candidate_ids)} candidates in {time.perf_counter() - started:.1f}s; "
+            f"{flagged} flagged as possible duplicates."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from parser.analytics import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recomputes the dashboard's analytics counters from the jobs and candidates."
+
+    def handle(self, *args, **options):
+        rebuild_counters()
+        self.stdout.write(self.style.SUCCESS("Analytics counters rebuilt."))
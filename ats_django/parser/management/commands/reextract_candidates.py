@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from parser.extractors import extraction_version
+from parser.reextraction import Reextractor, backfill_documents, stale_documents
+
+
+class Command(BaseCommand):
+    help = (
+        "Extracts the fields of stored resumes again when they were extracted by "
+        "another version of the extractor (a different prompt, model, rule set or "
+        "threshold), and updates their candidates. Only the extraction runs again: "
+        "the stored markdown is used, not the files. Progress is saved per batch, "
+        "so an interrupted run can be run again to pick up where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, nargs='+', help="Ids of the jobs to re-extract (all jobs by default).")
+        parser.add_argument('--workers', type=int, help="Worker threads (defaults to REEXTRACTION_WORKERS).")
+        parser.add_argument(
+            '--batch-size', type=int, help="Resumes a worker claims at once (defaults to REEXTRACTION_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help="First store the resume text of candidates saved before resumes were kept, so they are re-extracted too.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only count the stale resumes.")
+
+    def handle(self, *args, **options):
+        if options['backfill'] and not options['dry_run']:
+            created = backfill_documents()
+            self.stdout.write(f"Stored {created} resumes of earlier candidates.")
+
+        version = extraction_version()
+        stale = stale_documents(version, options['job']).count()
+        self.stdout.write(f"{stale} stored resumes are not at extractor version {version}.")
+        if options['dry_run'] or not stale:
+            return
+
+        started = time.perf_counter()
+        reextractor = Reextractor(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            job_ids=options['job'],
+            on_batch=self._show_progress,
+        )
+        counts = reextractor.run()
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-extracted {counts['documents']} resumes in {time.perf_counter() - started:.1f}s: "
+            f"{counts['updated']} candidates updated, {counts['created']} added and {counts['removed']} removed; "
+            f"{counts['failed']} resumes failed and keep their candidates until the next run."
+        ))
+
+    def _show_progress(self, counts):
+        self.stdout.write(
+            f"  {counts['documents'] + counts['failed']} resumes done "
+            f"({counts['failed']} failed, {counts['updated'] + counts['created']} candidates)"
+        )
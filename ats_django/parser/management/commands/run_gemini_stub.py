@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from parser.gemini_stub import GeminiStubServer
+
+
+class Command(BaseCommand):
+    help = "Runs a local stand-in for the Gemini API for testing and benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds to wait before answering.")
+        parser.add_argument('--fail-every', type=int, default=0, help="Fail every Nth request (0 = never).")
+        parser.add_argument('--fail-status', type=int, default=429, help="HTTP status used for injected failures.")
+        parser.add_argument('--malformed-every', type=int, default=0,
+                            help="Answer every Nth request with a truncated body (0 = never).")
+
+    def handle(self, *args, **options):
+        server = GeminiStubServer(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            fail_every=options['fail_every'],
+            fail_status=options['fail_status'],
+            malformed_every=options['malformed_every'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Gemini stub listening on {server.url}. Set GEMINI_API_BASE={server.url} to use it."
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
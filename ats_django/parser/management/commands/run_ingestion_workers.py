@@ -0,0 +1,40 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from parser.ingestion import IngestionWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Runs background resume ingestion workers until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.INGESTION_WORKERS,
+            help="Number of worker threads to run.",
+        )
+
+    def handle(self, *args, **options):
+        pool = IngestionWorkerPool(size=options['workers'])
+        stopped = threading.Event()
+
+        def shutdown(signum, frame):
+            stopped.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        pool.start()
+        self.stdout.write("Warming up the Docling converter pool...")
+        if not pool.wait_started():
+            raise CommandError("The Docling converter pool could not be started.")
+        self.stdout.write(self.style.SUCCESS(f"Started {pool.size} ingestion workers. Press CTRL+C to stop."))
+        stopped.wait()
+
+        self.stdout.write("Stopping ingestion workers...")
+        pool.stop()
+        self.stdout.write(self.style.SUCCESS("Ingestion workers stopped."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from parser.matching import score_job
+from parser.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        "Rescores every candidate of the given jobs (all jobs by default) against "
+        "the job description and rebuilds their leaderboards. Run it after editing "
+        "a job description; new uploads are scored as they come in."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, nargs='+', help="Ids of the jobs to rescore.")
+
+    def handle(self, *args, **options):
+        jobs = Job.objects.order_by('id')
+        if options['job']:
+            jobs = jobs.filter(id__in=options['job'])
+        for job in jobs:
+            started = time.perf_counter()
+            scored = score_job(job)
+            leaderboard = job.scoring_profile.leaderboard
+            best = f", best {leaderboard[0][1]:.2f}" if leaderboard else ''
+            self.stdout.write(
+                f"Job #{job.id} {job.title}: {scored} candidates in {time.perf_counter() - started:.2f}s{best}"
+            )
+        self.stdout.write(self.style.SUCCESS("Match scores updated."))
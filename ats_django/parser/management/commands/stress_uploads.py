@@ -0,0 +1,194 @@
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from parser import write_queue
+from parser.benchdata import create_bench_job, fake_candidate
+from parser.gemini_parser import ParseResult
+from parser.ingestion import _save_results, claim_tasks
+from parser.models import IngestionJob, IngestionTask
+
+# (label, connection OPTIONS or None for the configured ones, write queue on)
+MODES = [
+    ('default', {}, False),
+    ('tuned', None, False),
+    ('queued', None, True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress-tests concurrent uploads: --uploaders threads post resumes to "
+        "upload_resume at once while --workers threads save parsed results the "
+        "way the ingestion workers do (Docling and Gemini are left out). Runs on "
+        "a throwaway database file with SQLite's defaults (rollback journal), "
+        "with the configured ones (WAL, IMMEDIATE transactions), and with those "
+        "plus the write queue, and reports latency, throughput and errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploaders', type=int, default=32, help="Threads uploading at the same time.")
+        parser.add_argument('--uploads', type=int, default=10, help="Upload requests per uploader.")
+        parser.add_argument('--files', type=int, default=3, help="Resumes per upload request.")
+        parser.add_argument('--workers', type=int, default=4, help="Threads saving parsed results.")
+        parser.add_argument('--mode', choices=[label for label, _, _ in MODES], nargs='+', help="Modes to run.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['uploaders']} uploaders x {options['uploads']} uploads x {options['files']} files, "
+            f"{options['workers']} workers\n"
+        )
+        self.stdout.write(
+            f"{'mode':<8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'uploads/s':>10} "
+            f"{'saved/s':>8} {'saved':>7} {'errors':>7} {'groups':>7} {'avg group':>10}"
+        )
+        errors = {}
+        for label, connection_options, queued in MODES:
+            if options['mode'] and label not in options['mode']:
+                continue
+            errors[label] = self._run_mode(label, connection_options, queued, options)
+        for label, counts in errors.items():
+            for message, count in counts.most_common(5):
+                self.stdout.write(f"  {label}: {count} x {message}")
+
+    def _run_mode(self, label, connection_options, queued, options):
+        """
+        Runs the test against a new database file, opened with
+        `connection_options` (the configured ones if None).
+        """
+        database = connection.settings_dict
+        configured_options = database['OPTIONS']
+        directory = tempfile.mkdtemp(prefix='stress_uploads_')
+        database['TEST']['NAME'] = os.path.join(directory, 'stress.sqlite3')
+        if connection_options is not None:
+            database['OPTIONS'] = connection_options
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            if connection_options == {}:
+                # Undoes the switch to WAL made by the migrations.
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode=DELETE')
+            with override_settings(
+                WRITE_QUEUE_ENABLED=queued, INGESTION_RUN_IN_PROCESS=False, MEDIA_ROOT=directory,
+                ALLOWED_HOSTS=['localhost'], QUERY_BUDGET_MODE='off',
+            ):
+                return self._stress(label, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            database['OPTIONS'] = configured_options
+            database['TEST']['NAME'] = None
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _stress(self, label, options):
+        random.seed(7)
+        user = User.objects.create_user('stress')
+        job = create_bench_job(user)
+        url = reverse('upload_resume')
+        # Logged in up front: a login writes the session, which isn't what is measured.
+        clients = []
+        for _ in range(options['uploaders']):
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(user)
+            clients.append(client)
+        connection.close()
+
+        latencies = []
+        errors = Counter()
+        lock = threading.Lock()
+        start = threading.Barrier(options['uploaders'] + options['workers'])
+        uploads_done = threading.Event()
+
+        def record_error(e):
+            with lock:
+                errors[f"{type(e).__name__}: {str(e)[:60]}"] += 1
+
+        def upload(index, client):
+            start.wait()
+            try:
+                for number in range(options['uploads']):
+                    files = [
+                        SimpleUploadedFile(f"resume-{index}-{number}-{i}.pdf", os.urandom(2048))
+                        for i in range(options['files'])
+                    ]
+                    started = time.perf_counter()
+                    try:
+                        response = client.post(url, {'job_id': job.id, 'resumes': files})
+                        if response.status_code != 202:
+                            with lock:
+                                errors[f"HTTP {response.status_code}"] += 1
+                    except Exception as e:
+                        record_error(e)
+                    with lock:
+                        latencies.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+
+        def work(index):
+            start.wait()
+            try:
+                while True:
+                    finished = uploads_done.is_set()
+                    try:
+                        tasks = claim_tasks(f"stress:{index}", settings.INGESTION_BATCH_SIZE)
+                    except Exception as e:
+                        record_error(e)
+                        continue
+                    if not tasks:
+                        if finished:
+                            return
+                        time.sleep(0.01)
+                        continue
+                    results = []
+                    for task in tasks:
+                        candidate = fake_candidate(job, user)
+                        parsed_data = [{
+                            'first_name': candidate.first_name, 'last_name': candidate.last_name,
+                            'address': candidate.address, 'degree': candidate.degree,
+                            'degree_school': candidate.degree_school,
+                        }]
+                        results.append(ParseResult(parsed_data, '', candidate.resume_text))
+                    try:
+                        _save_results(tasks, results)
+                    except Exception as e:
+                        record_error(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=upload, args=(i, client)) for i, client in enumerate(clients)]
+        workers = [threading.Thread(target=work, args=(i,)) for i in range(options['workers'])]
+        writes_before = write_queue.stats()
+        started = time.perf_counter()
+        for thread in threads + workers:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        upload_seconds = time.perf_counter() - started
+        uploads_done.set()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writes = write_queue.stats()
+
+        saved = IngestionTask.objects.filter(status=IngestionJob.STATUS_COMPLETED).count()
+        groups = writes['groups'] - writes_before['groups']
+        operations = writes['operations'] - writes_before['operations']
+        self.stdout.write(
+            f"{label:<8} {statistics.mean(latencies):>8.1f} {statistics.median(latencies):>8.1f} {statistics.quantiles(latencies, n=20, method='inclusive')[18]:>8.1f} "
+            f"{max(latencies):>8.1f} {len(latencies) / upload_seconds:>10.1f} {saved / elapsed:>8.1f} "
+            f"{saved:>7} {sum(errors.values()):>7} {groups:>7} {operations / groups if groups else 0:>10.1f}"
+        )
+        connection.close()
+        return errors
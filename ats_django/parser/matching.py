@@ -0,0 +1,288 @@
+"""
+Keyword match scoring of candidates against their job posting.
+
+The job description and each candidate's resume text are turned into
+sparse TF-IDF vectors with the SMART "lnc.ltc" weighting: resumes get
+logarithmic term frequencies, cosine-normalized; the description gets
+logarithmic term frequencies times each term's inverse document frequency
+among the job's candidates, also cosine-normalized. A candidate's score is
+the dot product of the two, between 0 and 1. Putting the idf on the
+description's side only means a resume's vector doesn't depend on the rest
+of the pool, so new candidates can be scored without touching old ones.
+
+`score_job` scores a whole job as one sparse matrix-vector product: a SciPy
+CSR matrix with a row per candidate and a column per description term,
+times the description's vector. All scores go to CandidateMatch (read by
+the candidate table's Score column) and the best MATCH_LEADERBOARD_SIZE to
+the job's JobScoringProfile (read by the dashboard).
+
+`score_new_candidates`, run by insert_candidates once its rows are
+committed, scores new uploads incrementally: it adds them to the profile's
+document frequencies and scores only them. Earlier scores keep the idf of
+their time, so the job is rescored in full when its description changes or
+its candidates have grown by MATCH_RESCORE_GROWTH since the last full
+scoring. Two processes updating the same profile at once can lose each
+other's frequency counts; the next full scoring corrects them.
+
+Scores are computed in the calling thread; only their writes go through
+the write queue (see write_queue.py).
+"""
+import hashlib
+import re
+import threading
+from collections import Counter, defaultdict
+from itertools import chain, count, islice
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+from scipy import sparse
+
+from .models import Candidate, CandidateMatch, Job, JobCandidateCount, JobScoringProfile
+from .write_queue import write
+
+# Words with a + or # suffix (c++, c#) and dotted names (node.js, .net) are
+# kept whole; numbers are dropped.
+_TOKEN = re.compile(r"\.?[a-z][a-z0-9]*(?:\.[a-z0-9]+)*[+#]*")
+
+STOP_WORDS = frozenset('''
+    a about above after again all also am an and any are as at be been before being below between both but by
+    can could did do does doing down during each etc few for from further had has have having he her here hers
+    him his how i if in into is it its itself just me more most my no nor not now of off on once only or other
+    our ours out over own per same she should so some such than that the their theirs them then there these
+    they this those through to too under until up very via was we were what when where which while who whom
+    why will with would you your yours
+    able ability including etc e.g i.e strong excellent experience work working years year skills role team
+    job position candidate candidates responsibilities requirements required preferred plus must well new
+'''.split())
+
+# Candidate fields used in place of the resume text when it is missing.
+FALLBACK_FIELDS = ['degree', 'degree_school', 'diploma', 'diploma_school']
+
+WRITE_BATCH_SIZE = 2000
+
+_lock = threading.Lock()
+
+
+def _split(text):
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+def tokenize(text):
+    return [token for token in _split(text) if token not in STOP_WORDS]
+
+
+def description_hash(description):
+    return hashlib.sha256((description or '').encode()).hexdigest()
+
+
+def _candidate_rows(queryset):
+    """
+    (id, job id, text) for each candidate of `queryset`, read in chunks.
+    """
+    rows = queryset.values_list('id', 'job_id', 'resume_text', *FALLBACK_FIELDS)
+    for candidate_id, job_id, resume_text, *fields in rows.iterator(chunk_size=WRITE_BATCH_SIZE):
+        yield candidate_id, job_id, resume_text or ' '.join(value for value in fields if value)
+
+
+def token_matrix(tokens, vocabulary):
+    """
+    document_matrix of texts already split into token lists (stop words
+    may be left in). Tokens are mapped to integer ids with a dict; counting,
+    weighting and normalizing then run as NumPy operations over all of them.
+    """
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+    term_ids = {}
+    ids = np.fromiter(
+        map(term_ids.setdefault, chain.from_iterable(tokens), count()), dtype=np.int64, count=int(lengths.sum()),
+    )
+    # Each term id's column in the matrix; -1 for terms outside the vocabulary, -2 for stop words.
+    size = max(len(ids), 1)
+    columns = np.full(size, -1, dtype=np.int64)
+    columns[[term_ids[word] for word in STOP_WORDS if word in term_ids]] = -2
+    for term, column in vocabulary.items():
+        if term in term_ids:
+            columns[term_ids[term]] = column
+
+    rows = np.repeat(np.arange(len(tokens)), lengths)
+    kept = columns[ids] != -2
+    pairs, counts = np.unique(rows[kept] * size + ids[kept], return_counts=True)
+    rows, ids = np.divmod(pairs, size)
+    weights = 1 + np.log(counts)
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(tokens)))
+    kept = columns[ids] >= 0
+    rows = rows[kept]
+    return sparse.csr_matrix(
+        (weights[kept] / norms[rows], (rows, columns[ids[kept]])), shape=(len(tokens), len(vocabulary)),
+    )
+
+
+def document_matrix(texts, vocabulary):
+    """
+    The lnc weights of `texts` as a CSR matrix with a row per text and a
+    column per term of `vocabulary` (a {term: column} dict). Rows are
+    normalized over all of a text's terms, not only the vocabulary's. Texts
+    are processed WRITE_BATCH_SIZE at a time to bound memory.
+    """
+    texts = iter(texts)
+    blocks = []
+    while True:
+        batch = list(islice(texts, WRITE_BATCH_SIZE))
+        if batch or not blocks:
+            blocks.append(token_matrix([_split(text) for text in batch], vocabulary))
+        if len(batch) < WRITE_BATCH_SIZE:
+            break
+    return blocks[0] if len(blocks) == 1 else sparse.vstack(blocks, format='csr')
+
+
+def query_vector(term_counts, document_frequency, documents):
+    """
+    The ltc weights of the description's `term_counts`, with smoothed idf
+    ln((1 + documents) / (1 + df)) + 1, in the order of `term_counts`.
+    """
+    counts = np.fromiter(term_counts.values(), dtype=np.float64, count=len(term_counts))
+    frequencies = np.fromiter(
+        (document_frequency.get(term, 0) for term in term_counts), dtype=np.float64, count=len(term_counts),
+    )
+    weights = (1 + np.log(counts)) * (np.log((1 + documents) / (1 + frequencies)) + 1)
+    norm = np.sqrt(np.dot(weights, weights))
+    return weights / norm if norm else weights
+
+
+def _leaderboard(candidate_ids, scores, size):
+    """
+    The `size` best (id, score) pairs, best first. Only those are sorted.
+    """
+    if len(scores) > size:
+        best = np.argpartition(-scores, size - 1)[:size]
+    else:
+        best = np.arange(len(scores))
+    best = best[np.lexsort((candidate_ids[best], -scores[best]))]
+    return [[int(candidate_ids[i]), round(float(scores[i]), 4)] for i in best]
+
+
+def _save_scores(job_id, candidate_ids, scores):
+    """
+    Writes scores to CandidateMatch, replacing the earlier score (and job,
+    for a candidate that moved) of each candidate in `candidate_ids`. Scores
+    of other candidates, such as ones inserted and scored while a full
+    scoring was running, are left alone.
+    """
+    CandidateMatch.objects.bulk_create(
+        (CandidateMatch(candidate_id=int(candidate_id), job_id=job_id, score=float(score))
+         for candidate_id, score in zip(candidate_ids, scores)),
+        batch_size=WRITE_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['candidate'],
+        update_fields=['job', 'score'],
+    )
+    # The cached candidate table shows scores; a new version invalidates it (see response_cache.py).
+    JobCandidateCount.objects.filter(job_id=job_id).update(version=F('version') + 1)
+
+
+def score_job(job):
+    """
+    Scores every candidate of `job` and rebuilds its profile.
+    Returns the number of candidates scored.
+    """
+    term_counts = Counter(tokenize(job.description))
+    vocabulary = {term: column for column, term in enumerate(term_counts)}
+    candidate_ids = []
+
+    def texts():
+        for candidate_id, job_id, text in _candidate_rows(Candidate.objects.filter(job=job).order_by('id')):
+            candidate_ids.append(candidate_id)
+            yield text
+
+    matrix = document_matrix(texts(), vocabulary)
+    candidate_ids = np.array(candidate_ids, dtype=np.int64)
+    documents = len(candidate_ids)
+    frequencies = np.bincount(matrix.indices, minlength=len(vocabulary))
+    document_frequency = {term: int(frequencies[column]) for term, column in vocabulary.items()}
+    scores = matrix @ query_vector(term_counts, document_frequency, documents)
+
+    write(_save_job, job, candidate_ids, scores, {
+        'description_hash': description_hash(job.description),
+        'document_frequency': document_frequency,
+        'documents': documents,
+        'documents_at_rescore': documents,
+        'leaderboard': _leaderboard(candidate_ids, scores, settings.MATCH_LEADERBOARD_SIZE),
+    })
+    return documents
+
+
+def _save_job(job, candidate_ids, scores, profile_fields):
+    _save_scores(job.id, candidate_ids, scores)
+    JobScoringProfile.objects.update_or_create(job=job, defaults=profile_fields)
+
+
+def _needs_rescore(profile, job, new_documents):
+    if profile is None or profile.description_hash != description_hash(job.description):
+        return True
+    return profile.documents + new_documents > profile.documents_at_rescore * (1 + settings.MATCH_RESCORE_GROWTH)
+
+
+def _score_increment(profile, job, rows):
+    term_counts = Counter(tokenize(job.description))
+    vocabulary = {term: column for column, term in enumerate(term_counts)}
+    candidate_ids = np.array([candidate_id for candidate_id, text in rows], dtype=np.int64)
+    matrix = document_matrix((text for candidate_id, text in rows), vocabulary)
+
+    frequencies = np.bincount(matrix.indices, minlength=len(vocabulary))
+    document_frequency = {
+        term: profile.document_frequency.get(term, 0) + int(frequencies[column]) for term, column in vocabulary.items()
+    }
+    documents = profile.documents + len(rows)
+    scores = matrix @ query_vector(term_counts, document_frequency, documents)
+
+    entries = profile.leaderboard + _leaderboard(candidate_ids, scores, settings.MATCH_LEADERBOARD_SIZE)
+    entries.sort(key=lambda entry: (-entry[1], entry[0]))
+    profile.document_frequency = document_frequency
+    profile.documents = documents
+    profile.leaderboard = entries[:settings.MATCH_LEADERBOARD_SIZE]
+    write(_save_increment, profile, candidate_ids, scores)
+
+
+def _save_increment(profile, candidate_ids, scores):
+    _save_scores(profile.job_id, candidate_ids, scores)
+    profile.save()
+
+
+def score_new_candidates(candidate_ids):
+    """
+    Scores newly inserted candidates, rescoring their jobs in full where
+    needed (see module docstring).
+    """
+    rows_by_job = defaultdict(list)
+    for candidate_id, job_id, text in _candidate_rows(Candidate.objects.filter(id__in=candidate_ids).order_by('id')):
+        rows_by_job[job_id].append((candidate_id, text))
+
+    with _lock:
+        for job_id, rows in rows_by_job.items():
+            job = Job.objects.filter(id=job_id).first()
+            if job is None:
+                continue
+            profile = JobScoringProfile.objects.filter(job=job).first()
+            if _needs_rescore(profile, job, len(rows)):
+                score_job(job)
+            else:
+                _score_increment(profile, job, rows)
+
+
+def top_applicants(profile):
+    """
+    The leaderboard entries of a JobScoringProfile (or None) that score at
+    least MATCH_TOP_APPLICANT_MIN_SCORE. Entries of candidates deleted (or
+    moved to another job) since they were scored are left out; the next
+    full scoring drops them from the leaderboard itself.
+    """
+    if profile is None:
+        return []
+    entries = [entry for entry in profile.leaderboard if entry[1] >= settings.MATCH_TOP_APPLICANT_MIN_SCORE]
+    if not entries:
+        return []
+    existing = set(
+        Candidate.objects.filter(job_id=profile.job_id, id__in=[candidate_id for candidate_id, score in entries])
+        .values_list('id', flat=True)
+    )
+    return [entry for entry in entries if entry[0] in existing]
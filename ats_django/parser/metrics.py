@@ -0,0 +1,354 @@
+"""
+Counters and histograms for the ingestion pipeline and the busiest pages,
+served at /metrics in the Prometheus text format.
+
+Values are kept in memory per process. The web server and the ingestion
+workers run in separate processes (and a production server usually has
+several), so with METRICS_DIR set each process also writes its values to
+METRICS_DIR/<pid>-<id>.json, at most every METRICS_FLUSH_INTERVAL seconds
+and at exit, from a background thread. /metrics adds up the files of
+every process, including ones that have exited, so counters never go
+backwards. Empty METRICS_DIR when deploying to start from zero.
+
+Metrics are declared once at module level and updated with `inc` and
+`observe`; names follow the Prometheus conventions (`_total` for counters,
+base units such as seconds).
+"""
+import atexit
+import functools
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+# Seconds; from a cached page render up to a slow OCR conversion.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = {}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_dirty = False
+_flusher = None
+_file_id = uuid.uuid4().hex[:8]
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        with _lock:
+            if name in _registry:
+                raise ValueError(f"Metric {name} is already registered.")
+            _registry[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}, not {tuple(labels)}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _describe(self):
+        return {
+            'type': self.kind,
+            'help': self.documentation,
+            'labelnames': list(self.labelnames),
+            # Copied, so the snapshot can be written out after the lock is released.
+            'samples': [[list(key), list(value) if isinstance(value, list) else value]
+                        for key, value in self._values.items()],
+        }
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        global _dirty
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            _dirty = True
+        _start_flusher()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        """
+        Records one observation. Each key holds the count per bucket (not
+        cumulative; the last slot is +Inf), the sum and the count.
+        """
+        global _dirty
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with _lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+            _dirty = True
+        _start_flusher()
+
+    def time(self, **labels):
+        """
+        Context manager (or decorator) observing the seconds spent in its body.
+        """
+        return _Timer(self, labels)
+
+    def _describe(self):
+        description = super()._describe()
+        description['buckets'] = list(self.buckets)
+        return description
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return function(*args, **kwargs)
+        return wrapper
+
+
+def _snapshot():
+    with _lock:
+        return {name: metric._describe() for name, metric in _registry.items()}
+
+
+def _process_file():
+    return os.path.join(settings.METRICS_DIR, f"{os.getpid()}-{_file_id}.json")
+
+
+def flush():
+    """
+    Writes this process' values to its file in METRICS_DIR, replacing the
+    file atomically so a scrape never reads half of it.
+    """
+    global _dirty
+    if not settings.METRICS_DIR:
+        return
+    with _flush_lock:
+        with _lock:
+            _dirty = False
+        path = _process_file()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(_snapshot(), f)
+        os.replace(temp_path, path)
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        if _dirty:
+            try:
+                flush()
+            except OSError as e:
+                print(f"Could not write metrics to {settings.METRICS_DIR}: {e}")
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None or not settings.METRICS_DIR:
+        return
+    with _lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(target=_flush_periodically, name='metrics-flush', daemon=True)
+        _flusher.start()
+    atexit.register(flush)
+
+
+def _after_fork():
+    """
+    A forked child (e.g. a preforking server's worker) starts from zero with
+    its own file; the values it inherited belong to the parent.
+    """
+    global _lock, _flush_lock, _dirty, _flusher, _file_id
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _dirty = False
+    _flusher = None
+    _file_id = uuid.uuid4().hex[:8]
+    for metric in _registry.values():
+        metric._values = {}
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def collect():
+    """
+    Returns the metrics of every process, summed per metric and labels.
+    """
+    if not settings.METRICS_DIR:
+        return _snapshot()
+    flush()
+    combined = {}
+    for name in sorted(os.listdir(settings.METRICS_DIR)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, name)) as f:
+                metrics = json.load(f)
+        except (OSError, ValueError):
+            # Removed between listdir and open, or from a crashed writer.
+            continue
+        for metric_name, description in metrics.items():
+            target = combined.setdefault(metric_name, dict(description, samples={}))
+            for key, value in description['samples']:
+                key = tuple(key)
+                if key not in target['samples']:
+                    target['samples'][key] = value
+                elif isinstance(value, list):
+                    target['samples'][key] = [a + b for a, b in zip(target['samples'][key], value)]
+                else:
+                    target['samples'][key] += value
+    for description in combined.values():
+        description['samples'] = [[list(key), value] for key, value in description['samples'].items()]
+    return combined
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = []
+    for name, description in sorted(collect().items()):
+        lines.append(f"# HELP {name} {description['help']}")
+        lines.append(f"# TYPE {name} {description['type']}")
+        labelnames = description['labelnames']
+        if not description['samples'] and not labelnames and description['type'] == 'counter':
+            lines.append(f"{name} 0")
+        for key, value in sorted(description['samples']):
+            if description['type'] == 'counter':
+                lines.append(f"{name}{_format_labels(labelnames, key)} {_format_number(value)}")
+                continue
+            cumulative = 0
+            bounds = description['buckets'] + [math.inf]
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                le = (('le', _format_number(float(bound)) if bound != math.inf else '+Inf'),)
+                lines.append(f"{name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_number(float(value[-2]))}")
+            lines.append(f"{name}_count{_format_labels(labelnames, key)} {value[-1]}")
+    return '\n'.join(lines) + '\n'
+
+
+def file_type(name):
+    """
+    The label used for a document's format: its extension, lower-cased.
+    """
+    return os.path.splitext(name or '')[1].lstrip('.').lower() or 'none'
+
+
+# --- The metrics --------------------------------------------------------------
+
+DOCLING_CONVERSION_SECONDS = Histogram(
+    'ats_docling_conversion_seconds',
+    "Time to convert one document with Docling, including the hand-off to the worker process.",
+    ['file_type'],
+)
+DOCLING_CONVERSION_ERRORS = Counter(
+    'ats_docling_conversion_errors_total',
+    "Documents Docling failed to convert.",
+    ['file_type', 'reason'],
+)
+LLM_REQUEST_SECONDS = Histogram(
+    'ats_llm_request_seconds',
+    "Time per HTTP request to Gemini, including retried attempts.",
+    ['status'],
+)
+LLM_TOKENS = Counter(
+    'ats_llm_tokens_total',
+    "Tokens reported by Gemini, by prompt or completion.",
+    ['kind'],
+)
+LLM_ERRORS = Counter(
+    'ats_llm_errors_total',
+    "Failed Gemini requests (each attempt), by HTTP status or 'transport'.",
+    ['reason'],
+)
+LLM_JSON_PARSE_FAILURES = Counter(
+    'ats_llm_json_parse_failures_total',
+    "Gemini answers no JSON array of candidates could be read from.",
+    ['reason'],
+)
+RESUME_FAILURES = Counter(
+    'ats_resume_processing_failures_total',
+    "Resumes that produced no candidates, by the stage that failed.",
+    ['stage'],
+)
+PARSE_CACHE_LOOKUPS = Counter(
+    'ats_parse_cache_lookups_total',
+    "Parse cache lookups by file hash, by 'hit' or 'miss' (see parse_cache.py).",
+    ['result'],
+)
+PARSE_CACHE_EVICTIONS = Counter(
+    'ats_parse_cache_evictions_total',
+    "Parse cache entries evicted to keep the cache under PARSE_CACHE_MAX_BYTES.",
+)
+CANDIDATES_INSERTED = Counter(
+    'ats_candidates_inserted_total',
+    "Candidates written to the database (counted on commit).",
+)
+CANDIDATE_DUPLICATES = Counter(
+    'ats_candidate_duplicates_flagged_total',
+    "New candidates flagged as near-duplicates of an earlier one.",
+)
+VIEW_SECONDS = Histogram(
+    'ats_view_seconds',
+    "Time to build the response of the instrumented views.",
+    ['view'],
+)
+WRITE_QUEUE_WAIT_SECONDS = Histogram(
+    'ats_write_queue_wait_seconds',
+    "Time from queuing a database write to the commit of its group (see write_queue.py).",
+)
+WRITE_QUEUE_GROUP_SIZE = Histogram(
+    'ats_write_queue_group_size',
+    "Writes committed together in one transaction.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
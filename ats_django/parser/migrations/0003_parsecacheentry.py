@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0002_ingestionjob_ingestiontask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParseCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('markdown', models.TextField()),
+                ('parsed_data', models.JSONField()),
+                ('raw_output', models.TextField(blank=True, default='')),
+                ('size_bytes', models.PositiveIntegerField(default=0)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingestiontask',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:51
+
+from django.db import migrations, models
+
+# The index as this migration creates it. Migrations keep their own copy of
+# the SQL, so a later change to parser/search.py can't change what they do.
+FTS_TABLE = 'parser_candidate_fts'
+INDEXED_FIELDS = [
+    'first_name', 'last_name', 'address', 'degree', 'degree_school',
+    'diploma', 'diploma_school', 'resume_file_name', 'resume_text',
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    columns = ', '.join(INDEXED_FIELDS)
+    new_values = ', '.join(f'new.{field}' for field in INDEXED_FIELDS)
+    old_values = ', '.join(f'old.{field}' for field in INDEXED_FIELDS)
+    statements = [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            {columns},
+            content='parser_candidate', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON parser_candidate BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON parser_candidate BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON parser_candidate BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});
+        END""",
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+    ]
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0003_parsecacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='resume_text',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
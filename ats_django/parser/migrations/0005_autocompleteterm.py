@@ -0,0 +1,93 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The triggers as this migration creates them. Migrations keep their own
+# copy of the SQL, so a later change to parser/autocomplete.py can't change
+# what they do.
+TERM_TABLE = 'parser_autocompleteterm'
+TRIGGER_PREFIX = 'parser_candidate_autocomplete'
+FIELDS = [
+    'first_name', 'last_name', 'address', 'degree', 'degree_school',
+    'diploma', 'diploma_school', 'resume_file_name',
+]
+
+
+def _add_statements(row):
+    return [
+        f"""INSERT INTO {TERM_TABLE}(job_id, field, value, key, count)
+            SELECT {row}.job_id, '{field}', trim({row}.{field}), lower(trim({row}.{field})), 1
+            WHERE trim(coalesce({row}.{field}, '')) != ''
+            ON CONFLICT(job_id, field, value) DO UPDATE SET count = count + 1;"""
+        for field in FIELDS
+    ]
+
+
+def _remove_statements(row):
+    statements = []
+    for field in FIELDS:
+        match = f"job_id = {row}.job_id AND field = '{field}' AND value = trim({row}.{field})"
+        statements.append(f"UPDATE {TERM_TABLE} SET count = count - 1 WHERE {match};")
+        statements.append(f"DELETE FROM {TERM_TABLE} WHERE {match} AND count <= 0;")
+    return statements
+
+
+def create_autocomplete_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    newline = '\n'
+    statements = [
+        f"""CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}_ai AFTER INSERT ON parser_candidate BEGIN
+            {newline.join(_add_statements('new'))}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}_ad AFTER DELETE ON parser_candidate BEGIN
+            {newline.join(_remove_statements('old'))}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {TRIGGER_PREFIX}_au AFTER UPDATE ON parser_candidate BEGIN
+            {newline.join(_remove_statements('old') + _add_statements('new'))}
+        END""",
+        f"DELETE FROM {TERM_TABLE}",
+    ]
+    for field in FIELDS:
+        statements.append(
+            f"""INSERT INTO {TERM_TABLE}(job_id, field, value, key, count)
+                SELECT job_id, '{field}', trim({field}), lower(trim({field})), count(*)
+                FROM parser_candidate WHERE trim(coalesce({field}, '')) != ''
+                GROUP BY job_id, trim({field})"""
+        )
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_autocomplete_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {TRIGGER_PREFIX}_{suffix}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0004_candidate_resume_text_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutocompleteTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=32)),
+                ('value', models.CharField(max_length=255)),
+                ('key', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='autocomplete_terms', to='parser.job')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', 'field', 'key'], name='autocomplete_term_prefix')],
+                'constraints': [models.UniqueConstraint(fields=('job', 'field', 'value'), name='autocomplete_term_unique')],
+            },
+        ),
+        migrations.RunPython(create_autocomplete_index, drop_autocomplete_index),
+    ]
@@ -0,0 +1,167 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The counter triggers as this migration installs them, and the statements
+# that fill the counters. Migrations keep their own copy of the SQL, so a
+# later change to parser/analytics.py can't change what they do.
+TRIGGERS = [
+    """CREATE TRIGGER parser_analytics_job_ai AFTER INSERT ON parser_job BEGIN
+            UPDATE parser_analyticscounter SET value = value + (1) WHERE name = 'jobs';
+            INSERT OR IGNORE INTO parser_jobcandidatecount(job_id, count) VALUES (new.id, 0);
+        END""",
+    """CREATE TRIGGER parser_analytics_job_ad AFTER DELETE ON parser_job BEGIN
+            UPDATE parser_analyticscounter SET value = value + (-1) WHERE name = 'jobs';
+        END""",
+    """CREATE TRIGGER parser_analytics_candidate_ai AFTER INSERT ON parser_candidate BEGIN
+            UPDATE parser_analyticscounter SET value = value + (1) WHERE name = 'candidates';
+            INSERT INTO parser_jobcandidatecount(job_id, count) VALUES (new.job_id, 1)
+                ON CONFLICT(job_id) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_degreecount(job_id, degree, count)
+                SELECT new.job_id, new.degree, 1 WHERE coalesce(new.degree, '') != ''
+                ON CONFLICT(job_id, degree) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_schoolcount(job_id, school, count)
+                SELECT new.job_id, new.degree_school, 1 WHERE coalesce(new.degree_school, '') != ''
+                ON CONFLICT(job_id, school) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_schoolcount(job_id, school, count)
+                SELECT new.job_id, new.diploma_school, 1 WHERE coalesce(new.diploma_school, '') != ''
+                ON CONFLICT(job_id, school) DO UPDATE SET count = count + 1;
+        END""",
+    """CREATE TRIGGER parser_analytics_candidate_ad AFTER DELETE ON parser_candidate BEGIN
+            UPDATE parser_analyticscounter SET value = value + (-1) WHERE name = 'candidates';
+            UPDATE parser_jobcandidatecount SET count = max(count - 1, 0) WHERE job_id = old.job_id;
+            UPDATE parser_degreecount SET count = count - 1 WHERE job_id = old.job_id AND degree = old.degree;
+            DELETE FROM parser_degreecount WHERE job_id = old.job_id AND degree = old.degree AND count <= 0;
+            UPDATE parser_schoolcount SET count = count - 1 WHERE job_id = old.job_id AND school = old.degree_school;
+            DELETE FROM parser_schoolcount WHERE job_id = old.job_id AND school = old.degree_school AND count <= 0;
+            UPDATE parser_schoolcount SET count = count - 1 WHERE job_id = old.job_id AND school = old.diploma_school;
+            DELETE FROM parser_schoolcount WHERE job_id = old.job_id AND school = old.diploma_school AND count <= 0;
+        END""",
+    """CREATE TRIGGER parser_analytics_candidate_au AFTER UPDATE OF job_id, degree, degree_school, diploma_school ON parser_candidate BEGIN
+            UPDATE parser_jobcandidatecount SET count = max(count - 1, 0) WHERE job_id = old.job_id;
+            UPDATE parser_degreecount SET count = count - 1 WHERE job_id = old.job_id AND degree = old.degree;
+            DELETE FROM parser_degreecount WHERE job_id = old.job_id AND degree = old.degree AND count <= 0;
+            UPDATE parser_schoolcount SET count = count - 1 WHERE job_id = old.job_id AND school = old.degree_school;
+            DELETE FROM parser_schoolcount WHERE job_id = old.job_id AND school = old.degree_school AND count <= 0;
+            UPDATE parser_schoolcount SET count = count - 1 WHERE job_id = old.job_id AND school = old.diploma_school;
+            DELETE FROM parser_schoolcount WHERE job_id = old.job_id AND school = old.diploma_school AND count <= 0;
+            INSERT INTO parser_jobcandidatecount(job_id, count) VALUES (new.job_id, 1)
+                ON CONFLICT(job_id) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_degreecount(job_id, degree, count)
+                SELECT new.job_id, new.degree, 1 WHERE coalesce(new.degree, '') != ''
+                ON CONFLICT(job_id, degree) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_schoolcount(job_id, school, count)
+                SELECT new.job_id, new.degree_school, 1 WHERE coalesce(new.degree_school, '') != ''
+                ON CONFLICT(job_id, school) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_schoolcount(job_id, school, count)
+                SELECT new.job_id, new.diploma_school, 1 WHERE coalesce(new.diploma_school, '') != ''
+                ON CONFLICT(job_id, school) DO UPDATE SET count = count + 1;
+        END""",
+]
+
+REBUILD = [
+    "DELETE FROM parser_analyticscounter",
+    "DELETE FROM parser_jobcandidatecount",
+    "DELETE FROM parser_degreecount",
+    "DELETE FROM parser_schoolcount",
+    "INSERT INTO parser_analyticscounter(name, value) SELECT 'jobs', count(*) FROM parser_job",
+    "INSERT INTO parser_analyticscounter(name, value) SELECT 'candidates', count(*) FROM parser_candidate",
+    """INSERT INTO parser_jobcandidatecount(job_id, count)
+            SELECT parser_job.id, count(parser_candidate.id) FROM parser_job
+            LEFT JOIN parser_candidate ON parser_candidate.job_id = parser_job.id
+            GROUP BY parser_job.id""",
+    """INSERT INTO parser_degreecount(job_id, degree, count)
+            SELECT job_id, value, count(*) FROM (
+                SELECT job_id, degree AS value FROM parser_candidate WHERE coalesce(degree, '') != ''
+            ) GROUP BY job_id, value""",
+    """INSERT INTO parser_schoolcount(job_id, school, count)
+            SELECT job_id, value, count(*) FROM (
+                SELECT job_id, degree_school AS value FROM parser_candidate WHERE coalesce(degree_school, '') != ''
+                UNION ALL
+                SELECT job_id, diploma_school AS value FROM parser_candidate WHERE coalesce(diploma_school, '') != ''
+            ) GROUP BY job_id, value""",
+]
+
+TRIGGER_NAMES = ['job_ai', 'job_ad', 'candidate_ai', 'candidate_ad', 'candidate_au']
+
+
+def install_triggers(schema_editor, triggers, rebuild, names):
+    """
+    Replaces the triggers `names` with `triggers` and recomputes every
+    counter. SQLite only. Used by the later analytics migrations too.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    drop_triggers(schema_editor, names)
+    for statement in triggers + rebuild:
+        schema_editor.execute(statement)
+
+
+def drop_triggers(schema_editor, names):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in names:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS parser_analytics_{name}")
+
+
+def create_analytics_counters(apps, schema_editor):
+    install_triggers(schema_editor, TRIGGERS, REBUILD, TRIGGER_NAMES)
+
+
+def drop_analytics_counters(apps, schema_editor):
+    drop_triggers(schema_editor, TRIGGER_NAMES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0005_autocompleteterm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsCounter',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobCandidateCount',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='candidate_count', serialize=False, to='parser.job')),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-count'], name='job_candidate_count_top')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DegreeCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('degree', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='degree_counts', to='parser.job')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', '-count'], name='degree_count_top')],
+                'constraints': [models.UniqueConstraint(fields=('job', 'degree'), name='degree_count_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SchoolCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('school', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='school_counts', to='parser.job')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', '-count'], name='school_count_top')],
+                'constraints': [models.UniqueConstraint(fields=('job', 'school'), name='school_count_unique')],
+            },
+        ),
+        migrations.RunPython(create_analytics_counters, drop_analytics_counters),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:03
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+first = import_module('parser.migrations.0006_analytics_counters')
+previous = import_module('parser.migrations.0007_analytics_data_version')
+
+# The triggers as this migration installs them: they also bump the per-job
+# versions. A frozen copy, like the one in 0006.
+TRIGGERS = [
+    """CREATE TRIGGER parser_analytics_job_ai AFTER INSERT ON parser_job BEGIN
+            UPDATE parser_analyticscounter SET value = value + (1) WHERE name = 'jobs';
+            UPDATE parser_analyticscounter SET value = value + (1) WHERE name = 'version';
+            UPDATE parser_analyticscounter SET value = CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER) WHERE name = 'modified_at';
+            INSERT OR IGNORE INTO parser_jobcandidatecount(job_id, count, version) VALUES (new.id, 0, 0);
+        END""",
+    """CREATE TRIGGER parser_analytics_job_ad AFTER DELETE ON parser_job BEGIN
+            UPDATE parser_analyticscounter SET value = value + (-1) WHERE name = 'jobs';
+            UPDATE parser_analyticscounter SET value = value + (1) WHERE name = 'version';
+            UPDATE parser_analyticscounter SET value = CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER) WHERE name = 'modified_at';
+        END""",
+    """CREATE TRIGGER parser_analytics_job_au AFTER UPDATE ON parser_job BEGIN
+            UPDATE parser_analyticscounter SET value = value + (1) WHERE name = 'version';
+            UPDATE parser_analyticscounter SET value = CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER) WHERE name = 'modified_at';
+            UPDATE parser_jobcandidatecount SET version = version + 1 WHERE job_id = new.id;
+        END""",
+    """CREATE TRIGGER parser_analytics_candidate_ai AFTER INSERT ON parser_candidate BEGIN
+            UPDATE parser_analyticscounter SET value = value + (1) WHERE name = 'candidates';
+            UPDATE parser_analyticscounter SET value = value + (1) WHERE name = 'version';
+            UPDATE parser_analyticscounter SET value = CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER) WHERE name = 'modified_at';
+            INSERT INTO parser_jobcandidatecount(job_id, count, version) VALUES (new.job_id, 1, 0)
+                ON CONFLICT(job_id) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_degreecount(job_id, degree, count)
+                SELECT new.job_id, new.degree, 1 WHERE coalesce(new.degree, '') != ''
+                ON CONFLICT(job_id, degree) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_schoolcount(job_id, school, count)
+                SELECT new.job_id, new.degree_school, 1 WHERE coalesce(new.degree_school, '') != ''
+                ON CONFLICT(job_id, school) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_schoolcount(job_id, school, count)
+                SELECT new.job_id, new.diploma_school, 1 WHERE coalesce(new.diploma_school, '') != ''
+                ON CONFLICT(job_id, school) DO UPDATE SET count = count + 1;
+            UPDATE parser_jobcandidatecount SET version = version + 1 WHERE job_id = new.job_id;
+        END""",
+    """CREATE TRIGGER parser_analytics_candidate_ad AFTER DELETE ON parser_candidate BEGIN
+            UPDATE parser_analyticscounter SET value = value + (-1) WHERE name = 'candidates';
+            UPDATE parser_analyticscounter SET value = value + (1) WHERE name = 'version';
+            UPDATE parser_analyticscounter SET value = CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER) WHERE name = 'modified_at';
+            UPDATE parser_jobcandidatecount SET count = max(count - 1, 0) WHERE job_id = old.job_id;
+            UPDATE parser_degreecount SET count = count - 1 WHERE job_id = old.job_id AND degree = old.degree;
+            DELETE FROM parser_degreecount WHERE job_id = old.job_id AND degree = old.degree AND count <= 0;
+            UPDATE parser_schoolcount SET count = count - 1 WHERE job_id = old.job_id AND school = old.degree_school;
+            DELETE FROM parser_schoolcount WHERE job_id = old.job_id AND school = old.degree_school AND count <= 0;
+            UPDATE parser_schoolcount SET count = count - 1 WHERE job_id = old.job_id AND school = old.diploma_school;
+            DELETE FROM parser_schoolcount WHERE job_id = old.job_id AND school = old.diploma_school AND count <= 0;
+            UPDATE parser_jobcandidatecount SET version = version + 1 WHERE job_id = old.job_id;
+        END""",
+    """CREATE TRIGGER parser_analytics_candidate_au AFTER UPDATE ON parser_candidate BEGIN
+            UPDATE parser_analyticscounter SET value = value + (1) WHERE name = 'version';
+            UPDATE parser_analyticscounter SET value = CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER) WHERE name = 'modified_at';
+            UPDATE parser_jobcandidatecount SET version = version + 1 WHERE job_id = old.job_id;
+            UPDATE parser_jobcandidatecount SET version = version + 1 WHERE job_id = new.job_id AND new.job_id != old.job_id;
+        END""",
+    """CREATE TRIGGER parser_analytics_candidate_counts_au AFTER UPDATE OF job_id, degree, degree_school, diploma_school ON parser_candidate BEGIN
+            UPDATE parser_jobcandidatecount SET count = max(count - 1, 0) WHERE job_id = old.job_id;
+            UPDATE parser_degreecount SET count = count - 1 WHERE job_id = old.job_id AND degree = old.degree;
+            DELETE FROM parser_degreecount WHERE job_id = old.job_id AND degree = old.degree AND count <= 0;
+            UPDATE parser_schoolcount SET count = count - 1 WHERE job_id = old.job_id AND school = old.degree_school;
+            DELETE FROM parser_schoolcount WHERE job_id = old.job_id AND school = old.degree_school AND count <= 0;
+            UPDATE parser_schoolcount SET count = count - 1 WHERE job_id = old.job_id AND school = old.diploma_school;
+            DELETE FROM parser_schoolcount WHERE job_id = old.job_id AND school = old.diploma_school AND count <= 0;
+            INSERT INTO parser_jobcandidatecount(job_id, count, version) VALUES (new.job_id, 1, 0)
+                ON CONFLICT(job_id) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_degreecount(job_id, degree, count)
+                SELECT new.job_id, new.degree, 1 WHERE coalesce(new.degree, '') != ''
+                ON CONFLICT(job_id, degree) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_schoolcount(job_id, school, count)
+                SELECT new.job_id, new.degree_school, 1 WHERE coalesce(new.degree_school, '') != ''
+                ON CONFLICT(job_id, school) DO UPDATE SET count = count + 1;
+            INSERT INTO parser_schoolcount(job_id, school, count)
+                SELECT new.job_id, new.diploma_school, 1 WHERE coalesce(new.diploma_school, '') != ''
+                ON CONFLICT(job_id, school) DO UPDATE SET count = count + 1;
+        END""",
+]
+
+REBUILD = [
+    "DELETE FROM parser_analyticscounter WHERE name IN ('jobs', 'candidates')",
+    "INSERT OR IGNORE INTO parser_analyticscounter(name, value) VALUES ('version', 0), ('modified_at', 0)",
+    "UPDATE parser_analyticscounter SET value = value + (1) WHERE name = 'version';",
+    "UPDATE parser_analyticscounter SET value = CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER) WHERE name = 'modified_at';",
+    "DELETE FROM parser_jobcandidatecount WHERE job_id NOT IN (SELECT id FROM parser_job)",
+    "DELETE FROM parser_degreecount",
+    "DELETE FROM parser_schoolcount",
+    "INSERT INTO parser_analyticscounter(name, value) SELECT 'jobs', count(*) FROM parser_job",
+    "INSERT INTO parser_analyticscounter(name, value) SELECT 'candidates', count(*) FROM parser_candidate",
+    """INSERT INTO parser_jobcandidatecount(job_id, count, version)
+            SELECT parser_job.id, count(parser_candidate.id), 1 FROM parser_job
+            LEFT JOIN parser_candidate ON parser_candidate.job_id = parser_job.id
+            WHERE true GROUP BY parser_job.id
+            ON CONFLICT(job_id) DO UPDATE SET count = excluded.count, version = version + 1""",
+    """INSERT INTO parser_degreecount(job_id, degree, count)
+            SELECT job_id, value, count(*) FROM (
+                SELECT job_id, degree AS value FROM parser_candidate WHERE coalesce(degree, '') != ''
+            ) GROUP BY job_id, value""",
+    """INSERT INTO parser_schoolcount(job_id, school, count)
+            SELECT job_id, value, count(*) FROM (
+                SELECT job_id, degree_school AS value FROM parser_candidate WHERE coalesce(degree_school, '') != ''
+                UNION ALL
+                SELECT job_id, diploma_school AS value FROM parser_candidate WHERE coalesce(diploma_school, '') != ''
+            ) GROUP BY job_id, value""",
+]
+
+TRIGGER_NAMES = previous.TRIGGER_NAMES
+
+
+def reinstall_analytics_counters(apps, schema_editor):
+    # Recreates the triggers so they also bump the per-job versions.
+    first.install_triggers(schema_editor, TRIGGERS, REBUILD, TRIGGER_NAMES)
+
+
+def drop_analytics_counters(apps, schema_editor):
+    # SQLite remakes parser_jobcandidatecount to add or remove the column,
+    # which fails while triggers on other tables still refer to it.
+    first.drop_triggers(schema_editor, TRIGGER_NAMES)
+
+
+def restore_analytics_counters(apps, schema_editor):
+    # Once the version column is gone: 0007's counter rows leave it out.
+    first.install_triggers(schema_editor, previous.TRIGGERS, previous.REBUILD, previous.TRIGGER_NAMES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0007_analytics_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_analytics_counters, restore_analytics_counters),
+        migrations.AddField(
+            model_name='jobcandidatecount',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(reinstall_analytics_counters, drop_analytics_counters),
+    ]
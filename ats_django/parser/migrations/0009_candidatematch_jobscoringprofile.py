@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0008_jobcandidatecount_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobScoringProfile',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='scoring_profile', serialize=False, to='parser.job')),
+                ('description_hash', models.CharField(max_length=64)),
+                ('document_frequency', models.JSONField(default=dict)),
+                ('documents', models.PositiveIntegerField(default=0)),
+                ('documents_at_rescore', models.PositiveIntegerField(default=0)),
+                ('leaderboard', models.JSONField(default=list)),
+                ('scored_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CandidateMatch',
+            fields=[
+                ('candidate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='match', serialize=False, to='parser.candidate')),
+                ('score', models.FloatField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_matches', to='parser.job')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', '-score'], name='candidate_match_top')],
+            },
+        ),
+    ]
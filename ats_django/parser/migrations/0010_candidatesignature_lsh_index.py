@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The bucket table as this migration creates it. Migrations keep their own
+# copy of the SQL, so a later change to parser/dedup.py can't change what
+# they do (and they don't need numpy to run).
+BUCKET_TABLE = 'parser_lsh_bucket'
+
+
+def create_lsh_index(apps, schema_editor):
+    suffix = ' WITHOUT ROWID' if schema_editor.connection.vendor == 'sqlite' else ''
+    schema_editor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {BUCKET_TABLE} (
+            bucket BIGINT NOT NULL,
+            candidate_id INTEGER NOT NULL,
+            PRIMARY KEY (bucket, candidate_id)
+        ){suffix}"""
+    )
+
+
+def drop_lsh_index(apps, schema_editor):
+    schema_editor.execute(f"DROP TABLE IF EXISTS {BUCKET_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0009_candidatematch_jobscoringprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateSignature',
+            fields=[
+                ('candidate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='parser.candidate')),
+                ('minhash', models.BinaryField()),
+                ('similarity', models.FloatField(blank=True, null=True)),
+                ('duplicate_of', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='possible_duplicates', to='parser.candidate')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_signatures', to='parser.job')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', '-similarity'], name='candidate_signature_dupes')],
+            },
+        ),
+        migrations.RunPython(create_lsh_index, drop_lsh_index),
+    ]
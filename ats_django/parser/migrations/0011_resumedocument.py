@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0010_candidatesignature_lsh_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parsecacheentry',
+            name='extraction_version',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='ResumeDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_name', models.CharField(max_length=255)),
+                ('content_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('markdown', models.BinaryField()),
+                ('raw_output', models.TextField(blank=True, default='')),
+                ('parsed_data', models.JSONField(blank=True, null=True)),
+                ('extraction_version', models.CharField(max_length=64)),
+                ('extracted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('worker_id', models.CharField(blank=True, default='', max_length=100)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resume_documents', to='parser.job')),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resume_documents', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='document',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='candidates', to='parser.resumedocument'),
+        ),
+        migrations.AddIndex(
+            model_name='resumedocument',
+            index=models.Index(fields=['extraction_version', 'id'], name='resume_document_version'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def use_wal(apps, schema_editor):
+    # WAL is a property of the database file, so it is set once here rather
+    # than by every connection (see DATABASES in ats_system.settings).
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA journal_mode=WAL')
+
+
+def use_rollback_journal(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA journal_mode=DELETE')
+
+
+class Migration(migrations.Migration):
+    # SQLite can't change the journal mode inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('parser', '0011_resumedocument'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_wal, use_rollback_journal),
+    ]
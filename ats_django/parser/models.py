@@ -47,8 +47,236 @@ class Candidate(models.Model):
     diploma = models.CharField(max_length=255, null=True, blank=True)
     diploma_school = models.CharField(max_length=255, null=True, blank=True)
     resume_file_name = models.CharField(max_length=255)
+    # Markdown Docling extracted from the resume; indexed for full-text search (see search.py).
+    # Kept uncompressed on every candidate, even though `document` holds a
+    # compressed copy: the FTS5 index takes its content, and its triggers
+    # the old values to delete, from this table in SQL, which can't inflate
+    # zlib, and scoring and duplicate checks read it in bulk querysets. Each
+    # candidate of a multi-person resume must match its text on its own.
+    resume_text = models.TextField(null=True, blank=True)
     job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='candidates')
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    # The stored resume the candidate was extracted from (see parser/reextraction.py).
+    document = models.ForeignKey(
+        'ResumeDocument', on_delete=models.SET_NULL, null=True, blank=True, related_name='candidates',
+    )
 
     def __str__(self):
-        return f"{self.first_name} {self.last_name}"
\ No newline at end of file
+        return f"{self.first_name} {self.last_name}"
+
+class IngestionJob(models.Model):
+    """
+    A batch of resumes uploaded together for a job posting. The batch is
+    processed in the background by the ingestion workers (see parser/ingestion.py).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='ingestion_jobs')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ingestion_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total_files = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Ingestion #{self.id} for {self.job}"
+
+class IngestionTask(models.Model):
+    """
+    A single resume file waiting to be (or already) parsed. Workers claim
+    pending tasks with a conditional UPDATE, so the table itself is the queue.
+    """
+    ingestion_job = models.ForeignKey(IngestionJob, on_delete=models.CASCADE, related_name='tasks')
+    resume_file = models.FileField(upload_to='ingestion')
+    original_name = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=20, choices=IngestionJob.STATUS_CHOICES, default=IngestionJob.STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker_id = models.CharField(max_length=100, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    candidates_created = models.PositiveIntegerField(default=0)
+    raw_output = models.TextField(blank=True, default='')
+    parsed_data = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.original_name} ({self.status})"
+
+class ParseCacheEntry(models.Model):
+    """
+    Docling markdown and Gemini output for a resume, keyed by the SHA-256 of
+    the file's bytes, so re-uploads of the same file skip both stages.
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    markdown = models.TextField()
+    parsed_data = models.JSONField()
+    raw_output = models.TextField(blank=True, default='')
+    # Extractor version of parsed_data; entries of another version only save the conversion.
+    extraction_version = models.CharField(max_length=64, blank=True, default='')
+    size_bytes = models.PositiveIntegerField(default=0)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.content_hash
+
+class AutocompleteTerm(models.Model):
+    """
+    A distinct value of a filterable Candidate column within a job, with the
+    number of candidates that have it. Maintained by database triggers
+    (see parser/autocomplete.py).
+    """
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='autocomplete_terms')
+    field = models.CharField(max_length=32)
+    value = models.CharField(max_length=255)
+    # `value` lowercased, for case-insensitive prefix lookups.
+    key = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'field', 'value'], name='autocomplete_term_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['job', 'field', 'key'], name='autocomplete_term_prefix'),
+        ]
+
+    def __str__(self):
+        return f"{self.field}: {self.value}"
+
+class AnalyticsCounter(models.Model):
+    """
+    A site-wide total shown on the dashboard, e.g. 'jobs' or 'candidates'.
+    This and the per-job count tables below are maintained by database
+    triggers (see parser/analytics.py).
+    """
+    name = models.CharField(max_length=64, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+class JobCandidateCount(models.Model):
+    job = models.OneToOneField(Job, on_delete=models.CASCADE, primary_key=True, related_name='candidate_count')
+    count = models.PositiveIntegerField(default=0)
+    # Bumped on every write to the job or its candidates; keys the response cache (see response_cache.py).
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['-count'], name='job_candidate_count_top')]
+
+class DegreeCount(models.Model):
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='degree_counts')
+    degree = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['job', 'degree'], name='degree_count_unique')]
+        indexes = [models.Index(fields=['job', '-count'], name='degree_count_top')]
+
+class SchoolCount(models.Model):
+    """
+    Candidates per school within a job, counting both the degree school and
+    the diploma school of each candidate.
+    """
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='school_counts')
+    school = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['job', 'school'], name='school_count_unique')]
+        indexes = [models.Index(fields=['job', '-count'], name='school_count_top')]
+
+class CandidateMatch(models.Model):
+    """
+    How well a candidate's resume matches their job's description, from 0
+    to 1 (see parser/matching.py). Kept out of Candidate so that writing
+    scores doesn't re-run the search and autocomplete triggers.
+    """
+    candidate = models.OneToOneField(Candidate, on_delete=models.CASCADE, primary_key=True, related_name='match')
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='candidate_matches')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [models.Index(fields=['job', '-score'], name='candidate_match_top')]
+
+class JobScoringProfile(models.Model):
+    """
+    A job's scoring state: the document frequencies of its description's
+    terms among its candidates, and its best-matching candidates.
+    """
+    job = models.OneToOneField(Job, on_delete=models.CASCADE, primary_key=True, related_name='scoring_profile')
+    # SHA-256 of the description the frequencies were counted for.
+    description_hash = models.CharField(max_length=64)
+    document_frequency = models.JSONField(default=dict)
+    documents = models.PositiveIntegerField(default=0)
+    # Candidates at the last full scoring, to tell when the pool has grown enough to rescore.
+    documents_at_rescore = models.PositiveIntegerField(default=0)
+    # [[candidate id, score], ...], best first, at most MATCH_LEADERBOARD_SIZE entries.
+    leaderboard = models.JSONField(default=list)
+    scored_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Scoring profile of {self.job}"
+
+class CandidateSignature(models.Model):
+    """
+    MinHash signature of a candidate's resume text, and the earlier
+    candidate it most likely duplicates, if any (see parser/dedup.py).
+    """
+    candidate = models.OneToOneField(Candidate, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='candidate_signatures')
+    minhash = models.BinaryField()
+    duplicate_of = models.ForeignKey(
+        Candidate, on_delete=models.SET_NULL, null=True, blank=True, related_name='possible_duplicates',
+    )
+    # Estimated Jaccard similarity of the two resumes' shingles.
+    similarity = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['job', '-similarity'], name='candidate_signature_dupes')]
+
+
+class ResumeDocument(models.Model):
+    """
+    An uploaded resume as the pipeline saw it: the Docling markdown
+    (zlib-compressed) and the extractor's raw and parsed output, tagged with
+    the version of the extractor that produced them. Candidates of a stale
+    version are re-extracted from the markdown, without converting the file
+    again (see parser/reextraction.py).
+    """
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='resume_documents')
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='resume_documents')
+    original_name = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    markdown = models.BinaryField()
+    raw_output = models.TextField(blank=True, default='')
+    parsed_data = models.JSONField(null=True, blank=True)
+    extraction_version = models.CharField(max_length=64)
+    extracted_at = models.DateTimeField(default=timezone.now)
+    # Set while a re-extraction worker holds the document.
+    worker_id = models.CharField(max_length=100, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [models.Index(fields=['extraction_version', 'id'], name='resume_document_version')]
+
+    def __str__(self):
+        return self.original_name
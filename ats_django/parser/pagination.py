@@ -0,0 +1,148 @@
+"""
+Keyset (cursor) pagination for the candidate table.
+
+A page is fetched with `WHERE (sort_key, id) > (last sort_key, last id)
+ORDER BY sort_key, id LIMIT n` rather than OFFSET, so page 500 costs the
+same as page 1 and rows inserted by a running ingestion don't shift later
+pages. id breaks ties between equal sort keys.
+
+NULLs sort first in ascending order and last in descending order (SQLite's
+own default, spelled out so other databases agree), and the cursor
+condition follows the same rule.
+
+The cursor is opaque to clients: base64 JSON holding the last row's sort
+key and id, plus the total from the first page so later pages don't count
+again. Totals are counted up to CANDIDATE_COUNT_LIMIT rows and shown as
+"N+" beyond that.
+"""
+import base64
+import binascii
+import json
+from datetime import date
+
+from django.conf import settings
+from django.db.models import F, Q
+
+# Columns the candidate table can be sorted by. `search_rank` only exists
+# on free-text searches (see search.py); `match_score` is annotated from
+# CandidateMatch (see matching.py).
+SORT_FIELDS = [
+    'id', 'first_name', 'last_name', 'address', 'date_of_birth', 'degree',
+    'degree_school', 'diploma', 'diploma_school', 'resume_file_name', 'match_score', 'search_rank',
+]
+
+DATE_FIELDS = {'date_of_birth'}
+
+
+class Page:
+    def __init__(self, rows, next_cursor, count, count_exact):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.count = count
+        self.count_exact = count_exact
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def count_label(self):
+        return f"{self.count:,}" if self.count_exact else f"{self.count:,}+"
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns the cursor's dict, or None if it is missing or malformed (a
+    malformed cursor just restarts from the first page).
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, dict) or not isinstance(values.get('id'), int):
+        return None
+    return values
+
+
+def approximate_count(queryset, limit=None):
+    """
+    Counts rows up to `limit` (COUNT over a LIMITed subquery), so a huge job
+    doesn't cost a full count. Returns (count, exact).
+    """
+    limit = settings.CANDIDATE_COUNT_LIMIT if limit is None else limit
+    count = queryset.order_by()[:limit + 1].count()
+    if count > limit:
+        return limit, False
+    return count, True
+
+
+def _order(sort_by, descending):
+    if descending:
+        return [F(sort_by).desc(nulls_last=True), F('id').desc()]
+    return [F(sort_by).asc(nulls_first=True), F('id').asc()]
+
+
+def _after(sort_by, descending, value, last_id):
+    """
+    The WHERE clause selecting the rows that come after (value, last_id).
+    """
+    if descending:
+        if value is None:
+            return Q(**{f'{sort_by}__isnull': True, 'id__lt': last_id})
+        return (Q(**{f'{sort_by}__lt': value})
+                | Q(**{sort_by: value, 'id__lt': last_id})
+                | Q(**{f'{sort_by}__isnull': True}))
+    if value is None:
+        return Q(**{f'{sort_by}__isnull': True, 'id__gt': last_id}) | Q(**{f'{sort_by}__isnull': False})
+    return Q(**{f'{sort_by}__gt': value}) | Q(**{sort_by: value, 'id__gt': last_id})
+
+
+def _to_json(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def _from_json(sort_by, value):
+    if value is not None and sort_by in DATE_FIELDS:
+        return date.fromisoformat(value)
+    return value
+
+
+def paginate(queryset, sort_by, descending=False, cursor=None, page_size=None):
+    """
+    Returns the Page of `queryset` ordered by (`sort_by`, id) that follows
+    `cursor` (the first page if there is none).
+    """
+    page_size = page_size or settings.CANDIDATE_PAGE_SIZE
+    position = decode_cursor(cursor)
+    if position and 'count' in position:
+        count, count_exact = position['count'], position.get('exact', True)
+    else:
+        count, count_exact = approximate_count(queryset)
+
+    page = queryset.order_by(*_order(sort_by, descending))
+    if position:
+        try:
+            value = _from_json(sort_by, position.get('value'))
+        except (TypeError, ValueError):
+            value, position = None, None
+        if position:
+            page = page.filter(_after(sort_by, descending, value, position['id']))
+
+    rows = list(page[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor({
+            'value': _to_json(getattr(last, sort_by)),
+            'id': last.id,
+            'count': count,
+            'exact': count_exact,
+        })
+    return Page(rows, next_cursor, count, count_exact)
@@ -0,0 +1,210 @@
+"""
+Content-addressed cache of parse results.
+
+Entries are keyed by the SHA-256 of the uploaded file, so the same resume
+uploaded to several jobs (or re-uploaded after an error) is only converted by
+Docling and sent to Gemini once. The cache is bounded by PARSE_CACHE_MAX_BYTES;
+the least recently used entries are evicted first.
+
+Hits are counted in memory and written together (see `flush_hits`), at
+most every PARSE_CACHE_HIT_FLUSH_SECONDS, instead of one UPDATE per hit;
+hits not yet written when a process exits are lost, which only makes
+their entries look a little less recently used. Each process also keeps a
+running estimate of the cache's size, so a store only sums the table when
+the estimate says it may be over the limit (see `evict`).
+
+Lookups and evictions are counted per process by `stats`, and for every
+process in the Prometheus metrics (see metrics.py).
+
+Entries remember the extractor version of their parse. An entry of an older
+version (see `is_current`) still saves the conversion: only its markdown is
+used, and the fields are extracted again.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import metrics
+from .extractors import extraction_version
+from .models import ParseCacheEntry
+from .write_queue import write
+
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+_stats_lock = threading.Lock()
+
+# Entry id -> hits since the last flush, and when the last of them was.
+_hits = {}
+_hits_flushed_at = time.monotonic()
+
+# Bytes this process thinks the cache holds, or None until it is first counted.
+# Other processes' stores aren't seen, so it is counted again every RECOUNT_EVERY stores.
+_size_estimate = None
+_stores_since_count = 0
+RECOUNT_EVERY = 100
+
+
+class HashingFile(File):
+    """
+    Wraps an uploaded file so that the SHA-256 of its bytes is computed while
+    it is being written to disk, instead of reading it a second time.
+    """
+
+    def __init__(self, file, name=None):
+        super().__init__(file, name or file.name)
+        self._hasher = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for chunk in self.file.chunks(chunk_size):
+            self._hasher.update(chunk)
+            yield chunk
+
+    @property
+    def size(self):
+        return self.file.size
+
+    def hexdigest(self):
+        return self._hasher.hexdigest()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def stats():
+    """
+    Hit/miss/eviction counters for this process, plus the current cache size.
+    """
+    with _stats_lock:
+        counters = dict(_stats)
+    lookups = counters['hits'] + counters['misses']
+    counters['hit_ratio'] = counters['hits'] / lookups if lookups else 0.0
+    counters['entries'] = ParseCacheEntry.objects.count()
+    counters['size_bytes'] = ParseCacheEntry.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    return counters
+
+
+def lookup(content_hash):
+    """
+    Returns the cached entry for a file hash, or None on a miss.
+    """
+    if not settings.PARSE_CACHE_ENABLED or not content_hash:
+        return None
+    entry = ParseCacheEntry.objects.filter(content_hash=content_hash).first()
+    if entry is None:
+        _count('misses')
+        metrics.PARSE_CACHE_LOOKUPS.inc(result='miss')
+        return None
+    metrics.PARSE_CACHE_LOOKUPS.inc(result='hit')
+    with _stats_lock:
+        _stats['hits'] += 1
+        _hits[entry.id] = (_hits.get(entry.id, (0, None))[0] + 1, timezone.now())
+        due = time.monotonic() - _hits_flushed_at >= settings.PARSE_CACHE_HIT_FLUSH_SECONDS
+    if due:
+        flush_hits()
+    return entry
+
+
+def flush_hits():
+    """
+    Writes the hits counted since the last flush to their entries'
+    hit_count and last_used_at, in one write queue operation.
+    """
+    global _hits, _hits_flushed_at
+    with _stats_lock:
+        hits, _hits = _hits, {}
+        _hits_flushed_at = time.monotonic()
+    if hits:
+        write(_save_hits, hits)
+
+
+def _save_hits(hits):
+    ParseCacheEntry.objects.bulk_update(
+        [ParseCacheEntry(id=entry_id, hit_count=F('hit_count') + count, last_used_at=used_at)
+         for entry_id, (count, used_at) in hits.items()],
+        ['hit_count', 'last_used_at'],
+        batch_size=500,
+    )
+
+
+def is_current(entry):
+    """
+    Whether a cached entry was parsed by the configured extractor version.
+    """
+    return entry.extraction_version == extraction_version()
+
+
+def store(content_hash, markdown, parsed_data, raw_output):
+    """
+    Saves a successful parse under the file's hash and evicts old entries if
+    the cache has grown past its size limit. The write goes through the
+    write queue (see write_queue.py).
+    """
+    if not settings.PARSE_CACHE_ENABLED or not content_hash:
+        return
+    write(_store, content_hash, markdown, parsed_data, raw_output or '')
+
+
+def _store(content_hash, markdown, parsed_data, raw_output):
+    size_bytes = len(markdown.encode()) + len(raw_output.encode())
+    ParseCacheEntry.objects.update_or_create(
+        content_hash=content_hash,
+        defaults={
+            'markdown': markdown,
+            'parsed_data': parsed_data,
+            'raw_output': raw_output,
+            'extraction_version': extraction_version(),
+            'size_bytes': size_bytes,
+            'last_used_at': timezone.now(),
+        },
+    )
+    global _size_estimate, _stores_since_count
+    with _stats_lock:
+        _stores_since_count += 1
+        if _size_estimate is not None:
+            # A replaced entry's old size is still counted, so this errs high.
+            _size_estimate += size_bytes
+        recount = (_size_estimate is None or _size_estimate > settings.PARSE_CACHE_MAX_BYTES
+                   or _stores_since_count >= RECOUNT_EVERY)
+    if recount:
+        evict()
+
+
+def evict(max_bytes=None):
+    """
+    Counts the cache's size and deletes least recently used entries until
+    it is back under 90% of its size limit, so we don't evict again on every
+    single store.
+    """
+    global _size_estimate, _stores_since_count
+    max_bytes = settings.PARSE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    total = ParseCacheEntry.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    if total <= max_bytes:
+        with _stats_lock:
+            _size_estimate, _stores_since_count = total, 0
+        return 0
+
+    # Recent hits decide which entries are least recently used.
+    flush_hits()
+    target = max_bytes * 0.9
+
+    doomed = []
+    for entry_id, size_bytes in ParseCacheEntry.objects.order_by('last_used_at').values_list('id', 'size_bytes').iterator():
+        if total <= target:
+            break
+        doomed.append(entry_id)
+        total -= size_bytes
+    # Delete in slices to stay under SQLite's bound-parameter limit.
+    for start in range(0, len(doomed), 500):
+        ParseCacheEntry.objects.filter(id__in=doomed[start:start + 500]).delete()
+    with _stats_lock:
+        _stats['evictions'] += len(doomed)
+        _size_estimate, _stores_since_count = total, 0
+    if doomed:
+        metrics.PARSE_CACHE_EVICTIONS.inc(len(doomed))
+    return len(doomed)
@@ -0,0 +1,107 @@
+"""
+Turning parsed Gemini output into Candidate rows.
+
+Rows are validated and normalized up front, so one malformed value (most
+often a date of birth Gemini didn't manage to reformat) is dropped with a
+warning instead of failing the insert for the whole batch. The rows are then
+written with `bulk_create` inside a single transaction. Once it commits they
+are scored against their job's description (see matching.py) and checked
+for near-duplicates (see dedup.py).
+"""
+from datetime import datetime
+
+from django.db import transaction
+
+from . import dedup, matching, metrics
+from .models import Candidate
+
+# Formats Gemini has been seen to return despite being asked for YYYY-MM-DD.
+DATE_FORMATS = ['%Y-%m-%d', '%Y/%m/%d', '%b %d, %Y', '%B %d, %Y', '%d %b %Y', '%d %B %Y', '%m/%d/%Y']
+
+TEXT_FIELDS = ['first_name', 'last_name', 'address', 'degree', 'degree_school', 'diploma', 'diploma_school']
+
+INSERT_BATCH_SIZE = 500
+
+
+def normalize_date(value):
+    """
+    Parses a date of birth in any of DATE_FORMATS.
+    Returns (date or None, warning or None).
+    """
+    if value in (None, ''):
+        return None, None
+    text = str(value).strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date(), None
+        except ValueError:
+            continue
+    return None, f"Ignored unrecognised date of birth '{text}'."
+
+
+def normalize_candidate(item):
+    """
+    Cleans one parsed candidate: strips whitespace, turns empty strings into
+    None and trims values to the column lengths. Returns (fields, warnings).
+    """
+    fields = {}
+    warnings = []
+    for name in TEXT_FIELDS:
+        value = item.get(name)
+        if value is not None and not isinstance(value, str):
+            value = str(value)
+        value = value.strip() if value else None
+        max_length = Candidate._meta.get_field(name).max_length
+        if value and len(value) > max_length:
+            warnings.append(f"Truncated {name} to {max_length} characters.")
+            value = value[:max_length]
+        fields[name] = value or None
+
+    fields['date_of_birth'], warning = normalize_date(item.get('date_of_birth'))
+    if warning:
+        warnings.append(warning)
+    return fields, warnings
+
+
+def build_candidates(parsed_data, resume_file_name, job, uploaded_by, resume_text=None):
+    """
+    Builds (unsaved) Candidate objects for the parsed output of one resume.
+    `resume_text` is the resume's extracted markdown, kept for full-text search.
+    Returns (candidates, warnings).
+    """
+    candidates = []
+    warnings = []
+    for item in parsed_data:
+        if not isinstance(item, dict):
+            warnings.append("Skipped a candidate entry that was not a JSON object.")
+            continue
+        fields, item_warnings = normalize_candidate(item)
+        warnings.extend(item_warnings)
+        candidates.append(Candidate(
+            resume_file_name=resume_file_name[:Candidate._meta.get_field('resume_file_name').max_length],
+            job=job,
+            uploaded_by=uploaded_by,
+            resume_text=resume_text,
+            **fields
+        ))
+    return candidates, warnings
+
+
+def insert_candidates(candidates):
+    """
+    Writes candidates in one transaction (one commit, one fsync on SQLite)
+    and returns how many were inserted. Call it inside an outer
+    `transaction.atomic()` to commit other bookkeeping together with the rows.
+    """
+    if not candidates:
+        return 0
+    with transaction.atomic():
+        Candidate.objects.bulk_create(candidates, batch_size=INSERT_BATCH_SIZE)
+        count = len(candidates)
+        transaction.on_commit(lambda: metrics.CANDIDATES_INSERTED.inc(count))
+        # Scored and checked for duplicates once committed; a failure there is
+        # logged and doesn't undo the insert (see matching.py and dedup.py).
+        candidate_ids = [candidate.pk for candidate in candidates]
+        transaction.on_commit(lambda: matching.score_new_candidates(candidate_ids), robust=True)
+        transaction.on_commit(lambda: dedup.index_new_candidates(candidate_ids), robust=True)
+    return count
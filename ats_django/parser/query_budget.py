@@ -0,0 +1,149 @@
+"""
+Per-request SQL accounting: how many queries a view runs, how long they
+take, and which ones repeat.
+
+`QueryBudgetMiddleware` records every request and compares the count with
+the view's entry in QUERY_BUDGETS (keyed by URL name). Going over budget,
+or running the same query shape QUERY_BUDGET_REPEAT_THRESHOLD times or more
+(the usual sign of an N+1 loop over a queryset), is printed, or raised as
+QueryBudgetExceeded when QUERY_BUDGET_MODE is 'raise'.
+
+`record_queries` and `assert_query_budget` do the same around any block of
+code, for tests and the `check_query_budgets` command.
+
+Queries run while a StreamingHttpResponse is being sent happen after the
+middleware has returned and are not counted.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACE = re.compile(r"\s+")
+_SELECT_LIST = re.compile(r"^SELECT (?:DISTINCT )?.*? FROM ")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """
+    The shape of a query: literals and IN lists of any length collapsed, so
+    the same query run for different rows gets the same fingerprint.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _IN_LIST.sub('(%s, ...)', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class QueryLog:
+    """
+    The queries seen while recording: (sql, seconds) pairs, in order.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(seconds for sql, seconds in self.queries)
+
+    def repeated(self, threshold=None):
+        """
+        SELECT fingerprints run at least `threshold` times (defaults to
+        QUERY_BUDGET_REPEAT_THRESHOLD), most frequent first. Writes are left
+        out: saving one row per uploaded file is expected.
+        """
+        threshold = threshold or settings.QUERY_BUDGET_REPEAT_THRESHOLD
+        counts = Counter(
+            fingerprint(sql) for sql, seconds in self.queries if sql.lstrip()[:6].upper() == 'SELECT'
+        )
+        return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+    def problems(self, budget):
+        """
+        Descriptions of what is wrong: over `budget` queries (None for no
+        budget) and repeated query shapes.
+        """
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(f"{self.count} queries, over the budget of {budget}")
+        for shape, count in self.repeated():
+            # The column list is long and rarely tells the queries apart.
+            shape = _SELECT_LIST.sub('SELECT ... FROM ', shape)
+            problems.append(f"possible N+1: {count} x {shape[:200]}")
+        return problems
+
+
+@contextmanager
+def record_queries():
+    """
+    Records the queries run on every database connection of this thread
+    inside the block. Yields the QueryLog.
+    """
+    log = QueryLog()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(log))
+        yield log
+
+
+@contextmanager
+def assert_query_budget(view_name=None, budget=None):
+    """
+    Fails with AssertionError when the block runs more queries than
+    `budget` (or QUERY_BUDGETS[view_name]) or repeats a query shape.
+    """
+    if budget is None:
+        budget = settings.QUERY_BUDGETS.get(view_name)
+    with record_queries() as log:
+        yield log
+    problems = log.problems(budget)
+    if problems:
+        raise AssertionError(f"{view_name or 'Block'}: " + '; '.join(problems))
+
+
+class QueryBudgetMiddleware:
+    """
+    Checks every request against its view's query budget (see module docstring).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.QUERY_BUDGET_MODE == 'off':
+            return self.get_response(request)
+        with record_queries() as log:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        if settings.DEBUG:
+            response['Server-Timing'] = f'db;dur={log.seconds * 1000:.1f};desc="{log.count} queries"'
+        problems = log.problems(settings.QUERY_BUDGETS.get(view_name))
+        if problems:
+            message = f"Query budget: {request.method} {request.path} ({view_name}): " + '; '.join(problems)
+            if settings.QUERY_BUDGET_MODE == 'raise':
+                raise QueryBudgetExceeded(message)
+            print(message)
+        return response
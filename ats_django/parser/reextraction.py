@@ -0,0 +1,302 @@
+"""
+Stored resumes and their re-extraction after the extractor changes.
+
+Every resume the ingestion queue or a bulk import saves is kept as a
+ResumeDocument: the Docling markdown (zlib-compressed), the extractor's raw
+and parsed output, and the version of the extractor that produced them
+(see extractors.py). A new prompt, model, rule set or threshold changes the
+version, which makes every stored resume stale. `Reextractor` then re-runs
+only the extraction stage on their markdown, with no file or Docling
+involved, and updates each resume's candidates.
+
+Documents are claimed from the database in batches, like ingestion tasks:
+the conditional UPDATE means two workers (threads or processes) never take
+the same one, and a claim older than REEXTRACTION_STALE_AFTER is taken over.
+A document is done once it carries the current version, committed together
+with its new candidates, so an interrupted run is resumed by running it
+again. Documents whose extraction fails keep their candidates and version
+and are tried again on the next run.
+
+A document's candidates are updated in place, in extraction order, so
+they keep their ids; the resume text they are scored and checked for
+duplicates on doesn't change. Only when the extractor now finds more (or
+fewer) people in a resume are candidates inserted (and scored and checked
+like any new ones) or deleted. Jobs that lost candidates are rescored in
+full at the end so their leaderboards drop the deleted ids.
+"""
+import os
+import socket
+import threading
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from hashlib import sha256
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import matching, parse_cache
+from .extractors import extraction_version, get_extractor
+from .models import Candidate, Job, ResumeDocument
+from .persistence import INSERT_BATCH_SIZE, TEXT_FIELDS, build_candidates, insert_candidates
+from .write_queue import write
+
+COMPRESSION_LEVEL = 6
+
+BACKFILL_BATCH_SIZE = 500
+
+# Candidate columns set from the extracted fields, updated on re-extraction.
+CANDIDATE_FIELDS = TEXT_FIELDS + ['date_of_birth', 'resume_file_name']
+
+
+def compress(markdown):
+    return zlib.compress((markdown or '').encode(), COMPRESSION_LEVEL)
+
+
+def decompress(data):
+    return zlib.decompress(data).decode()
+
+
+def build_document(job, user, name, content_hash, markdown, parsed_data, raw_output, version=None):
+    """
+    An unsaved ResumeDocument for one parsed resume. Candidates built from
+    it should point at it (`candidate.document`) before they are inserted.
+    """
+    return ResumeDocument(
+        job=job,
+        uploaded_by=user,
+        original_name=name[:ResumeDocument._meta.get_field('original_name').max_length],
+        content_hash=content_hash or '',
+        markdown=compress(markdown),
+        raw_output=raw_output or '',
+        parsed_data=parsed_data,
+        extraction_version=extraction_version() if version is None else version,
+    )
+
+
+def stale_documents(version=None, job_ids=None):
+    """
+    The documents not extracted by `version` (the current one by default).
+    """
+    documents = ResumeDocument.objects.exclude(extraction_version=version or extraction_version())
+    if job_ids:
+        documents = documents.filter(job_id__in=job_ids)
+    return documents
+
+
+def backfill_documents():
+    """
+    Creates documents for candidates saved before documents were kept, from
+    their resume text. Candidates of one job, uploader, file name and text
+    came from the same resume and share a document. The documents get an
+    empty version, so they are all stale. Returns the number created.
+    """
+    rows = (
+        Candidate.objects.filter(document__isnull=True, resume_text__isnull=False)
+        .order_by('job_id', 'uploaded_by_id', 'resume_file_name', 'id')
+        .values_list('id', 'job_id', 'uploaded_by_id', 'resume_file_name', 'resume_text')
+    )
+    groups = {}
+    created = 0
+
+    def flush():
+        with transaction.atomic():
+            documents = ResumeDocument.objects.bulk_create(
+                ResumeDocument(job_id=job_id, uploaded_by_id=user_id, original_name=name,
+                               markdown=compress(text), extraction_version='')
+                for (job_id, user_id, name, digest), (text, candidate_ids) in groups.items()
+            )
+            for document, (text, candidate_ids) in zip(documents, groups.values()):
+                Candidate.objects.filter(id__in=candidate_ids).update(document=document)
+        groups.clear()
+        return len(documents)
+
+    for candidate_id, job_id, user_id, name, text in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        key = (job_id, user_id, name, sha256(text.encode()).digest())
+        groups.setdefault(key, (text, []))[1].append(candidate_id)
+        if len(groups) >= BACKFILL_BATCH_SIZE:
+            created += flush()
+    if groups:
+        created += flush()
+    return created
+
+
+def claim_documents(worker_id, limit, version, job_ids=None, after=0):
+    """
+    Atomically claims up to `limit` stale documents with an id above
+    `after`, oldest first, skipping those another worker holds. Returns
+    (the documents won, the highest id tried or None if there was none).
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.REEXTRACTION_STALE_AFTER)
+    unclaimed = Q(claimed_at__isnull=True) | Q(claimed_at__lt=cutoff)
+    document_ids = list(
+        stale_documents(version, job_ids).filter(unclaimed, id__gt=after)
+        .order_by('id').values_list('id', flat=True)[:limit]
+    )
+    if not document_ids:
+        return [], None
+    claimed_at = timezone.now()
+    ResumeDocument.objects.filter(unclaimed, id__in=document_ids).update(worker_id=worker_id, claimed_at=claimed_at)
+    # Rows another worker got to first keep that worker's id.
+    documents = list(
+        ResumeDocument.objects.select_related('job', 'uploaded_by')
+        .filter(id__in=document_ids, worker_id=worker_id, claimed_at=claimed_at)
+        .order_by('id')
+    )
+    return documents, document_ids[-1]
+
+
+def _update_candidates(done, failed, candidates):
+    """
+    Makes the candidates of the `done` documents match `candidates` (the
+    newly extracted ones, in extraction order, each pointing at its
+    document). A document's existing candidates are updated in place in the
+    same order, so they keep their ids (and with them bookmarks, exports,
+    scores and duplicate links); only the surplus is inserted or deleted.
+    Returns how many were changed, inserted and removed, and the ids of the jobs
+    to rescore: those that lost candidates, or have updated candidates
+    without resume text (which are scored on their fields).
+    """
+    existing = defaultdict(list)
+    for candidate in Candidate.objects.filter(document__in=done).order_by('id'):
+        existing[candidate.document_id].append(candidate)
+    updated = []
+    inserted = []
+    for candidate in candidates:
+        kept = existing[candidate.document.id]
+        if not kept:
+            inserted.append(candidate)
+            continue
+        current = kept.pop(0)
+        changed = [field for field in CANDIDATE_FIELDS if getattr(current, field) != getattr(candidate, field)]
+        # Unchanged rows aren't written: every update also rewrites their
+        # search and autocomplete entries (see the triggers).
+        if changed:
+            for field in changed:
+                setattr(current, field, getattr(candidate, field))
+            updated.append(current)
+    surplus = [candidate for kept in existing.values() for candidate in kept]
+
+    Candidate.objects.bulk_update(updated, CANDIDATE_FIELDS, batch_size=INSERT_BATCH_SIZE)
+    insert_candidates(inserted)
+    Candidate.objects.filter(id__in=[candidate.id for candidate in surplus]).delete()
+    ResumeDocument.objects.bulk_update(
+        done + failed,
+        ['raw_output', 'parsed_data', 'extraction_version', 'extracted_at', 'error', 'worker_id', 'claimed_at'],
+    )
+    rescore = {candidate.job_id for candidate in surplus}
+    rescore.update(candidate.job_id for candidate in updated if not candidate.resume_text)
+    return len(updated), len(inserted), len(surplus), rescore
+
+
+class Reextractor:
+    """
+    Re-extracts the stale documents (of `job_ids`, or all jobs) with
+    `workers` threads, each claiming `batch_size` documents at a time.
+    The extractor sends the resumes of a batch to Gemini concurrently, and
+    the threads overlap their requests; their writes go through the write
+    queue (see write_queue.py).
+    `on_batch` is called with the counts after each batch.
+    """
+
+    def __init__(self, workers=None, batch_size=None, job_ids=None, on_batch=None):
+        self.workers = workers or settings.REEXTRACTION_WORKERS
+        self.batch_size = batch_size or settings.REEXTRACTION_BATCH_SIZE
+        self.job_ids = job_ids
+        self.on_batch = on_batch
+        self.version = extraction_version()
+        self.counts = {'documents': 0, 'failed': 0, 'updated': 0, 'created': 0, 'removed': 0}
+        self._jobs = set()
+        # Highest id claimed so far: each run takes every stale document at most once.
+        self._after = 0
+        self._lock = threading.Lock()
+
+    def run(self):
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='reextraction') as pool:
+            futures = [pool.submit(self._work, f"{prefix}:reextract:{i}") for i in range(self.workers)]
+            for future in futures:
+                future.result()
+        for job in Job.objects.filter(id__in=self._jobs).order_by('id'):
+            matching.score_job(job)
+        return self.counts
+
+    def _claim(self, worker_id):
+        with self._lock:
+            while True:
+                documents, last_id = write(
+                    claim_documents, worker_id, self.batch_size, self.version, self.job_ids, self._after,
+                )
+                if last_id is None:
+                    return []
+                self._after = last_id
+                if documents:
+                    return documents
+
+    def _work(self, worker_id):
+        try:
+            while True:
+                documents = self._claim(worker_id)
+                if not documents:
+                    return
+                try:
+                    self.reextract(documents)
+                except Exception as e:
+                    print(f"Re-extraction worker {worker_id} error: {e}")
+                    write(ResumeDocument.objects.filter(id__in=[document.id for document in documents]).update,
+                          worker_id='', claimed_at=None, error=str(e))
+                    with self._lock:
+                        self.counts['failed'] += len(documents)
+        finally:
+            close_old_connections()
+
+    def reextract(self, documents):
+        """
+        Extracts the fields of `documents` again and updates their
+        candidates, in one transaction.
+        """
+        markdowns = [decompress(document.markdown) for document in documents]
+        extracted = get_extractor().extract_many(markdowns)
+        done = []
+        failed = []
+        candidates = []
+        extracted_at = timezone.now()
+        for document, markdown, (parsed_data, raw_output) in zip(documents, markdowns, extracted):
+            document.worker_id = ''
+            document.claimed_at = None
+            if not parsed_data:
+                document.error = 'No candidate data could be extracted.'
+                failed.append(document)
+                continue
+            document_candidates, warnings = build_candidates(
+                parsed_data, document.original_name, document.job, document.uploaded_by, resume_text=markdown,
+            )
+            for candidate in document_candidates:
+                candidate.document = document
+            document.raw_output = raw_output or ''
+            document.parsed_data = parsed_data
+            document.extraction_version = self.version
+            document.extracted_at = extracted_at
+            document.error = ' '.join(warnings)
+            done.append(document)
+            candidates.extend(document_candidates)
+
+        updated, inserted, removed, rescore = write(_update_candidates, done, failed, candidates)
+        # Later uploads of the same files get the new answers from the cache.
+        done_ids = {document.id for document in done}
+        for document, markdown in zip(documents, markdowns):
+            if document.id in done_ids:
+                parse_cache.store(document.content_hash, markdown, document.parsed_data, document.raw_output)
+
+        with self._lock:
+            self.counts['documents'] += len(done)
+            self.counts['failed'] += len(failed)
+            self.counts['updated'] += updated
+            self.counts['created'] += inserted
+            self.counts['removed'] += removed
+            self._jobs.update(rescore)
+            if self.on_batch:
+                self.on_batch(dict(self.counts))
@@ -0,0 +1,94 @@
+"""
+Versioned cache for the rendered candidate table and the chart data.
+
+Entries are keyed by job id, the normalized query parameters and the job's
+data version (JobCandidateCount.version, bumped by the analytics triggers
+on every write to the job or its candidates; see analytics.py). A write
+therefore invalidates every cached view of that job in O(1): later reads
+use a new key, and the stale entries are never read again and age out of
+the cache. Nothing is scanned or deleted.
+
+The cache is the 'parser' alias in CACHES: local memory by default, or a
+file-based cache shared by every process on the host with
+PARSER_CACHE_BACKEND=file. Hit and miss counts are kept per process (see
+`stats`).
+"""
+import hashlib
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .analytics import counters_available
+from .models import JobCandidateCount
+
+CACHE_ALIAS = 'parser'
+
+_lock = threading.Lock()
+_hits = defaultdict(int)
+_misses = defaultdict(int)
+
+
+def job_version(job_id):
+    """
+    The job's data version, or None when versions aren't maintained (in
+    which case nothing is cached).
+    """
+    if not counters_available():
+        return None
+    return JobCandidateCount.objects.filter(job_id=job_id).values_list('version', flat=True).first()
+
+
+def normalize_params(query_dict):
+    """
+    A canonical string for a request's query parameters: sorted, with
+    empty values dropped, so equivalent URLs share cache entries.
+    """
+    items = sorted(
+        (key, value.strip())
+        for key, values in query_dict.lists()
+        for value in values
+        if value.strip()
+    )
+    return '&'.join(f'{key}={value}' for key, value in items)
+
+
+def cached(kind, scope, version, params, compute):
+    """
+    Returns compute() for (kind, scope, version, params), from the cache
+    when possible. `scope` is a job id, or 'all' for site-wide data.
+    """
+    if version is None:
+        return compute()
+    digest = hashlib.md5(params.encode()).hexdigest()
+    key = f'{kind}:{scope}:{version}:{digest}'
+    cache = caches[CACHE_ALIAS]
+    value = cache.get(key)
+    if value is not None:
+        with _lock:
+            _hits[kind] += 1
+        return value
+    value = compute()
+    cache.set(key, value, settings.PARSER_CACHE_TIMEOUT)
+    with _lock:
+        _misses[kind] += 1
+    return value
+
+
+def stats():
+    """
+    Hit and miss counts and hit ratios for this process, overall and per kind.
+    """
+    with _lock:
+        kinds = sorted(set(_hits) | set(_misses))
+        by_kind = {kind: _ratio(_hits[kind], _misses[kind]) for kind in kinds}
+        overall = _ratio(sum(_hits.values()), sum(_misses.values()))
+    overall['backend'] = settings.CACHES[CACHE_ALIAS]['BACKEND']
+    overall['kinds'] = by_kind
+    return overall
+
+
+def _ratio(hits, misses):
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
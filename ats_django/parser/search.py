@@ -0,0 +1,112 @@
+"""
+Full-text candidate search backed by an SQLite FTS5 index.
+
+`parser_candidate_fts` is an external-content FTS5 table over the Candidate
+columns the filter form searches, plus the extracted resume text. Triggers
+on parser_candidate keep it in sync on every insert, update and delete
+(including bulk_create and queryset.update/delete, which skip Django signals).
+
+Filters are matched as word prefixes, so "comp sci" finds "Computer Science"
+without the `LIKE '%x%'` table scans `__icontains` turns into. On databases
+other than SQLite the filters fall back to `__icontains`, as does a filter
+without any word characters ("C++", "#"), which has no terms to match.
+
+The index and its triggers are created by migration 0004, which keeps its
+own copy of the SQL. Django rebuilds an SQLite table for most column
+changes, which drops its triggers, so a migration that alters Candidate
+that way must create them again from a copy of that SQL (not by importing
+this module, whose later changes would change what the migration does).
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'parser_candidate_fts'
+
+# Candidate columns in the index, in FTS column order.
+INDEXED_FIELDS = [
+    'first_name', 'last_name', 'address', 'degree', 'degree_school',
+    'diploma', 'diploma_school', 'resume_file_name', 'resume_text',
+]
+
+# Filter-form fields that map onto a single indexed column.
+FILTER_FIELDS = INDEXED_FIELDS[:-1]
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def search_available():
+    return connection.vendor == 'sqlite'
+
+
+def _prefix_terms(text):
+    """
+    Turns user input into quoted FTS5 prefix terms, e.g. 'comp sci' ->
+    '"comp"* AND "sci"*'. Quoting keeps FTS5 operators in the input inert.
+    """
+    tokens = _TOKEN.findall(text.lower())
+    return ' AND '.join(f'"{token}"*' for token in tokens)
+
+
+def build_match_query(filters, text=''):
+    """
+    Builds an FTS5 MATCH expression from {field: value} column filters and
+    free text searched across every indexed column. Values without any word
+    characters add nothing. Returns '' if there is nothing to match.
+    """
+    clauses = []
+    for field, value in filters.items():
+        terms = _prefix_terms(value or '')
+        if terms:
+            clauses.append(f'{{{field}}} : ({terms})')
+    terms = _prefix_terms(text or '')
+    if terms:
+        clauses.append(f'({terms})')
+    return ' AND '.join(clauses)
+
+
+def search_candidates(candidates, filters, text=''):
+    """
+    Narrows a Candidate queryset by column filters and free text.
+    Returns (queryset, ranked); when `ranked` is true the queryset is
+    annotated with `search_rank` (lower is a better match, as with bm25).
+    """
+    filters = {field: value for field, value in filters.items() if value}
+    if not search_available():
+        return _search_substrings(candidates, filters, text), False
+
+    # The index has nothing to match for these; dropping them would return
+    # every candidate.
+    substrings = {field: value for field, value in filters.items() if not _prefix_terms(value)}
+    substring_text = text if text and not _prefix_terms(text) else ''
+    if substrings or substring_text:
+        candidates = _search_substrings(candidates, substrings, substring_text)
+        filters = {field: value for field, value in filters.items() if field not in substrings}
+        text = '' if substring_text else text
+
+    match = build_match_query(filters, text)
+    if not match:
+        return candidates, False
+    candidates = candidates.filter(
+        id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+    )
+    if not text:
+        return candidates, False
+    candidates = candidates.annotate(search_rank=RawSQL(
+        f"SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = parser_candidate.id",
+        [match],
+    ))
+    return candidates, True
+
+
+def _search_substrings(candidates, filters, text):
+    for field, value in filters.items():
+        candidates = candidates.filter(**{f'{field}__icontains': value})
+    if text:
+        query = Q()
+        for field in INDEXED_FIELDS:
+            query |= Q(**{f'{field}__icontains': text})
+        candidates = candidates.filter(query)
+    return candidates
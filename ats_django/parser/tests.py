@@ -1,3 +1,1368 @@
-from django.test import TestCase
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    analytics, autocomplete, converter_pool, dedup, ingestion, matching, metrics, parse_cache, response_cache,
+    write_queue,
+)
+from .benchdata import create_query_budget_data
+from .bulk_import import BulkImporter, Checkpoint, ResumeSource
+from .converter_pool import ConversionError, ConversionTimeout, ConverterPool, DocumentSource
+from .docling_stub import stub_worker_main, stub_worker_never_ready
+from .extractors import Extractor, RuleBasedExtractor, TieredExtractor
+from .gemini_async import AsyncGeminiClient, GeminiAPIError, TokenBucket, stats as gemini_stats
+from .gemini_parser import build_batch_prompt, pack_batches, split_batch_output
+from .gemini_stub import GeminiStubServer, stub_answer
+from .models import (
+    AutocompleteTerm, Candidate, CandidateMatch, CandidateSignature, IngestionJob, IngestionTask, Job,
+    JobScoringProfile, ParseCacheEntry, ResumeDocument,
+)
+from .pagination import paginate
+from .persistence import build_candidates, insert_candidates, normalize_date
+from .query_budget import assert_query_budget
+from .reextraction import Reextractor, build_document
+from .search import search_candidates
+
+
+def create_job(user, title='Data Analyst', description='Python SQL dashboards and reporting.'):
+    return Job.objects.create(
+        title=title, company='Acme', province='Ontario', city='Toronto', min_salary=50000,
+        max_salary=70000, closing_date=date(2030, 1, 1), description=description, job_type='Full-time',
+        created_by=user,
+    )
+
+
+def create_candidate(job, user, **fields):
+    fields.setdefault('resume_file_name', 'resume.pdf')
+    return Candidate.objects.create(job=job, uploaded_by=user, **fields)
+
+
+class StubExtractor(Extractor):
+    """
+    Returns `people` for every resume, as a configured RESUME_EXTRACTOR.
+    """
+    people = []
+
+    def extract_many(self, resume_contents, timings=None, fields=None):
+        return [([dict(person) for person in self.people], 'stub output') for _ in resume_contents]
+
+    def version(self):
+        return 'stub-2'
+
+
+@override_settings(RESUME_EXTRACTOR='parser.tests.StubExtractor')
+class ReextractionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recruiter')
+        self.job = create_job(self.user)
+        people = [
+            {'first_name': 'Ada', 'last_name': 'Lovelace', 'degree': 'BSc'},
+            {'first_name': 'Alan', 'last_name': 'Turing', 'degree': 'BSc'},
+        ]
+        self.document = build_document(
+            self.job, self.user, 'team.pdf', 'a' * 64, '# Team resume', people, 'old output', version='stub-1',
+        )
+        self.document.save()
+        candidates, _ = build_candidates(people, 'team.pdf', self.job, self.user, resume_text='# Team resume')
+        for candidate in candidates:
+            candidate.document = self.document
+        insert_candidates(candidates)
+        self.ada, self.alan = Candidate.objects.filter(document=self.document).order_by('id')
+        # Another upload flagged as a duplicate of Ada.
+        other = Candidate.objects.create(job=self.job, uploaded_by=self.user, resume_file_name='ada.pdf')
+        CandidateSignature.objects.create(candidate=other, job=self.job, minhash=b'', duplicate_of=self.ada)
+        self.other = other
+
+    def reextract(self, people):
+        StubExtractor.people = people
+        reextractor = Reextractor(workers=1)
+        reextractor.reextract([ResumeDocument.objects.select_related('job', 'uploaded_by').get(id=self.document.id)])
+        return reextractor.counts
+
+    def test_updates_candidates_in_place(self):
+        counts = self.reextract([
+            {'first_name': 'Ada', 'last_name': 'Lovelace', 'degree': 'MSc'},
+            {'first_name': 'Alan', 'last_name': 'Turing', 'degree': 'PhD'},
+        ])
+
+        candidates = list(Candidate.objects.filter(document=self.document).order_by('id'))
+        self.assertEqual([candidate.id for candidate in candidates], [self.ada.id, self.alan.id])
+        self.assertEqual([candidate.degree for candidate in candidates], ['MSc', 'PhD'])
+        self.assertEqual(CandidateSignature.objects.get(candidate=self.other).duplicate_of_id, self.ada.id)
+        self.assertEqual((counts['updated'], counts['created'], counts['removed']), (2, 0, 0))
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.extraction_version, 'stub-2')
+
+    def test_unchanged_candidates_are_not_written(self):
+        counts = self.reextract([
+            {'first_name': 'Ada', 'last_name': 'Lovelace', 'degree': 'BSc'},
+            {'first_name': 'Alan', 'last_name': 'Turing', 'degree': 'BSc'},
+        ])
+        self.assertEqual((counts['documents'], counts['updated']), (1, 0))
+
+    def test_inserts_and_deletes_only_the_difference(self):
+        counts = self.reextract([{'first_name': 'Ada', 'last_name': 'Lovelace', 'degree': 'BSc'}])
+        self.assertEqual(list(Candidate.objects.filter(document=self.document).values_list('id', flat=True)), [self.ada.id])
+        self.assertEqual(counts['removed'], 1)
+
+        counts = self.reextract([
+            {'first_name': 'Ada', 'last_name': 'Lovelace', 'degree': 'BSc'},
+            {'first_name': 'Grace', 'last_name': 'Hopper', 'degree': 'PhD'},
+        ])
+        candidates = list(Candidate.objects.filter(document=self.document).order_by('id'))
+        self.assertEqual(candidates[0].id, self.ada.id)
+        self.assertEqual(candidates[1].first_name, 'Grace')
+        self.assertEqual(counts['created'], 1)
+
+
+class WriteQueueTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recruiter')
+
+    def test_failing_operation_does_not_roll_back_the_group(self):
+        def create(title, fail=False):
+            job = create_job(self.user, title=title)
+            if fail:
+                raise ValueError(title)
+            return job.id
+
+        operations = [
+            write_queue._Operation(create, ('first',), {}),
+            write_queue._Operation(create, ('second',), {'fail': True}),
+            write_queue._Operation(create, ('third',), {}),
+        ]
+        write_queue._commit(operations)
+
+        self.assertEqual(sorted(Job.objects.values_list('title', flat=True)), ['first', 'third'])
+        self.assertIsNone(operations[0].error)
+        self.assertIsInstance(operations[1].error, ValueError)
+        self.assertIsNone(operations[2].error)
+        self.assertTrue(all(operation.done.is_set() for operation in operations))
+
+    @override_settings(WRITE_QUEUE_ENABLED=True)
+    def test_hooks_run_after_commit_in_the_callers_thread(self):
+        seen = {}
+
+        def create():
+            seen['operation'] = threading.current_thread()
+            job = create_job(self.user)
+            transaction.on_commit(lambda: seen.update(
+                hook=threading.current_thread(), committed=Job.objects.filter(id=job.id).exists(),
+            ))
+            return job.id
+
+        job_id = write_queue.write(create)
+
+        self.assertIs(seen['operation'], write_queue._writer)
+        self.assertIs(seen['hook'], threading.current_thread())
+        self.assertTrue(seen['committed'])
+        self.assertTrue(Job.objects.filter(id=job_id).exists())
+
+    @override_settings(WRITE_QUEUE_ENABLED=True)
+    def test_failing_write_raises_in_the_caller(self):
+        def fail():
+            create_job(self.user)
+            raise ValueError('boom')
+
+        with self.assertRaisesMessage(ValueError, 'boom'):
+            write_queue.write(fail)
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(WRITE_QUEUE_ENABLED=True)
+    def test_writes_inside_a_transaction_run_directly(self):
+        threads = []
+
+        def record():
+            threads.append(threading.current_thread())
+
+        with transaction.atomic():
+            write_queue.write(record)
+        connection.set_autocommit(False)
+        try:
+            write_queue.write(record)
+        finally:
+            connection.rollback()
+            connection.set_autocommit(True)
+        self.assertEqual(threads, [threading.current_thread()] * 2)
+
+
+@override_settings(PARSE_CACHE_ENABLED=True, PARSE_CACHE_MAX_BYTES=1000, PARSE_CACHE_HIT_FLUSH_SECONDS=3600)
+class ParseCacheTests(TestCase):
+    def setUp(self):
+        parse_cache.flush_hits()
+        parse_cache._size_estimate = None
+
+    def test_hits_are_written_in_one_flush(self):
+        parse_cache.store('a' * 64, 'x' * 100, [], '')
+        parse_cache.store('b' * 64, 'x' * 100, [], '')
+        with self.assertNumQueries(3):
+            for content_hash in ['a' * 64, 'a' * 64, 'b' * 64]:
+                self.assertIsNotNone(parse_cache.lookup(content_hash))
+        self.assertEqual(sum(ParseCacheEntry.objects.values_list('hit_count', flat=True)), 0)
+
+        parse_cache.flush_hits()
+        self.assertEqual(dict(ParseCacheEntry.objects.values_list('content_hash', 'hit_count')),
+                         {'a' * 64: 2, 'b' * 64: 1})
+
+    def test_store_only_counts_the_size_when_it_may_be_over_the_limit(self):
+        parse_cache.store('a' * 64, 'x' * 300, [], '')
+        with CaptureQueriesContext(connection) as queries:
+            parse_cache.store('b' * 64, 'x' * 300, [], '')
+        self.assertFalse([query for query in queries.captured_queries if 'SUM(' in query['sql']])
+
+        parse_cache.store('c' * 64, 'x' * 300, [], '')
+        with CaptureQueriesContext(connection) as queries:
+            parse_cache.store('d' * 64, 'x' * 300, [], '')
+        self.assertTrue([query for query in queries.captured_queries if 'SUM(' in query['sql']])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        evictions = metrics.PARSE_CACHE_EVICTIONS._values.get((), 0)
+        for content_hash in ['a' * 64, 'b' * 64, 'c' * 64]:
+            parse_cache.store(content_hash, 'x' * 300, [], '')
+        parse_cache.lookup('a' * 64)
+        parse_cache.store('d' * 64, 'x' * 300, [], '')
+        self.assertEqual(sorted(ParseCacheEntry.objects.values_list('content_hash', flat=True)),
+                         ['a' * 64, 'c' * 64, 'd' * 64])
+        self.assertEqual(metrics.PARSE_CACHE_EVICTIONS._values[()], evictions + 1)
+
+    def test_lookups_are_counted_in_the_metrics(self):
+        hits = metrics.PARSE_CACHE_LOOKUPS._values.get(('hit',), 0)
+        misses = metrics.PARSE_CACHE_LOOKUPS._values.get(('miss',), 0)
+        parse_cache.store('a' * 64, 'x' * 100, [], '')
+        parse_cache.lookup('a' * 64)
+        parse_cache.lookup('b' * 64)
+        parse_cache.lookup('b' * 64)
+        self.assertEqual(metrics.PARSE_CACHE_LOOKUPS._values[('hit',)], hits + 1)
+        self.assertEqual(metrics.PARSE_CACHE_LOOKUPS._values[('miss',)], misses + 2)
+        self.assertIn('ats_parse_cache_lookups_total{result="miss"}', metrics.render())
+
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'parser': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'parser-tests'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES, QUERY_BUDGET_MODE='off', ALLOWED_HOSTS=['localhost'])
+class QueryBudgetTests(TestCase):
+    """
+    The views of QUERY_BUDGETS with enough rows that an N+1 loop shows up
+    as repeated queries. Caches are cleared, so the count is the worst case.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.requests = create_query_budget_data(candidates=40)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_every_budgeted_view_is_requested(self):
+        self.assertEqual({view_name for view_name, url in self.requests}, set(settings.QUERY_BUDGETS))
+
+    def test_views_are_within_their_query_budgets(self):
+        for view_name, url in self.requests:
+            with self.subTest(url=url):
+                for alias in settings.CACHES:
+                    caches[alias].clear()
+                with assert_query_budget(view_name):
+                    response = self.client.get(url, SERVER_NAME='localhost')
+                self.assertEqual(response.status_code, 200)
+
+
+class GeminiClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = GeminiStubServer().start()
+        self.addCleanup(self.server.stop)
+
+    def generate(self, prompt):
+        async def run():
+            client = AsyncGeminiClient(base_url=self.server.url, max_retries=2, backoff_base=0.01, backoff_max=0.01)
+            try:
+                return await client.generate(prompt, 'test-key')
+            finally:
+                await client.close()
+
+        return asyncio.run(run())
+
+    def test_answer_text_is_returned(self):
+        self.assertIn('"first_name": "Ada"', self.generate('Resume Content:\n# Ada Lovelace'))
+
+    def test_malformed_body_raises_api_error(self):
+        self.server.malformed_every = 1
+        errors = metrics.LLM_ERRORS._values.get(('invalid_body',), 0)
+        parse_failures = metrics.LLM_JSON_PARSE_FAILURES._values.get(('invalid_body',), 0)
+
+        with self.assertRaisesMessage(GeminiAPIError, "isn't JSON"):
+            self.generate('Resume Content:\n# Ada Lovelace')
+        self.assertEqual(self.server.request_count, 1)
+        self.assertEqual(metrics.LLM_ERRORS._values[('invalid_body',)], errors + 1)
+        self.assertEqual(metrics.LLM_JSON_PARSE_FAILURES._values[('invalid_body',)], parse_failures + 1)
+
+    def test_rate_limited_request_is_retried(self):
+        self.server.fail_every = 2
+        retries = gemini_stats()['retries']
+
+        self.generate('Resume Content:\n# Ada Lovelace')
+        self.assertIn('"first_name": "Ada"', self.generate('Resume Content:\n# Ada Lovelace'))
+        self.assertEqual(self.server.request_count, 3)
+        self.assertEqual(self.server.failure_count, 1)
+        self.assertEqual(gemini_stats()['retries'], retries + 1)
+
+    def test_server_errors_are_retried_until_retries_run_out(self):
+        self.server.fail_every = 1
+        for status in (500, 502, 503, 504):
+            with self.subTest(status=status):
+                self.server.fail_status = status
+                self.server.request_count = 0
+                with self.assertRaises(GeminiAPIError) as raised:
+                    self.generate('Resume Content:\n# Ada Lovelace')
+                self.assertEqual(raised.exception.status_code, status)
+                self.assertEqual(self.server.request_count, 3)
+
+    def test_retry_waits_for_retry_after(self):
+        self.server.fail_every = 2
+        self.server.retry_after = 0.3
+        self.generate('Resume Content:\n# Ada Lovelace')
+
+        started = time.monotonic()
+        self.generate('Resume Content:\n# Ada Lovelace')
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_client_error_is_not_retried(self):
+        self.server.fail_every = 1
+        self.server.fail_status = 400
+        retries = gemini_stats()['retries']
+
+        with self.assertRaises(GeminiAPIError) as raised:
+            self.generate('Resume Content:\n# Ada Lovelace')
+        self.assertEqual(raised.exception.status_code, 400)
+        self.assertEqual(self.server.request_count, 1)
+        self.assertEqual(gemini_stats()['retries'], retries)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_full_bucket_does_not_wait(self):
+        bucket = TokenBucket(600)
+        started = time.monotonic()
+        asyncio.run(bucket.acquire(600))
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertLess(bucket.tokens, 1)
+
+    def test_empty_bucket_waits_for_refill(self):
+        # 600 a minute refills 10 tokens a second.
+        bucket = TokenBucket(600)
+        bucket.tokens = 0
+        started = time.monotonic()
+        asyncio.run(bucket.acquire(2))
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+    def test_request_bigger_than_bucket_waits_for_a_full_bucket(self):
+        bucket = TokenBucket(60)
+        bucket.tokens = 59.9
+        started = time.monotonic()
+        asyncio.run(bucket.acquire(1000))
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertLess(bucket.tokens, 1)
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recruiter')
+        self.job = create_job(self.user)
+        self.ada = create_candidate(
+            self.job, self.user, first_name='Ada', last_name='Lovelace', degree='BSc Computer Science',
+            resume_text='Analytical engine programs and Bernoulli numbers.',
+        )
+        create_candidate(self.job, self.user, first_name='Alan', last_name='Turing', degree='BA Philosophy')
+
+    def search(self, filters, text=''):
+        candidates, ranked = search_candidates(Candidate.objects.all(), filters, text)
+        return sorted(candidates.values_list('first_name', flat=True))
+
+    def test_inserted_candidates_are_found_by_word_prefixes(self):
+        self.assertEqual(self.search({'degree': 'comp sci'}), ['Ada'])
+        self.assertEqual(self.search({}, 'bernoulli'), ['Ada'])
+        self.assertEqual(self.search({'degree': 'science', 'last_name': 'tur'}), [])
+
+    def test_updates_replace_the_indexed_values(self):
+        Candidate.objects.filter(id=self.ada.id).update(degree='MSc Mathematics')
+        self.assertEqual(self.search({'degree': 'comp'}), [])
+        self.assertEqual(self.search({'degree': 'math'}), ['Ada'])
+
+        self.ada.refresh_from_db()
+        self.ada.first_name = 'Augusta'
+        self.ada.save()
+        self.assertEqual(self.search({'first_name': 'ada'}), [])
+        self.assertEqual(self.search({'first_name': 'aug'}), ['Augusta'])
+
+    def test_deleted_candidates_are_removed(self):
+        self.ada.delete()
+        self.assertEqual(self.search({}, 'bernoulli'), [])
+        self.assertEqual(self.search({'degree': 'ba'}), ['Alan'])
+
+    def test_filters_without_words_match_as_substrings(self):
+        Candidate.objects.filter(id=self.ada.id).update(resume_text='C++ and C# developer.')
+        self.assertEqual(self.search({'degree': '++'}), [])
+        self.assertEqual(self.search({}, '++'), ['Ada'])
+        self.assertEqual(self.search({'last_name': 'tur'}, '#'), [])
+        self.assertEqual(self.search({'first_name': 'a'}, '#'), ['Ada'])
+
+
+class AutocompleteTermTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recruiter')
+        self.job = create_job(self.user)
+        self.other_job = create_job(self.user, title='Nurse')
+        for school in ['University of Toronto', 'University of Toronto', 'University of Manitoba']:
+            create_candidate(self.job, self.user, degree_school=school)
+        create_candidate(self.other_job, self.user, degree_school='University of Winnipeg')
+
+    def terms(self, job=None):
+        return dict(
+            AutocompleteTerm.objects.filter(job=job or self.job, field='degree_school')
+            .values_list('value', 'count')
+        )
+
+    def test_inserts_count_distinct_values_per_job(self):
+        self.assertEqual(self.terms(), {'University of Toronto': 2, 'University of Manitoba': 1})
+        self.assertEqual(autocomplete.lookup(self.job.id, 'degree_school', 'univ'),
+                         ['University of Toronto', 'University of Manitoba'])
+        self.assertEqual(autocomplete.lookup(self.job.id, 'degree_school', 'UNIVERSITY OF M'), ['University of Manitoba'])
+        self.assertEqual(autocomplete.lookup(self.other_job.id, 'degree_school', 'univ'), ['University of Winnipeg'])
+
+    def test_updates_move_the_count_to_the_new_value(self):
+        Candidate.objects.filter(job=self.job, degree_school='University of Manitoba').update(
+            degree_school='  University of Toronto ',
+        )
+        self.assertEqual(self.terms(), {'University of Toronto': 3})
+
+        Candidate.objects.filter(job=self.job).update(job=self.other_job)
+        self.assertEqual(self.terms(), {})
+        self.assertEqual(self.terms(self.other_job), {'University of Toronto': 3, 'University of Winnipeg': 1})
+
+    def test_deletes_decrement_and_drop_unused_values(self):
+        Candidate.objects.filter(job=self.job, degree_school='University of Manitoba').delete()
+        Candidate.objects.filter(job=self.job).first().delete()
+        self.assertEqual(self.terms(), {'University of Toronto': 1})
+        self.assertEqual(autocomplete.lookup(self.job.id, 'degree_school', 'university of m'), [])
+
+
+class AnalyticsCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recruiter')
+        self.job = create_job(self.user)
+        self.other_job = create_job(self.user, title='Nurse')
+        self.ada = create_candidate(self.job, self.user, degree='BSc', degree_school='McGill', diploma_school='Seneca')
+        create_candidate(self.job, self.user, degree='BSc', degree_school='McGill')
+        create_candidate(self.other_job, self.user, degree='MBA')
+
+    def counts(self, job=None):
+        job = job or self.job
+        return (
+            {row['degree']: row['count'] for row in analytics.top_degrees(job)},
+            {row['school']: row['count'] for row in analytics.top_schools(job)},
+        )
+
+    def test_inserts_are_counted(self):
+        self.assertEqual(analytics.totals(), (2, 3))
+        self.assertEqual(analytics.job_applicant_counts(), [
+            {'title': 'Data Analyst', 'applicant_count': 2}, {'title': 'Nurse', 'applicant_count': 1},
+        ])
+        self.assertEqual(self.counts(), ({'BSc': 2}, {'McGill': 2, 'Seneca': 1}))
+        self.assertEqual(analytics.check_counters(), [])
+
+    def test_updates_move_counts(self):
+        version, modified_at = analytics.data_version()
+        Candidate.objects.filter(id=self.ada.id).update(degree='PhD', diploma_school='')
+        self.assertEqual(self.counts(), ({'BSc': 1, 'PhD': 1}, {'McGill': 2}))
+
+        Candidate.objects.filter(id=self.ada.id).update(job=self.other_job)
+        self.assertEqual(self.counts(), ({'BSc': 1}, {'McGill': 1}))
+        self.assertEqual(self.counts(self.other_job), ({'MBA': 1, 'PhD': 1}, {'McGill': 1}))
+        self.assertEqual(analytics.check_counters(), [])
+        self.assertGreater(analytics.data_version()[0], version)
+
+    def test_deletes_are_uncounted(self):
+        self.ada.delete()
+        self.assertEqual(analytics.totals(), (2, 2))
+        self.assertEqual(self.counts(), ({'BSc': 1}, {'McGill': 1}))
+
+        self.other_job.delete()
+        self.assertEqual(analytics.totals(), (1, 1))
+        self.assertEqual(analytics.job_applicant_counts(), [{'title': 'Data Analyst', 'applicant_count': 1}])
+        self.assertEqual(analytics.check_counters(), [])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recruiter')
+        self.job = create_job(self.user)
+        # Ties and NULLs in both sort columns.
+        rows = [
+            ('Turing', date(1912, 6, 23)), (None, None), ('Hopper', date(1906, 12, 9)), ('Turing', None),
+            ('Lovelace', date(1815, 12, 10)), (None, date(1906, 12, 9)), ('Hopper', date(1906, 12, 9)),
+        ]
+        self.candidates = [
+            create_candidate(self.job, self.user, last_name=last_name, date_of_birth=born) for last_name, born in rows
+        ]
+
+    def pages(self, sort_by, descending=False, page_size=2):
+        pages = [paginate(Candidate.objects.all(), sort_by, descending, page_size=page_size)]
+        while pages[-1].has_next:
+            pages.append(paginate(Candidate.objects.all(), sort_by, descending, pages[-1].next_cursor, page_size))
+        return pages
+
+    def expected(self, sort_by, descending):
+        present = sorted((candidate for candidate in self.candidates if getattr(candidate, sort_by) is not None),
+                         key=lambda candidate: (getattr(candidate, sort_by), candidate.id), reverse=descending)
+        missing = sorted((candidate for candidate in self.candidates if getattr(candidate, sort_by) is None),
+                         key=lambda candidate: candidate.id, reverse=descending)
+        # NULLs first ascending, last descending.
+        ordered = present + missing if descending else missing + present
+        return [candidate.id for candidate in ordered]
+
+    def test_pages_cover_every_row_once_across_ties_and_nulls(self):
+        for sort_by in ['last_name', 'date_of_birth']:
+            for descending in [False, True]:
+                with self.subTest(sort_by=sort_by, descending=descending):
+                    pages = self.pages(sort_by, descending)
+                    ids = [row.id for page in pages for row in page.rows]
+                    self.assertEqual(ids, self.expected(sort_by, descending))
+                    self.assertEqual([len(page.rows) for page in pages], [2, 2, 2, 1])
+
+    def test_last_page_has_no_cursor_when_rows_fill_it_exactly(self):
+        pages = self.pages('id', page_size=7)
+        self.assertEqual(len(pages), 1)
+        self.assertIsNone(pages[0].next_cursor)
+
+    def test_rows_inserted_before_the_cursor_do_not_shift_later_pages(self):
+        first = paginate(Candidate.objects.all(), 'last_name', page_size=3)
+        create_candidate(self.job, self.user, last_name='Babbage')
+        second = paginate(Candidate.objects.all(), 'last_name', cursor=first.next_cursor, page_size=3)
+        self.assertEqual([row.id for row in second.rows], self.expected('last_name', False)[3:6])
+        # The total is carried in the cursor, not counted again.
+        self.assertEqual(second.count, 7)
+
+    def test_malformed_cursor_restarts_from_the_first_page(self):
+        page = paginate(Candidate.objects.all(), 'last_name', cursor='not-a-cursor', page_size=2)
+        self.assertEqual([row.id for row in page.rows], self.expected('last_name', False)[:2])
+
+    @override_settings(CANDIDATE_COUNT_LIMIT=5)
+    def test_count_stops_at_the_limit(self):
+        page = paginate(Candidate.objects.all(), 'id', page_size=2)
+        self.assertEqual((page.count, page.count_exact, page.count_label), (5, False, '5+'))
+
+
+class SplitBatchOutputTests(SimpleTestCase):
+    def answer(self, items):
+        return '```json\n' + json.dumps(items) + '\n```'
+
+    def test_candidates_go_to_the_resume_of_their_source_id(self):
+        output = self.answer([
+            {'first_name': 'Alan', 'source_id': 2},
+            {'first_name': 'Ada', 'source_id': 1},
+            {'first_name': 'Grace', 'source_id': '2'},
+        ])
+        self.assertEqual(split_batch_output(output, 3), [
+            [{'first_name': 'Ada'}],
+            [{'first_name': 'Alan'}, {'first_name': 'Grace'}],
+            None,
+        ])
+
+    def test_unattributable_candidates_void_the_whole_batch(self):
+        for items in [
+            [{'first_name': 'Ada', 'source_id': 1}, {'first_name': 'Alan'}],
+            [{'first_name': 'Ada', 'source_id': 1}, {'first_name': 'Alan', 'source_id': 3}],
+            [{'first_name': 'Ada', 'source_id': 'first'}],
+            [{'first_name': 'Ada', 'source_id': 0}],
+            ['Ada'],
+        ]:
+            with self.subTest(items=items):
+                self.assertEqual(split_batch_output(self.answer(items), 2), [None, None])
+
+    def test_unreadable_answers_void_the_whole_batch(self):
+        for output in [None, '', 'No candidates found.', '```json\n[{"first_name": \n```', '{"first_name": "Ada"}']:
+            with self.subTest(output=output):
+                self.assertEqual(split_batch_output(output, 2), [None, None])
+
+    def test_round_trip_through_a_batch_prompt(self):
+        resumes = ['# Ada Lovelace\nMathematician', '# Alan Turing\nLogician', '# Grace Hopper\nAdmiral']
+        split = split_batch_output(stub_answer(build_batch_prompt(resumes)), len(resumes))
+        self.assertEqual([[item['first_name'] for item in items] for items in split], [['Ada'], ['Alan'], ['Grace']])
+
+    @override_settings(GEMINI_BATCH_TOKEN_BUDGET=10 ** 6, GEMINI_BATCH_MAX_RESUMES=2)
+    def test_batches_are_capped_at_the_resume_limit(self):
+        self.assertEqual(pack_batches(['a', 'b', 'c', 'd', 'e']), [[0, 1], [2, 3], [4]])
+
+
+def resume_text(seed, words=300):
+    generator = random.Random(seed)
+    vocabulary = [f"term{number}" for number in range(400)]
+    return ' '.join(generator.choices(vocabulary, k=words))
+
+
+class PersistenceTests(SimpleTestCase):
+    def test_dates_are_read_in_every_known_format(self):
+        for value in ['1990-07-04', '1990/07/04', 'Jul 4, 1990', 'July 4, 1990', '4 Jul 1990', '4 July 1990',
+                      '07/04/1990', ' 1990-07-04 ']:
+            with self.subTest(value=value):
+                self.assertEqual(normalize_date(value), (date(1990, 7, 4), None))
+
+    def test_missing_dates_are_none_without_a_warning(self):
+        for value in [None, '']:
+            with self.subTest(value=value):
+                self.assertEqual(normalize_date(value), (None, None))
+
+    def test_unrecognised_date_is_dropped_with_a_warning(self):
+        for value in ['the fourth of July', '1990-13-40', 1990]:
+            with self.subTest(value=value):
+                self.assertEqual(
+                    normalize_date(value), (None, f"Ignored unrecognised date of birth '{value}'."),
+                )
+
+    def test_candidates_are_cleaned(self):
+        parsed_data = [
+            'Ada Lovelace',
+            {'first_name': '  Ada ', 'last_name': '', 'address': 'x' * 300, 'degree': 1815,
+             'date_of_birth': 'soon'},
+        ]
+        candidates, warnings = build_candidates(parsed_data, 'r' * 300 + '.pdf', None, None, resume_text='# Ada')
+
+        [candidate] = candidates
+        self.assertEqual((candidate.first_name, candidate.last_name), ('Ada', None))
+        self.assertEqual(candidate.address, 'x' * 255)
+        self.assertEqual(candidate.degree, '1815')
+        self.assertIsNone(candidate.degree_school)
+        self.assertIsNone(candidate.date_of_birth)
+        self.assertEqual(candidate.resume_file_name, 'r' * 255)
+        self.assertEqual(candidate.resume_text, '# Ada')
+        self.assertEqual(warnings, [
+            "Skipped a candidate entry that was not a JSON object.",
+            "Truncated address to 255 characters.",
+            "Ignored unrecognised date of birth 'soon'.",
+        ])
+
+    def test_nothing_parsed_builds_nothing(self):
+        self.assertEqual(build_candidates([], 'empty.pdf', None, None), ([], []))
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recruiter')
+        self.job = create_job(self.user)
+        self.original = self.insert(resume_text(1))[0]
+
+    def insert(self, *texts, first_name='Ada', last_name='Lovelace'):
+        candidates = [
+            Candidate(job=self.job, uploaded_by=self.user, first_name=first_name, last_name=last_name,
+                      resume_file_name='resume.pdf', resume_text=text)
+            for text in texts
+        ]
+        # Candidates are indexed once their insert commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            insert_candidates(candidates)
+        return candidates
+
+    def signature(self, candidate):
+        return CandidateSignature.objects.get(candidate=candidate)
+
+    def test_reupload_is_flagged(self):
+        copy = self.insert(resume_text(1))[0]
+        signature = self.signature(copy)
+        self.assertEqual((signature.duplicate_of_id, signature.similarity), (self.original.id, 1.0))
+        self.assertIsNone(self.signature(self.original).duplicate_of_id)
+
+    def test_lightly_edited_copy_is_flagged(self):
+        words = resume_text(1).split()
+        words[100:103] = ['edited', 'in', 'place']
+        copy = self.insert(' '.join(words))[0]
+        signature = self.signature(copy)
+        self.assertEqual(signature.duplicate_of_id, self.original.id)
+        self.assertGreaterEqual(signature.similarity, 0.8)
+
+    def test_different_resumes_and_people_are_not_flagged(self):
+        other = self.insert(resume_text(2))[0]
+        namesake = self.insert(resume_text(1), first_name='Alan', last_name='Turing')[0]
+        self.assertIsNone(self.signature(other).duplicate_of_id)
+        self.assertIsNone(self.signature(namesake).duplicate_of_id)
+
+    def test_copies_point_at_the_first_one(self):
+        first, second = self.insert(resume_text(3), resume_text(3))
+        third = self.insert(resume_text(3))[0]
+        self.assertEqual(self.signature(second).duplicate_of_id, first.id)
+        self.assertEqual(self.signature(third).duplicate_of_id, first.id)
+
+    def test_short_resumes_are_not_signed(self):
+        short = self.insert('Ada Lovelace, mathematician.')[0]
+        self.assertFalse(CandidateSignature.objects.filter(candidate=short).exists())
+
+    def test_signed_candidates_are_skipped(self):
+        copy = self.insert(resume_text(1))[0]
+        self.assertEqual(dedup.index_new_candidates([self.original.id, copy.id]), 0)
+        self.assertEqual(CandidateSignature.objects.count(), 2)
+
+
+class IngestionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root))
+        self.user = User.objects.create_user('recruiter')
+        self.job = create_job(self.user)
+
+    def enqueue(self, count):
+        files = [SimpleUploadedFile(f"resume{number}.pdf", f"resume {number}".encode()) for number in range(count)]
+        return ingestion.enqueue_resumes(self.job, self.user, files)
+
+    def results(self, tasks):
+        return [([{'first_name': task.original_name}], 'output', f"# {task.original_name}") for task in tasks]
+
+    def make_stale(self, tasks):
+        claimed_at = timezone.now() - timedelta(seconds=settings.INGESTION_STALE_AFTER + 1)
+        IngestionTask.objects.filter(id__in=[task.id for task in tasks]).update(claimed_at=claimed_at)
+        return list(IngestionTask.objects.select_related('ingestion_job__job').filter(id__in=[task.id for task in tasks]))
+
+    def test_workers_claim_the_oldest_tasks_once(self):
+        ingestion_job = self.enqueue(3)
+        first = ingestion.claim_tasks('worker-1', limit=2)
+        second = ingestion.claim_tasks('worker-2', limit=2)
+
+        task_ids = list(ingestion_job.tasks.order_by('id').values_list('id', flat=True))
+        self.assertEqual([task.id for task in first], task_ids[:2])
+        self.assertEqual([task.id for task in second], task_ids[2:])
+        self.assertEqual(ingestion.claim_tasks('worker-3'), [])
+        self.assertEqual({task.attempts for task in first + second}, {1})
+        ingestion_job.refresh_from_db()
+        self.assertEqual(ingestion_job.status, IngestionJob.STATUS_RUNNING)
+
+    def test_stale_tasks_are_requeued_until_out_of_attempts(self):
+        self.enqueue(1)
+        task = self.make_stale(ingestion.claim_tasks('worker-1'))[0]
+        for attempt in range(2, settings.INGESTION_MAX_ATTEMPTS + 1):
+            [task] = ingestion.claim_tasks(f"worker-{attempt}")
+            self.assertEqual((task.worker_id, task.attempts), (f"worker-{attempt}", attempt))
+            self.make_stale([task])
+
+        self.assertEqual(ingestion.claim_tasks('worker-last'), [])
+        task.refresh_from_db()
+        self.assertEqual(task.status, IngestionJob.STATUS_FAILED)
+        self.assertFalse(task.resume_file.storage.exists(task.resume_file.name))
+        self.assertEqual(IngestionJob.objects.get().status, IngestionJob.STATUS_FAILED)
+
+    def test_results_of_a_requeued_task_are_dropped(self):
+        self.enqueue(1)
+        slow = self.make_stale(ingestion.claim_tasks('slow'))
+        fast = ingestion.claim_tasks('fast')
+        self.assertEqual([task.id for task in fast], [task.id for task in slow])
+
+        ingestion._save_results(slow, self.results(slow))
+        task = IngestionTask.objects.get()
+        self.assertEqual((task.status, task.worker_id), (IngestionJob.STATUS_RUNNING, 'fast'))
+        self.assertFalse(Candidate.objects.exists())
+        self.assertFalse(ResumeDocument.objects.exists())
+        self.assertTrue(task.resume_file.storage.exists(task.resume_file.name))
+
+        ingestion._save_results(fast, self.results(fast))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.candidates_created), (IngestionJob.STATUS_COMPLETED, 1))
+        self.assertEqual(Candidate.objects.count(), 1)
+        self.assertEqual(ResumeDocument.objects.count(), 1)
+        self.assertFalse(task.resume_file.storage.exists(task.resume_file.name))
+
+    def test_job_finishes_once_every_announced_file_is_done(self):
+        ingestion_job = self.enqueue(2)
+        # A third file of the batch is still being stored.
+        IngestionJob.objects.filter(id=ingestion_job.id).update(total_files=3)
+        tasks = ingestion.claim_tasks('worker', limit=2)
+        ingestion._save_results(tasks, self.results(tasks[:1]) + [(None, 'no answer', '')])
+        ingestion_job.refresh_from_db()
+        self.assertEqual(ingestion_job.status, IngestionJob.STATUS_RUNNING)
+
+        ingestion._resize_job(ingestion_job.id, 2)
+        ingestion_job.refresh_from_db()
+        self.assertEqual(ingestion_job.status, IngestionJob.STATUS_COMPLETED)
+        self.assertIsNotNone(ingestion_job.finished_at)
+
+    def test_job_without_completed_files_fails(self):
+        ingestion_job = self.enqueue(1)
+        tasks = ingestion.claim_tasks('worker')
+        ingestion._save_results(tasks, [(None, '', '')])
+        ingestion_job.refresh_from_db()
+        self.assertEqual(ingestion_job.status, IngestionJob.STATUS_FAILED)
+
+    def upload(self, *files):
+        self.client.force_login(self.user)
+        with self.settings(INGESTION_RUN_IN_PROCESS=False, ALLOWED_HOSTS=['localhost']):
+            response = self.client.post(
+                reverse('upload_resume'), {'job_id': self.job.id, 'resumes': list(files)}, SERVER_NAME='localhost',
+            )
+        self.assertEqual(response.status_code, 202)
+        return IngestionJob.objects.get(id=response.json()['ingestion_job_id'])
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=64)
+    def test_uploads_are_hashed_as_they_arrive(self):
+        # One file small enough to be kept in memory, one spooled to a temporary file.
+        contents = {'small.pdf': b'small resume', 'large.pdf': b'large resume ' * 100}
+        ingestion_job = self.upload(*(SimpleUploadedFile(name, data) for name, data in contents.items()))
+
+        for task in ingestion_job.tasks.all():
+            with self.subTest(file=task.original_name):
+                self.assertEqual(task.content_hash, hashlib.sha256(contents[task.original_name]).hexdigest())
+                with task.resume_file.open('rb') as f:
+                    self.assertEqual(f.read(), contents[task.original_name])
+
+    @override_settings(PARSE_CACHE_ENABLED=True)
+    def test_reupload_is_parsed_from_the_cache(self):
+        data = b'resume of Ada Lovelace'
+        first = self.upload(SimpleUploadedFile('ada.pdf', data)).tasks.get()
+        parse_cache.store(first.content_hash, '# Ada Lovelace', [{'first_name': 'Ada'}], 'output')
+
+        second = self.upload(SimpleUploadedFile('ada (1).pdf', data)).tasks.get()
+        self.assertEqual(second.content_hash, first.content_hash)
+        self.assertNotEqual(
+            self.upload(SimpleUploadedFile('grace.pdf', b'resume of Grace Hopper')).tasks.get().content_hash,
+            first.content_hash,
+        )
+
+        # A cache hit needs no conversion, so this runs without Docling.
+        IngestionTask.objects.exclude(id=second.id).delete()
+        ingestion.run_tasks(ingestion.claim_tasks('worker'))
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.candidates_created), (IngestionJob.STATUS_COMPLETED, 1))
+        self.assertEqual(Candidate.objects.get().first_name, 'Ada')
+
+    def test_stream_reports_each_file_then_done(self):
+        ingestion_job = self.enqueue(2)
+        tasks = ingestion.claim_tasks('worker', limit=2)
+        ingestion._save_results(tasks, self.results(tasks[:1]) + [(None, '', '')])
+        ingestion_job.refresh_from_db()
+
+        records = list(ingestion.stream_results(ingestion_job, poll_interval=0.01, timeout=1))
+        self.assertEqual([record['type'] for record in records], ['file', 'file', 'progress', 'done'])
+        self.assertEqual(
+            [(record['file'], record['status'], record['candidates_created']) for record in records[:2]],
+            [('resume0.pdf', 'completed', 1), ('resume1.pdf', 'failed', 0)],
+        )
+        progress = records[-1]
+        self.assertEqual(
+            (progress['total'], progress['completed'], progress['failed'], progress['candidates_created']),
+            (2, 1, 1, 1),
+        )
+        self.assertEqual((progress['progress'], progress['finished']), (100, True))
+
+    @override_settings(ALLOWED_HOSTS=['localhost'], INGESTION_STREAM_POLL_INTERVAL=0.01)
+    def test_stream_view_sends_one_json_record_per_line(self):
+        ingestion_job = self.enqueue(2)
+        tasks = ingestion.claim_tasks('worker', limit=2)
+        ingestion._save_results(tasks, self.results(tasks))
+        url = reverse('ingestion_stream', args=[ingestion_job.id])
+
+        self.client.force_login(User.objects.create_user('other'))
+        self.assertEqual(self.client.get(url, SERVER_NAME='localhost').status_code, 404)
+
+        self.client.force_login(self.user)
+        response = self.client.get(url, SERVER_NAME='localhost')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual((response['Cache-Control'], response['X-Accel-Buffering']), ('no-cache', 'no'))
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.endswith('\n'))
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([record['type'] for record in records], ['file', 'file', 'progress', 'done'])
+        self.assertEqual(records[0]['parsed_data'], [{'first_name': 'resume0.pdf'}])
+        self.assertEqual(records[-1]['candidates_created'], 2)
+
+    def test_stream_times_out_while_files_are_pending(self):
+        ingestion_job = self.enqueue(1)
+        records = list(ingestion.stream_results(ingestion_job, poll_interval=0.01, timeout=0.05))
+        self.assertEqual([record['type'] for record in records], ['progress', 'timeout'])
+        self.assertEqual((records[-1]['pending'], records[-1]['progress']), (1, 0))
+
+
+RESUME = """# Ada Lovelace
+12 Main Street, Toronto, ON M5V 2T6
+
+## Education
+Bachelor of Science in Mathematics
+University of Toronto
+Diploma in Computing
+Seneca College
+"""
+
+
+class FallbackExtractor(Extractor):
+    """
+    Answers every resume with `answer` and records what it was asked for.
+    """
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = []
+
+    def extract_many(self, resume_contents, timings=None, fields=None):
+        self.calls.append((list(resume_contents), fields))
+        return [self.answer for _ in resume_contents]
+
+    def version(self):
+        return 'fallback'
+
+
+class TieredExtractorTests(SimpleTestCase):
+    def extract(self, markdown, answer=(None, None)):
+        fallback = FallbackExtractor(answer)
+        extractor = TieredExtractor(local=RuleBasedExtractor(), fallback=fallback, threshold=0.8)
+        return extractor.extract_many([markdown])[0], fallback.calls
+
+    def test_rules_resolve_a_well_formed_resume(self):
+        (parsed_data, raw_output), calls = self.extract(RESUME)
+        self.assertEqual(calls, [])
+        [item] = parsed_data
+        self.assertEqual(
+            {name: item[name] for name in ['first_name', 'last_name', 'address', 'date_of_birth']},
+            {'first_name': 'Ada', 'last_name': 'Lovelace', 'address': '12 Main Street, Toronto, ON M5V 2T6',
+             'date_of_birth': ''},
+        )
+        self.assertEqual(
+            {name: item[name] for name in ['degree', 'degree_school', 'diploma', 'diploma_school']},
+            {'degree': 'Bachelor of Science in Mathematics', 'degree_school': 'University of Toronto',
+             'diploma': 'Diploma in Computing', 'diploma_school': 'Seneca College'},
+        )
+        self.assertEqual(set(item['extracted_by'].values()), {'rules'})
+        self.assertEqual(json.loads(raw_output), parsed_data)
+
+    def test_only_uncertain_fields_are_escalated(self):
+        markdown = RESUME.replace('12 Main Street, Toronto, ON M5V 2T6\n', '')
+        answer = ([{'first_name': 'Someone', 'address': '1 Elm Street, Ottawa, ON K1A 0B1'}], 'gemini output')
+        (parsed_data, raw_output), calls = self.extract(markdown, answer)
+
+        self.assertEqual(calls, [([markdown], ['address'])])
+        [item] = parsed_data
+        self.assertEqual((item['first_name'], item['address']), ('Ada', '1 Elm Street, Ottawa, ON K1A 0B1'))
+        self.assertEqual(item['extracted_by']['address'], 'llm')
+        self.assertEqual(item['extracted_by']['first_name'], 'rules')
+        self.assertEqual(raw_output, 'gemini output')
+
+    def test_failed_fallback_fails_the_resume(self):
+        markdown = RESUME.replace('12 Main Street, Toronto, ON M5V 2T6\n', '')
+        result, calls = self.extract(markdown, (None, 'unreadable'))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(result, (None, 'unreadable'))
+
+    def test_several_people_merge_rule_fields_into_the_first(self):
+        markdown = RESUME.replace('12 Main Street, Toronto, ON M5V 2T6\n', '')
+        second = {'first_name': 'Alan', 'last_name': 'Turing', 'address': 'Manchester'}
+        answer = ([{'address': 'London'}, second], 'gemini output')
+        (parsed_data, raw_output), calls = self.extract(markdown, answer)
+
+        first, other = parsed_data
+        self.assertEqual((first['first_name'], first['address']), ('Ada', 'London'))
+        self.assertEqual(first['degree_school'], 'University of Toronto')
+        self.assertEqual(other, second)
+
+
+@override_settings(CACHES=LOCAL_CACHES, QUERY_BUDGET_MODE='off', ALLOWED_HOSTS=['localhost'], EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recruiter')
+        self.client.force_login(self.user)
+        self.job = create_job(self.user)
+        self.names = ['=SUM(A1:A9)', '+1 555 0100', '-2', '@cmd', 'Ada']
+        for name in self.names:
+            create_candidate(self.job, self.user, first_name=name, date_of_birth=date(1990, 12, 10))
+
+    def export(self, export_format):
+        response = self.client.get(
+            reverse('export_candidates'), {'job_id': self.job.id, 'format': export_format}, SERVER_NAME='localhost',
+        )
+        self.assertEqual(response.status_code, 200)
+        return [chunk.decode() for chunk in response.streaming_content]
+
+    def test_csv_escapes_formulas_and_streams_in_chunks(self):
+        chunks = self.export('csv')
+        header = next(csv.reader([chunks[0]]))
+        self.assertIn('first_name', header)
+        # The header, the first row on its own, then EXPORT_CHUNK_SIZE rows at a time.
+        self.assertEqual([len(list(csv.reader(io.StringIO(chunk)))) for chunk in chunks], [1, 1, 2, 2])
+
+        rows = list(csv.DictReader(io.StringIO(''.join(chunks))))
+        self.assertEqual(
+            [row['first_name'] for row in rows],
+            ["'=SUM(A1:A9)", "'+1 555 0100", "'-2", "'@cmd", 'Ada'],
+        )
+        self.assertEqual(rows[0]['date_of_birth'], '1990-12-10')
+        self.assertEqual(rows[0]['address'], '')
+
+    def test_jsonl_has_one_unescaped_object_per_line(self):
+        chunks = self.export('jsonl')
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [1, 2, 2])
+        records = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        self.assertEqual([record['first_name'] for record in records], self.names)
+        self.assertEqual((records[0]['date_of_birth'], records[0]['address']), ('1990-12-10', None))
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(
+            reverse('export_candidates'), {'job_id': self.job.id, 'format': 'xlsx'}, SERVER_NAME='localhost',
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MATCH_LEADERBOARD_SIZE=3, MATCH_TOP_APPLICANT_MIN_SCORE=0.1, MATCH_RESCORE_GROWTH=0.25)
+class MatchScoringTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recruiter')
+        self.job = create_job(self.user, description='Python SQL dashboards and reporting in Tableau.')
+        self.best = create_candidate(self.job, self.user, resume_text='Python SQL Tableau dashboards, reporting.')
+        self.good = create_candidate(self.job, self.user, resume_text='Python scripting and SQL queries.')
+        self.weak = create_candidate(self.job, self.user, resume_text='Python teaching assistant.')
+        self.none = create_candidate(self.job, self.user, resume_text='Gardening and landscaping.')
+
+    def scores(self):
+        return dict(CandidateMatch.objects.filter(job=self.job).values_list('candidate_id', 'score'))
+
+    def profile(self):
+        return JobScoringProfile.objects.get(job=self.job)
+
+    def test_candidates_are_ordered_by_their_terms(self):
+        self.assertEqual(matching.score_job(self.job), 4)
+        scores = self.scores()
+        self.assertGreater(scores[self.best.id], scores[self.good.id])
+        self.assertGreater(scores[self.good.id], scores[self.weak.id])
+        self.assertEqual(scores[self.none.id], 0)
+        profile = self.profile()
+        self.assertEqual([entry[0] for entry in profile.leaderboard], [self.best.id, self.good.id, self.weak.id])
+        self.assertEqual((profile.documents, profile.documents_at_rescore), (4, 4))
+        self.assertEqual(profile.document_frequency['python'], 3)
+
+    def test_new_candidates_are_scored_incrementally(self):
+        matching.score_job(self.job)
+        before = self.scores()
+        newcomer = create_candidate(self.job, self.user, resume_text='Tableau dashboards and SQL reporting in Python.')
+        matching.score_new_candidates([newcomer.id])
+
+        scores = self.scores()
+        self.assertEqual({key: value for key, value in scores.items() if key != newcomer.id}, before)
+        self.assertGreater(scores[newcomer.id], scores[self.good.id])
+        profile = self.profile()
+        self.assertEqual((profile.documents, profile.documents_at_rescore), (5, 4))
+        self.assertEqual(profile.document_frequency['python'], 4)
+        self.assertEqual(len(profile.leaderboard), 3)
+        self.assertIn(newcomer.id, [entry[0] for entry in profile.leaderboard])
+
+    def test_rescore_thresholds(self):
+        profile = JobScoringProfile(
+            job=self.job, description_hash=matching.description_hash(self.job.description),
+            documents=8, documents_at_rescore=8,
+        )
+        self.assertTrue(matching._needs_rescore(None, self.job, 1))
+        self.assertFalse(matching._needs_rescore(profile, self.job, 2))
+        self.assertTrue(matching._needs_rescore(profile, self.job, 3))
+        self.job.description = 'Gardening.'
+        self.assertTrue(matching._needs_rescore(profile, self.job, 0))
+
+    def test_full_scoring_keeps_scores_it_did_not_compute(self):
+        matching.score_job(self.job)
+        score = self.scores()[self.none.id]
+        # A full scoring that read the candidates before `none` was inserted.
+        matching._save_job(self.job, [self.best.id], [0.5], {'leaderboard': [[self.best.id, 0.5]]})
+        scores = self.scores()
+        self.assertEqual((scores[self.best.id], scores[self.none.id]), (0.5, score))
+
+    def test_deleted_candidates_are_not_top_applicants(self):
+        matching.score_job(self.job)
+        self.assertEqual(len(matching.top_applicants(self.profile())), 3)
+        self.best.delete()
+        self.assertEqual(
+            [entry[0] for entry in matching.top_applicants(self.profile())], [self.good.id, self.weak.id],
+        )
+
+
+class ConverterPoolTests(SimpleTestCase):
+    def pool(self, **options):
+        options.setdefault('size', 1)
+        options.setdefault('start_timeout', 30)
+        pool = ConverterPool(worker_target=stub_worker_main, replace_backoff=0.05, **options)
+        pool.start()
+        self.addCleanup(pool.close)
+        return pool
+
+    def convert(self, pool, text):
+        return pool.convert(DocumentSource('resume.txt', text.encode()))
+
+    def test_documents_are_converted(self):
+        pool = self.pool(size=2)
+        results = pool.convert_many([DocumentSource(f"{i}.txt", f"resume {i}".encode()) for i in range(3)])
+        self.assertEqual([result.markdown for result in results], ['resume 0', 'resume 1', 'resume 2'])
+        with self.assertRaisesMessage(ConversionError, 'stub failure'):
+            self.convert(pool, 'fail')
+
+    def test_workers_are_recycled_after_max_conversions(self):
+        pool = self.pool(max_conversions=2, acquire_timeout=30)
+        pids = [self.convert(pool, 'resume').timings['pid'] for _ in range(3)]
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+
+    def test_crashed_and_hung_workers_are_replaced(self):
+        pool = self.pool(timeout=1, acquire_timeout=30)
+        first = self.convert(pool, 'resume').timings['pid']
+        with self.assertRaisesMessage(ConversionError, 'crashed'):
+            self.convert(pool, 'crash')
+        second = self.convert(pool, 'resume').timings['pid']
+        with self.assertRaises(ConversionTimeout):
+            self.convert(pool, 'hang')
+        third = self.convert(pool, 'resume').timings['pid']
+        self.assertEqual(len({first, second, third}), 3)
+
+    def test_failed_replacement_is_retried_instead_of_enqueued(self):
+        pool = self.pool(acquire_timeout=0.2)
+        pool.worker_target, pool.start_timeout = stub_worker_never_ready, 0.5
+        with self.assertRaises(ConversionError):
+            self.convert(pool, 'crash')
+        with self.assertRaisesMessage(ConversionError, 'No Docling worker became free'):
+            self.convert(pool, 'resume')
+
+        pool.worker_target, pool.start_timeout, pool.acquire_timeout = stub_worker_main, 30, 30
+        self.assertEqual(self.convert(pool, 'resume').markdown, 'resume')
+
+    def test_failed_start_stops_the_workers_already_started(self):
+        before = set(multiprocessing.active_children())
+        pool = ConverterPool(size=2, start_timeout=0.2, worker_target=stub_worker_never_ready)
+        with self.assertRaisesMessage(ConversionError, 'did not start in time'):
+            pool.start()
+        self.assertEqual(set(multiprocessing.active_children()) - before, set())
+
+
+class Interrupted(Exception):
+    pass
+
+
+@override_settings(RESUME_EXTRACTOR='parser.tests.StubExtractor', PARSE_CACHE_ENABLED=False)
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recruiter')
+        self.job = create_job(self.user)
+        StubExtractor.people = [{'first_name': 'Ada', 'last_name': 'Lovelace'}]
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.directory = os.path.join(root, 'resumes')
+        os.mkdir(self.directory)
+        for number in range(5):
+            with open(os.path.join(self.directory, f"resume{number}.txt"), 'w') as f:
+                f.write(f"# Resume {number}")
+        self.checkpoint_path = os.path.join(root, 'import.checkpoint.jsonl')
+        pool = ConverterPool(size=2, worker_target=stub_worker_main, start_timeout=30)
+        pool.start()
+        self.addCleanup(pool.close)
+        previous, converter_pool._pool = converter_pool._pool, pool
+        self.addCleanup(setattr, converter_pool, '_pool', previous)
+
+    def test_interrupted_import_resumes_without_duplicates(self):
+        def interrupt(report):
+            raise Interrupted
+
+        source = ResumeSource(self.directory)
+        checkpoint = Checkpoint(self.checkpoint_path, self.job.id)
+        with self.assertRaises(Interrupted):
+            BulkImporter(self.job, self.user, checkpoint, batch_size=2, on_batch=interrupt).run(source)
+        checkpoint.close()
+        source.close()
+        self.assertEqual(Candidate.objects.count(), 2)
+
+        output = io.StringIO()
+        call_command(
+            'import_resumes', self.directory, job=self.job.id, checkpoint=self.checkpoint_path, batch_size=2,
+            stdout=output,
+        )
+        names = sorted(Candidate.objects.values_list('resume_file_name', flat=True))
+        self.assertEqual(names, [f"resume{number}.txt" for number in range(5)])
+        self.assertEqual(ResumeDocument.objects.count(), 5)
+
+        checkpoint = Checkpoint(self.checkpoint_path, self.job.id)
+        checkpoint.close()
+        self.assertEqual(sorted(checkpoint.done), [f"resume{number}.txt" for number in range(5)])
+        self.assertEqual({record['status'] for record in checkpoint.done.values()}, {'completed'})
+
+        # A third run finds nothing left to do.
+        source = ResumeSource(self.directory)
+        checkpoint = Checkpoint(self.checkpoint_path, self.job.id)
+        report = BulkImporter(self.job, self.user, checkpoint, batch_size=2).run(source)
+        checkpoint.close()
+        source.close()
+        self.assertEqual((report.skipped, report.completed), (5, 0))
+        self.assertEqual(Candidate.objects.count(), 5)
+
+    def test_checkpoint_of_another_job_is_refused(self):
+        Checkpoint(self.checkpoint_path, self.job.id).close()
+        with self.assertRaisesMessage(ValueError, 'belongs to job'):
+            Checkpoint(self.checkpoint_path, self.job.id + 1)
+
+
+@override_settings(CACHES=LOCAL_CACHES, QUERY_BUDGET_MODE='off', ALLOWED_HOSTS=['localhost'])
+class ChartETagTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recruiter')
+        self.client.force_login(self.user)
+        self.job = create_job(self.user)
+        create_candidate(self.job, self.user, degree='BSc')
+
+    def get(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(
+            reverse('chart_degrees'), {'job_id': self.job.id}, SERVER_NAME='localhost', headers=headers,
+        )
+
+    def test_matching_etag_gets_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_etag_changes_with_the_data_version(self):
+        etag = self.get()['ETag']
+        create_candidate(self.job, self.user, degree='MSc')
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(sorted(entry['degree'] for entry in response.json()), ['BSc', 'MSc'])
+
+    def test_etag_differs_per_url(self):
+        degrees = self.get()['ETag']
+        schools = self.client.get(reverse('chart_schools'), {'job_id': self.job.id}, SERVER_NAME='localhost')
+        self.assertNotEqual(schools['ETag'], degrees)
+
+
+@override_settings(CACHES=LOCAL_CACHES, QUERY_BUDGET_MODE='off', ALLOWED_HOSTS=['localhost'])
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caches[response_cache.CACHE_ALIAS].clear()
+        self.user = User.objects.create_user('recruiter')
+        self.client.force_login(self.user)
+        self.job = create_job(self.user)
+        self.ada = create_candidate(self.job, self.user, first_name='Ada', last_name='Lovelace')
+
+    def cached_table(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 'table'
+
+        response_cache.cached('candidate_table', self.job.id, response_cache.job_version(self.job.id), '', compute)
+        return len(calls)
+
+    def test_writes_to_the_job_invalidate_its_entries(self):
+        self.assertEqual(self.cached_table(), 1)
+        self.assertEqual(self.cached_table(), 0)
+        version = response_cache.job_version(self.job.id)
+
+        Candidate.objects.filter(id=self.ada.id).update(first_name='Augusta')
+        self.assertGreater(response_cache.job_version(self.job.id), version)
+        self.assertEqual(self.cached_table(), 1)
+
+        other = create_job(self.user, title='Other')
+        create_candidate(other, self.user, first_name='Alan')
+        self.assertEqual(self.cached_table(), 0)
+
+    def test_candidate_table_shows_new_candidates(self):
+        url = reverse('parser_home')
+        response = self.client.get(url, {'job_id': self.job.id}, SERVER_NAME='localhost')
+        self.assertContains(response, 'Lovelace')
+        self.assertNotContains(response, 'Hopper')
+
+        create_candidate(self.job, self.user, first_name='Grace', last_name='Hopper')
+        response = self.client.get(url, {'job_id': self.job.id}, SERVER_NAME='localhost')
+        self.assertContains(response, 'Hopper')
+
+
+TEST_EVENTS = metrics.Counter('ats_test_events_total', 'Events counted by the tests.', ['kind'])
+TEST_SECONDS = metrics.Histogram('ats_test_seconds', 'Durations observed by the tests.', buckets=(0.1, 1))
+
+
+@override_settings(ALLOWED_HOSTS=['localhost'], METRICS_TOKEN=None)
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        self.enterContext(self.settings(METRICS_DIR=metrics_dir))
+        TEST_EVENTS._values = {}
+        TEST_SECONDS._values = {}
+
+    def test_counters_and_histograms_are_rendered(self):
+        TEST_EVENTS.inc(kind='say "hi"')
+        TEST_SECONDS.observe(0.05)
+        TEST_SECONDS.observe(0.5)
+
+        lines = metrics.render().splitlines()
+        for line in [
+            '# HELP ats_test_events_total Events counted by the tests.',
+            '# TYPE ats_test_events_total counter',
+            'ats_test_events_total{kind="say \\"hi\\""} 1',
+            '# TYPE ats_test_seconds histogram',
+            'ats_test_seconds_bucket{le="0.1"} 1',
+            'ats_test_seconds_bucket{le="1.0"} 2',
+            'ats_test_seconds_bucket{le="+Inf"} 2',
+            'ats_test_seconds_sum 0.55',
+            'ats_test_seconds_count 2',
+        ]:
+            self.assertIn(line, lines)
+
+    def test_values_of_other_processes_are_added(self):
+        TEST_EVENTS.inc(kind='upload')
+        other = {'ats_test_events_total': {
+            'type': 'counter', 'help': 'Events counted by the tests.', 'labelnames': ['kind'],
+            'samples': [[['upload'], 2], [['archive'], 1]],
+        }}
+        with open(os.path.join(settings.METRICS_DIR, '1-exited.json'), 'w') as f:
+            json.dump(other, f)
+
+        lines = metrics.render().splitlines()
+        self.assertIn('ats_test_events_total{kind="upload"} 3', lines)
+        self.assertIn('ats_test_events_total{kind="archive"} 1', lines)
+
+    def test_view_serves_the_text_format(self):
+        TEST_EVENTS.inc(kind='upload')
+        response = self.client.get(reverse('metrics'), SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn('ats_test_events_total{kind="upload"} 1', response.content.decode().splitlines())
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_view_requires_the_token_when_set(self):
+        url = reverse('metrics')
+        for authorization in [None, 'Bearer wrong', 'secret']:
+            with self.subTest(authorization=authorization):
+                headers = {'Authorization': authorization} if authorization else {}
+                response = self.client.get(url, SERVER_NAME='localhost', headers=headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertNotIn(b'ats_test_events_total', response.content)
+
+        response = self.client.get(url, SERVER_NAME='localhost', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE ats_test_events_total counter', response.content)
@@ -0,0 +1,41 @@
+"""
+Upload handlers that hash files while Django receives them.
+
+They behave exactly like Django's default memory and temporary-file
+handlers, but also feed every chunk to SHA-256 and set `content_hash` on
+the resulting UploadedFile. The parse cache key is then known without
+reading the file again, and a large upload can be moved into storage
+(TemporaryUploadedFile) instead of copied through a hashing wrapper.
+Enabled through FILE_UPLOAD_HANDLERS.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class _HashingMixin:
+    def new_file(self, *args, **kwargs):
+        # Set up first: the memory handler's new_file raises StopFutureHandlers.
+        self._hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # The memory handler passes files over its size limit on to the next
+        # handler, which does the hashing for those.
+        if getattr(self, 'activated', True):
+            self._hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.content_hash = self._hasher.hexdigest()
+        return uploaded_file
+
+
+class HashingMemoryFileUploadHandler(_HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(_HashingMixin, TemporaryFileUploadHandler):
+    pass
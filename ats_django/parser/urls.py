@@ -4,10 +4,20 @@ from . import views
 urlpatterns = [
     path('', views.parser_home, name='parser_home'),
     path('upload/', views.upload_resume, name='upload_resume'),
+    path('upload/archive/', views.upload_archive, name='upload_archive'),
+    path('upload/status/<int:ingestion_job_id>/', views.ingestion_status, name='ingestion_status'),
+    path('upload/stream/<int:ingestion_job_id>/', views.ingestion_stream, name='ingestion_stream'),
+    path('candidates/', views.candidate_rows, name='candidate_rows'),
+    path('candidates/export/', views.export_candidates, name='export_candidates'),
     path('create_job/', views.create_job, name='create_job'),
     path('create_job_posting/', views.create_job_posting, name='create_job_posting'),
+    path('charts/applicants/', views.chart_applicants, name='chart_applicants'),
+    path('charts/degrees/', views.chart_degrees, name='chart_degrees'),
+    path('charts/schools/', views.chart_schools, name='chart_schools'),
+    path('cache/stats/', views.cache_stats, name='cache_stats'),
     path('autocomplete/', views.autocomplete, name='autocomplete'),
     path('delete_job/<int:job_id>/', views.delete_job, name='delete_job'),
     path('update_profile/', views.update_profile, name='update_profile'),
     path('job/<int:job_id>/', views.job_posting_details, name='job_posting_details'),
+    path('job/<int:job_id>/duplicates/', views.job_duplicates, name='job_duplicates'),
 ]
\ No newline at end of file
@@ -1,21 +1,71 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
-from .models import Candidate, Job, Profile
-from .gemini_parser import process_resume
-from django.http import JsonResponse
-from django.db.models import Q, Count  # <-- Count is already here
+from django.conf import settings
+from .models import Candidate, CandidateSignature, Job, Profile, IngestionJob
+from .ingestion import enqueue_resumes, ensure_local_workers, job_progress, stream_results
+from . import analytics, export, matching, metrics, response_cache
+from .autocomplete import suggest
+from .bulk_import import iter_archive_files
+from .pagination import SORT_FIELDS, paginate
+from .search import FILTER_FIELDS, search_candidates
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from datetime import date
 from .forms import JobForm, ProfileUpdateForm
+import hashlib
+import hmac
 import json
 import random
+import zipfile
+
+def _filter_candidates(request, candidates):
+    """
+    Applies the filter form's parameters to a Candidate queryset.
+    Returns (candidates, sort_by, descending).
+    """
+    # Filtering (answered from the full-text index, see search.py)
+    filters = {field: request.GET.get(field) for field in FILTER_FIELDS}
+    candidates, ranked = search_candidates(candidates, filters, request.GET.get('q', ''))
+    # Precomputed match scores (see matching.py); NULL until a candidate is scored.
+    candidates = candidates.annotate(match_score=F('match__score'))
+
+    min_dob = request.GET.get('min_dob')
+    max_dob = request.GET.get('max_dob')
+    if min_dob:
+        candidates = candidates.filter(date_of_birth__gte=min_dob)
+    if max_dob:
+        candidates = candidates.filter(date_of_birth__lte=max_dob)
+
+    # Free-text searches are ordered by relevance unless a column was clicked.
+    default_sort = 'search_rank' if ranked else 'id'
+    sort_by = request.GET.get('sort_by', default_sort)
+    if sort_by not in SORT_FIELDS or (sort_by == 'search_rank' and not ranked):
+        sort_by = default_sort
+    return candidates, sort_by, request.GET.get('order') == 'desc'
+
+
+def _has_filters(request):
+    params = FILTER_FIELDS + ['q', 'min_dob', 'max_dob']
+    return any(request.GET.get(param) for param in params)
+
 
 @login_required
+@metrics.VIEW_SECONDS.time(view='parser_home')
 def parser_home(request):
     """
     Renders the main page of the parser app and displays candidates.
     """
-    jobs = Job.objects.select_related('created_by', 'created_by__profile').all().order_by('-opening_date')
+    # Fetched once: the template lists every job and the selected one is among them.
+    jobs = list(
+        Job.objects.select_related('created_by', 'created_by__profile', 'scoring_profile')
+        .defer('scoring_profile__document_frequency')
+        .order_by('-opening_date')
+    )
     selected_job_id = request.GET.get('job_id')
     newly_created_job_id = request.GET.get('new_job_id')
     selected_job = None
@@ -25,51 +75,37 @@ def parser_home(request):
         selected_job_id = newly_created_job_id
 
     if selected_job_id:
-        try:
-            selected_job = Job.objects.select_related('created_by').get(id=selected_job_id)
+        selected_job = next((job for job in jobs if str(job.id) == selected_job_id), None)
+        if selected_job:
             candidates = Candidate.objects.filter(job=selected_job)
-        except Job.DoesNotExist:
-            pass
-    elif jobs.exists():
-        selected_job = jobs.first()
+    elif jobs:
+        selected_job = jobs[0]
         candidates = Candidate.objects.filter(job=selected_job)
 
-    # Filtering
-    filters = {
-        'first_name__icontains': request.GET.get('first_name'),
-        'last_name__icontains': request.GET.get('last_name'),
-        'address__icontains': request.GET.get('address'),
-        'degree__icontains': request.GET.get('degree'),
-        'degree_school__icontains': request.GET.get('degree_school'),
-        'diploma__icontains': request.GET.get('diploma'),
-        'diploma_school__icontains': request.GET.get('diploma_school'),
-        'resume_file_name__icontains': request.GET.get('resume_file_name'),
-    }
-    for key, value in filters.items():
-        if value:
-            candidates = candidates.filter(**{key: value})
-
-    min_dob = request.GET.get('min_dob')
-    max_dob = request.GET.get('max_dob')
-    if min_dob:
-        candidates = candidates.filter(date_of_birth__gte=min_dob)
-    if max_dob:
-        candidates = candidates.filter(date_of_birth__lte=max_dob)
-
-    sort_by = request.GET.get('sort_by', 'id')
-    order = request.GET.get('order', 'asc')
+    candidates, sort_by, descending = _filter_candidates(request, candidates)
 
     query_params = request.GET.copy()
-    if 'sort_by' in query_params:
-        del query_params['sort_by']
-    if 'order' in query_params:
-        del query_params['order']
-
-    if order == 'desc':
-        sort_by_param = f'-{sort_by}'
-    else:
-        sort_by_param = sort_by
-    candidates = candidates.order_by(sort_by_param)
+    for param in ('sort_by', 'order', 'cursor'):
+        if param in query_params:
+            del query_params[param]
+
+    def render_candidate_table():
+        page = paginate(candidates, sort_by, descending, request.GET.get('cursor'))
+        html = render_to_string('parser/candidate_table.html', {
+            'candidates': page.rows,
+            'page': page,
+            'query_params': query_params.urlencode(),
+        }, request=request)
+        return {'html': html, 'shown': len(page.rows), 'count_label': page.count_label}
+
+    # The rendered table is cached per job and data version (see response_cache.py).
+    candidate_table = response_cache.cached(
+        'candidate_table',
+        selected_job.id if selected_job else None,
+        response_cache.job_version(selected_job.id) if selected_job else None,
+        response_cache.normalize_params(request.GET),
+        render_candidate_table,
+    )
 
     job_form = JobForm()
     
@@ -80,64 +116,23 @@ def parser_home(request):
         profile_form = ProfileUpdateForm(instance=request.user.profile)
 
 
-    # Analytics data
-    total_jobs = Job.objects.count()
-    total_candidates = Candidate.objects.count()
-    top_applicants = 0 # Placeholder for now
-
-    # --- New D3 Bar Chart Data ---
-    # Aggregate candidate counts for each job
-    job_applicant_counts = Job.objects.annotate(
-        applicant_count=Count('candidates')
-    ).values('title', 'applicant_count').order_by('-applicant_count')
-    
-    # Convert QuerySet to list and then to JSON
-    candidate_chart_data = json.dumps(list(job_applicant_counts))
-    
-    # --- Data for Top Degrees (Vertical Bar Chart) ---
-    # We use the 'candidates' queryset, which is already filtered for the selected job.
-    top_degrees_data = list(
-        candidates.filter(degree__isnull=False).exclude(degree__exact='')
-        .values('degree')
-        .annotate(count=Count('degree'))
-        .order_by('-count')[:10] # Get top 10
-    )
-    
-    # --- Data for Top Schools (Horizontal Bar Chart) ---
-    # We need to combine counts from 'degree_school' and 'diploma_school'
-    school_counts = {}
-    
-    # 1. Get degree school counts
-    degree_schools = candidates.filter(degree_school__isnull=False).exclude(degree_school__exact='').values('degree_school').annotate(count=Count('degree_school'))
-    for item in degree_schools:
-        school_name = item['degree_school']
-        school_counts[school_name] = school_counts.get(school_name, 0) + item['count']
-    
-    # 2. Get diploma school counts
-    diploma_schools = candidates.filter(diploma_school__isnull=False).exclude(diploma_school__exact='').values('diploma_school').annotate(count=Count('diploma_school'))
-    for item in diploma_schools:
-        school_name = item['diploma_school']
-        school_counts[school_name] = school_counts.get(school_name, 0) + item['count']
+    # Analytics data (materialized counters, see analytics.py)
+    total_jobs, total_candidates = analytics.totals()
+    # Leaderboard entries above the score threshold (see matching.py)
+    top_applicants = len(matching.top_applicants(getattr(selected_job, 'scoring_profile', None)))
 
-    # 3. Convert to list of dicts for D3
-    top_schools_data = [{'school': k, 'count': v} for k, v in school_counts.items()]
-    # 4. Sort and take top 10
-    top_schools_data = sorted(top_schools_data, key=lambda x: x['count'], reverse=True)[:10]
+    # The dashboard charts fetch their data lazily from the chart_* views below.
 
     context = {
         'jobs': jobs,
         'selected_job': selected_job,
-        'candidates': candidates,
+        'candidate_table': candidate_table,
         'query_params': query_params.urlencode(),
         'job_form': job_form,
         'profile_form': profile_form,
         'total_jobs': total_jobs,
         'total_candidates': total_candidates,
         'top_applicants': top_applicants,
-        'candidate_chart_data': candidate_chart_data,
-        # --- Add new chart data to context ---
-        'top_degrees_chart_data': json.dumps(top_degrees_data),
-        'top_schools_chart_data': json.dumps(top_schools_data),
     }
 
     return render(request, 'parser/parser_home.html', context)
@@ -173,60 +168,287 @@ def create_job_posting(request):
 @login_required
 def upload_resume(request):
     """
-    Handles the resume upload, sends it to the Gemini API for parsing,
-    and saves the extracted data.
+    Handles the resume upload. The files are queued for background parsing
+    and the id of the ingestion job is returned right away; the page then
+    follows `ingestion_stream` (or polls `ingestion_status`) until the batch
+    is done.
     """
     csv_output = None
     if request.method == 'POST':
         resume_files = request.FILES.getlist('resumes')
-        job_id = request.POST.get('job_id')
-        job = Job.objects.get(id=job_id)
-        all_parsed_data = []
-        raw_csv_outputs = []
-
-        for resume_file in resume_files:
-            parsed_data, raw_csv = process_resume(resume_file)
-            if parsed_data:
-                all_parsed_data.extend(parsed_data)
-                if raw_csv:
-                    raw_csv_outputs.append(raw_csv)
-                for item in parsed_data:
-                    Candidate.objects.create(
-                        first_name=item.get('first_name'),
-                        last_name=item.get('last_name'),
-                        date_of_birth=item.get('date_of_birth') or None,
-                        address=item.get('address'),
-                        degree=item.get('degree'),
-                        degree_school=item.get('degree_school'),
-                        diploma=item.get('diploma'),
-                        diploma_school=item.get('diploma_school'),
-                        resume_file_name=resume_file.name,
-                        job=job,
-                        uploaded_by=request.user
-                    )
-        if raw_csv_outputs:
-            csv_output = "\n\n".join(raw_csv_outputs)
-
-        return JsonResponse({'csv_output': csv_output, 'parsed_data': all_parsed_data})
+        job_id = request.POST.get('job_id', '')
+        job = Job.objects.filter(id=job_id).first() if job_id.isdigit() else None
+        if job is None:
+            return JsonResponse({'error': 'Please select a valid job posting before uploading resumes.'}, status=400)
+        if not resume_files:
+            return JsonResponse({'error': 'Please select at least one resume to upload.'}, status=400)
+
+        ingestion_job = enqueue_resumes(job, request.user, resume_files)
+        ensure_local_workers()
+
+        return JsonResponse({
+            'ingestion_job_id': ingestion_job.id,
+            'status_url': reverse('ingestion_status', args=[ingestion_job.id]),
+            'stream_url': reverse('ingestion_stream', args=[ingestion_job.id]),
+        }, status=202)
 
     jobs = Job.objects.all()
     candidates = Candidate.objects.all()
     return render(request, 'parser/parser_home.html', {'jobs': jobs, 'candidates': candidates, 'csv_output': csv_output})
 
 
-def autocomplete(request):
-    if 'term' in request.GET and 'field' in request.GET:
-        field = request.GET.get('field')
-        term = request.GET.get('term')
+@login_required
+def upload_archive(request):
+    """
+    Queues every resume in an uploaded ZIP archive for background parsing,
+    like `upload_resume` does for individual files.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method.'}, status=405)
+    archive_file = request.FILES.get('archive')
+    job_id = request.POST.get('job_id', '')
+    job = Job.objects.filter(id=job_id).first() if job_id.isdigit() else None
+    if job is None:
+        return JsonResponse({'error': 'Please select a valid job posting before uploading resumes.'}, status=400)
+    if archive_file is None or not zipfile.is_zipfile(archive_file):
+        return JsonResponse({'error': 'Please select a ZIP archive of resumes to upload.'}, status=400)
+
+    with zipfile.ZipFile(archive_file) as archive:
+        total_files, resume_files = iter_archive_files(archive)
+        if not total_files:
+            return JsonResponse({'error': 'The archive does not contain any resumes.'}, status=400)
+        if total_files > settings.BULK_IMPORT_MAX_ARCHIVE_FILES:
+            return JsonResponse({
+                'error': f'The archive contains {total_files} files; at most '
+                         f'{settings.BULK_IMPORT_MAX_ARCHIVE_FILES} can be uploaded at once.',
+            }, status=400)
+        ingestion_job = enqueue_resumes(job, request.user, resume_files, total_files=total_files)
+    ensure_local_workers()
+
+    return JsonResponse({
+        'ingestion_job_id': ingestion_job.id,
+        'total_files': total_files,
+        'status_url': reverse('ingestion_status', args=[ingestion_job.id]),
+        'stream_url': reverse('ingestion_stream', args=[ingestion_job.id]),
+    }, status=202)
 
-        valid_fields = [f.name for f in Candidate._meta.get_fields()]
-        if field not in valid_fields:
-            return JsonResponse([], safe=False)
 
-        qs = Candidate.objects.filter(**{f'{field}__icontains': term})
-        values = list(qs.values_list(field, flat=True).distinct())
-        return JsonResponse(values, safe=False)
-    return JsonResponse([], safe=False)
+@login_required
+def ingestion_status(request, ingestion_job_id):
+    """
+    Returns the progress of a background upload as JSON. Once the batch has
+    finished, the Gemini output and parsed data of every file are included.
+    """
+    ingestion_job = get_object_or_404(IngestionJob, id=ingestion_job_id, created_by=request.user)
+    data = job_progress(ingestion_job)
+
+    if data['finished']:
+        raw_csv_outputs = []
+        all_parsed_data = []
+        errors = []
+        for task in ingestion_job.tasks.order_by('id'):
+            if task.raw_output:
+                raw_csv_outputs.append(task.raw_output)
+            if task.parsed_data:
+                all_parsed_data.extend(task.parsed_data)
+            if task.error:
+                errors.append({'file': task.original_name, 'error': task.error})
+        data['csv_output'] = "\n\n".join(raw_csv_outputs) or None
+        data['parsed_data'] = all_parsed_data
+        data['errors'] = errors
+
+    return JsonResponse(data)
+
+
+@login_required
+def ingestion_stream(request, ingestion_job_id):
+    """
+    Streams the results of a background upload as newline-delimited JSON:
+    one 'file' record per resume as soon as it has been parsed (or has
+    failed), 'progress' records as the batch advances, and a final 'done'
+    record. See `stream_results`.
+    """
+    ingestion_job = get_object_or_404(IngestionJob, id=ingestion_job_id, created_by=request.user)
+    lines = (json.dumps(record, cls=DjangoJSONEncoder) + '\n' for record in stream_results(ingestion_job))
+    response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    # Stops nginx from buffering the stream until it ends.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+CANDIDATE_COLUMNS = [
+    'id', 'first_name', 'last_name', 'address', 'date_of_birth', 'degree',
+    'degree_school', 'diploma', 'diploma_school', 'resume_file_name', 'match_score',
+]
+
+
+@login_required
+def candidate_rows(request):
+    """
+    Returns one page of a job's candidates as JSON, for infinite scroll.
+    Takes the same filter and sort parameters as parser_home plus the
+    `cursor` returned with the previous page.
+    """
+    job_id = request.GET.get('job_id', '')
+    job = Job.objects.filter(id=job_id).first() if job_id.isdigit() else None
+    if job is None:
+        return JsonResponse({'error': 'Please select a valid job.'}, status=400)
+
+    candidates, sort_by, descending = _filter_candidates(request, Candidate.objects.filter(job=job))
+    page = paginate(candidates, sort_by, descending, request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [
+            {column: getattr(candidate, column) for column in CANDIDATE_COLUMNS}
+            for candidate in page.rows
+        ],
+        'next_cursor': page.next_cursor,
+        'count': page.count,
+        'count_exact': page.count_exact,
+    })
+
+
+@login_required
+def export_candidates(request):
+    """
+    Streams all of a job's candidates matching the filters as CSV
+    (`format=csv`, the default) or JSON Lines (`format=jsonl`). Takes the
+    same filter and sort parameters as parser_home (see export.py).
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in export.FORMATS:
+        return JsonResponse({'error': 'Unknown export format.'}, status=400)
+    job_id = request.GET.get('job_id', '')
+    job = Job.objects.filter(id=job_id).first() if job_id.isdigit() else None
+    if job is None:
+        return JsonResponse({'error': 'Please select a valid job.'}, status=400)
+
+    candidates, sort_by, descending = _filter_candidates(request, Candidate.objects.filter(job=job))
+    response = StreamingHttpResponse(
+        export.iter_export(export_format, candidates, CANDIDATE_COLUMNS, sort_by, descending),
+        content_type=export.FORMATS[export_format],
+    )
+    filename = f"candidates-job{job.id}-{date.today().isoformat()}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _chart_data_version(request):
+    # Looked up once per request; both condition() callbacks need it.
+    if not hasattr(request, '_chart_data_version'):
+        request._chart_data_version = analytics.data_version()
+    return request._chart_data_version
+
+
+def _chart_etag(request, *args, **kwargs):
+    version, _ = _chart_data_version(request)
+    if version is None:
+        return None
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()[:16]
+    return f'{version}-{digest}'
+
+
+def _chart_last_modified(request, *args, **kwargs):
+    return _chart_data_version(request)[1]
+
+
+def _chart_candidates(request):
+    """
+    Returns (job, filtered candidates or None) for a degrees/schools chart
+    request. The candidates are None when no filter is applied, in which
+    case the chart is read from the job's counters.
+    """
+    job_id = request.GET.get('job_id', '')
+    job = Job.objects.filter(id=job_id).first() if job_id.isdigit() else None
+    if job is None or not _has_filters(request):
+        return job, None
+    candidates, _, _ = _filter_candidates(request, Candidate.objects.filter(job=job))
+    return job, candidates
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_chart_etag, last_modified_func=_chart_last_modified)
+def chart_applicants(request):
+    """
+    Chart data: the number of candidates for each job.
+    """
+    data = response_cache.cached(
+        'chart_applicants', 'all', _chart_data_version(request)[0], '', analytics.job_applicant_counts,
+    )
+    return JsonResponse(data, safe=False)
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_chart_etag, last_modified_func=_chart_last_modified)
+def chart_degrees(request):
+    """
+    Chart data: the top degrees among a job's (optionally filtered) candidates.
+    """
+    job, candidates = _chart_candidates(request)
+    if job is None:
+        return JsonResponse([], safe=False)
+    data = response_cache.cached(
+        'chart_degrees', job.id, response_cache.job_version(job.id), response_cache.normalize_params(request.GET),
+        lambda: analytics.top_degrees(job) if candidates is None else analytics.live_top_degrees(candidates),
+    )
+    return JsonResponse(data, safe=False)
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_chart_etag, last_modified_func=_chart_last_modified)
+def chart_schools(request):
+    """
+    Chart data: the top schools among a job's (optionally filtered) candidates.
+    """
+    job, candidates = _chart_candidates(request)
+    if job is None:
+        return JsonResponse([], safe=False)
+    data = response_cache.cached(
+        'chart_schools', job.id, response_cache.job_version(job.id), response_cache.normalize_params(request.GET),
+        lambda: analytics.top_schools(job) if candidates is None else analytics.live_top_schools(candidates),
+    )
+    return JsonResponse(data, safe=False)
+
+
+
+@login_required
+def cache_stats(request):
+    """
+    Hit ratios of the response cache in this process, as JSON.
+    """
+    return JsonResponse(response_cache.stats())
+
+def prometheus_metrics(request):
+    """
+    Ingestion and page metrics of every process, in the Prometheus text
+    format (see metrics.py). Scrapers authenticate with METRICS_TOKEN, if set.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@login_required
+@metrics.VIEW_SECONDS.time(view='autocomplete')
+def autocomplete(request):
+    """
+    Returns the most frequent values of a filter field that start with
+    `term`, among the candidates of job `job_id` (see autocomplete.py).
+    """
+    field = request.GET.get('field')
+    term = request.GET.get('term', '')
+    job_id = request.GET.get('job_id', '')
+    if field not in FILTER_FIELDS or not job_id.isdigit() or not term.strip():
+        return JsonResponse([], safe=False)
+
+    response = JsonResponse(suggest(int(job_id), field, term), safe=False)
+    response['Cache-Control'] = f'private, max-age={settings.AUTOCOMPLETE_CACHE_TIMEOUT}'
+    return response
 
 @login_required
 def delete_job(request, job_id):
@@ -258,4 +480,18 @@ def job_posting_details(request, job_id):
     Displays the details of a specific job posting.
     """
     job = get_object_or_404(Job, id=job_id)
-    return render(request, 'parser/job_posting_details.html', {'job': job})
\ No newline at end of file
+    return render(request, 'parser/job_posting_details.html', {'job': job})
+
+@login_required
+def job_duplicates(request, job_id):
+    """
+    Lists the job's candidates flagged as possible duplicates of an earlier
+    candidate, of this job or another, most similar first (see dedup.py).
+    """
+    job = get_object_or_404(Job, id=job_id)
+    duplicates = (
+        CandidateSignature.objects.filter(job=job, duplicate_of__isnull=False)
+        .select_related('candidate', 'duplicate_of', 'duplicate_of__job')
+        .order_by('-similarity', 'candidate_id')[:settings.DEDUP_PAGE_SIZE]
+    )
+    return render(request, 'parser/job_duplicates.html', {'job': job, 'duplicates': duplicates})
\ No newline at end of file
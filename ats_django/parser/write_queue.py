@@ -0,0 +1,164 @@
+"""
+Single-writer batching of database writes.
+
+SQLite has one write lock per database. When several uploads and ingestion
+workers write at once, each takes the lock for its own small transaction
+and pays for its own commit, while the others wait. Instead, the upload and
+ingestion paths hand their writes to `write`, which queues them for one
+writer thread per process. The writer takes everything queued so far (up
+to WRITE_QUEUE_MAX_BATCH operations) and runs it as one transaction: one
+lock, one commit and one fsync for the whole group. While a group commits
+the next one builds up, so the busier it gets, the bigger the groups.
+
+Each operation runs in its own savepoint: one that raises is rolled back
+and its caller gets the exception, while the rest of the group commits.
+`write` blocks until the operation's group has committed and returns the
+operation's result, so callers stay synchronous. on_commit callbacks
+registered by an operation (such as the scoring of new candidates) are
+handed back and run by its caller once the group commits, so the writer
+can go on to the next group; what they write goes through `write` again.
+
+Writes made inside a transaction (an atomic block, or with autocommit
+turned off), or by the writer thread itself, run directly (queuing them
+would split the transaction or deadlock), as do all writes when
+WRITE_QUEUE_ENABLED is off. Separate processes still take turns for the
+lock; WAL (set by migration parser/0012) and the connection settings in
+ats_system.settings (IMMEDIATE transactions, a busy timeout) make them
+wait instead of failing.
+"""
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from . import metrics
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+_stats = {'operations': 0, 'groups': 0, 'largest_group': 0, 'failures': 0}
+_stats_lock = threading.Lock()
+
+
+class _Operation:
+    __slots__ = ('function', 'args', 'kwargs', 'queued_at', 'done', 'result', 'error', 'hooks')
+
+    def __init__(self, function, args, kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.queued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.hooks = []
+
+
+def stats():
+    """
+    Operations and groups committed by this process's writer, the largest
+    group, and how many operations failed.
+    """
+    with _stats_lock:
+        counters = dict(_stats)
+    counters['average_group'] = counters['operations'] / counters['groups'] if counters['groups'] else 0.0
+    counters['queued'] = _queue.qsize()
+    return counters
+
+
+def write(function, *args, **kwargs):
+    """
+    Calls `function(*args, **kwargs)` in the writer thread, inside a group
+    transaction, and returns its result once the group has committed (see
+    module docstring). Exceptions are raised in the calling thread. When
+    the write can't be queued, it runs here in a transaction of its own.
+    """
+    if not settings.WRITE_QUEUE_ENABLED or threading.current_thread() is _writer or _in_transaction():
+        with transaction.atomic():
+            return function(*args, **kwargs)
+    operation = _Operation(function, args, kwargs)
+    _ensure_writer()
+    _queue.put(operation)
+    operation.done.wait()
+    if operation.error is not None:
+        raise operation.error
+    for sids, hook, robust in operation.hooks:
+        if not robust:
+            hook()
+            continue
+        try:
+            hook()
+        except Exception as e:
+            print(f"Error in a callback after committing {function.__name__}: {e}")
+    return operation.result
+
+
+def _in_transaction():
+    """
+    Whether this thread's connection has a transaction open, from
+    `transaction.atomic()` or from turning autocommit off.
+    """
+    if connection.in_atomic_block:
+        return True
+    return connection.connection is not None and not connection.get_autocommit()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        # A forked child inherits the variable but not the thread.
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_run, name='database-writer', daemon=True)
+            _writer.start()
+
+
+def _run():
+    while True:
+        operations = [_queue.get()]
+        while len(operations) < settings.WRITE_QUEUE_MAX_BATCH:
+            try:
+                operations.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        close_old_connections()
+        _commit(operations)
+
+
+def _commit(operations):
+    failures = 0
+    try:
+        with transaction.atomic():
+            for operation in operations:
+                registered = len(connection.run_on_commit)
+                try:
+                    with transaction.atomic():
+                        operation.result = operation.function(*operation.args, **operation.kwargs)
+                except Exception as e:
+                    # The savepoint's rollback also dropped its callbacks.
+                    operation.error = e
+                    failures += 1
+                else:
+                    operation.hooks = connection.run_on_commit[registered:]
+                    del connection.run_on_commit[registered:]
+    except Exception as e:
+        # The commit itself failed: nothing in the group was written.
+        for operation in operations:
+            if operation.error is None:
+                operation.error = e
+                failures += 1
+    finally:
+        committed = time.perf_counter()
+        for operation in operations:
+            metrics.WRITE_QUEUE_WAIT_SECONDS.observe(committed - operation.queued_at)
+            operation.done.set()
+        metrics.WRITE_QUEUE_GROUP_SIZE.observe(len(operations))
+        with _stats_lock:
+            _stats['operations'] += len(operations)
+            _stats['groups'] += 1
+            _stats['largest_group'] = max(_stats['largest_group'], len(operations))
+            _stats['failures'] += failures